@@ -1,32 +1,141 @@
+import argparse
+import math
 import sys
-import serial
 import threading
 import time
-import winsound  # For Windows sound
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QVBoxLayout, QPushButton,
-                             QHBoxLayout, QSlider, QLineEdit, QFrame, QGridLayout)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QPixmap, QPainter, QColor
-from playsound import playsound  # Import playsound
-
+                             QHBoxLayout, QSlider, QLineEdit, QFrame, QGridLayout, QComboBox, QShortcut)
+from PyQt5.QtCore import Qt, QEvent, QTimer, QPointF, pyqtSignal
+from PyQt5.QtGui import QFont, QPixmap, QPainter, QColor, QPolygonF, QKeySequence, QFontDatabase
+
+from volume.audio import AudioEngine, NullBackend
+from volume.discovery import default_cache_path
+from volume.latency import LatencyProbe
+from volume.monitor import PumpMonitor
+from volume.render import FramePacer, WidgetUpdater
+from volume.scheduler import Scheduler
+
+# Only what the first frame needs is imported up front. NumPy (the trend history)
+# loads on a thread once the window has been painted; the archive, the metrics
+# endpoint, remote viewers, the worker process, pyserial and the platform's
+# sound modules load when they are first used.
 
 # Uncomment the following if you have qt_material installed
 # import qt_material
 
+# Styles that change at runtime are selected through each label's "state"
+# property, so switching them never re-parses a stylesheet
+DYNAMIC_STYLES = """
+QLabel#connection[state="disconnected"] { color: red; }
+QLabel#connection[state="connected"] { color: green; }
+QLabel#status[state="normal"] { color: green; border: 2px solid gray; padding: 5px; }
+QLabel#status[state="alert"] { color: red; border: 2px solid red; padding: 5px; }
+QLabel#status[state="alarm"] { color: white; background-color: red; border: 2px solid red; padding: 5px; }
+QLabel#mode[state="AUTO"] { color: blue; }
+QLabel#mode[state="MANUAL"] { color: white; }
+QLabel#battery[state="ok"] { color: white; }
+QLabel#battery[state="low"] { color: red; }
+QLabel#battery[state="alarm"] { color: white; background-color: red; }
+"""
+
+RENDER_FPS = 30
+BATTERY_INTERVAL = 10.0  # seconds per simulated battery step
+
+# Flow history kept for the trend chart: 72 h at 4 samples/s in about 15 MB
+HISTORY_SAMPLES = 72 * 3600 * 4
+TREND_WINDOWS = (("5 min", 300), ("1 hour", 3600), ("12 hours", 12 * 3600), ("72 hours", 72 * 3600))
+TREND_INTERVAL = 1.0  # seconds between trend redraws
+
+# While latency hooks are on, a task this often measures how late the event loop runs it;
+# each tick is a wakeup of an otherwise idle window, so there are only two a second
+STALL_INTERVAL = 0.5
+OVERLAY_REFRESH = 4  # stall ticks per overlay refresh (2 s: redrawing it costs more than a tick)
+
+
+class TrendChart(QWidget):
+    """Flow rate history drawn as a min/max envelope, about two points per pixel column."""
+
+    def __init__(self, history, parent=None, latency=None):
+        super().__init__(parent)
+        self.history = history
+        self.latency = latency or LatencyProbe()
+        self.window = TREND_WINDOWS[0][1]
+        self.points_drawn = 0
+        self.setMinimumHeight(120)
+
+    def set_window(self, seconds):
+        self.window = seconds
+        self.update()
+
+    def paintEvent(self, event):
+        timed = self.latency.enabled
+        if timed:
+            started = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0))
+        span = self.history.span() if self.history is not None else None
+        if span is not None:
+            end = span[1]
+            start = end - self.window
+            width, height = self.width(), self.height()
+            times, low, high = self.history.decimate(start, end, max(1, width))
+            if len(times):
+                top = max(5.0, float(high.max()) * 1.1)
+                xs = (times - start) * (width / self.window)
+                scale = (height - 1) / top
+                polygon = QPolygonF()
+                for x, y_low, y_high in zip(xs.tolist(), low.tolist(), high.tolist()):
+                    polygon.append(QPointF(x, height - 1 - y_low * scale))
+                    if y_high != y_low:
+                        polygon.append(QPointF(x, height - 1 - y_high * scale))
+                painter.setPen(QColor(0, 200, 0))
+                painter.drawPolyline(polygon)
+                painter.setPen(QColor(150, 150, 150))
+                painter.drawText(4, 14, f"{top:.0f} mL/min")
+                self.points_drawn = polygon.size()
+        painter.end()
+        if timed:
+            self.latency.since("paint", started)
+
 
 class InfusionPumpGUI(QWidget):
-    update_signal = pyqtSignal(str, str, str)
+    # Monitor events arrive on the reader thread; this signal queues them onto the GUI thread,
+    # stamped with the perf_counter() time they were sent while latency hooks are on
+    monitor_signal = pyqtSignal(str, object, float)
+    # The trend history, from the thread that loaded it
+    history_loaded = pyqtSignal(object)
 
-    def __init__(self):
+    def __init__(self, monitor=None, audio=None, latency_dump=None):
         super().__init__()
-        self.serial_port = None
-        self.monitoring = False
-        self.battery_level = 100
-        self.pump_running = False
-        self.blood_detected = False
-        self.alarm_active = False
-        self.alarm_timer = None
-        self.occlusion_detected = False  # Track occlusion state
+        self.monitor = monitor or PumpMonitor()
+        # Stage timings shared with the monitor and reader; F12 shows them, latency_dump saves them
+        self.latency = self.monitor.latency
+        self.latency_dump = latency_dump
+        if latency_dump:
+            self.latency.enabled = True
+        self.frames_arrived = None
+        self.painted = False
+        # Alarm tones play on the engine's own thread, never on this one
+        self.audio = audio or AudioEngine(asset_path="blood_leakage.mp3")
+        self.alarms_sounding = ()
+        self.connection_text = "Serial Connection: Disconnected"
+        self.warning_text = ""
+        self.battery_drawn = None
+        self.trend_drawn = 0.0
+
+        # Telemetry is rendered at most once per display frame, and only what changed
+        self.ui = WidgetUpdater(self.restyle)
+        self.pacer = FramePacer(RENDER_FPS)
+
+        # All timed work runs from one scheduler, woken by a single timer only when a
+        # task is due; while the window is minimized only the when_idle tasks run
+        self.scheduler = Scheduler(on_rearm=self.arm_scheduler)
+        self.scheduler_timer = QTimer()
+        self.scheduler_timer.setSingleShot(True)
+        # A coarse timer may fire up to 5% early, before anything is due: a wasted wakeup
+        self.scheduler_timer.setTimerType(Qt.PreciseTimer)
+        self.scheduler_timer.timeout.connect(self.scheduler.run_due)
+        self.render_task = None
 
         # GUI Setup
         self.setWindowTitle("Infusion Pump Monitor")
@@ -52,6 +161,7 @@ class InfusionPumpGUI(QWidget):
         # Battery section at top
         battery_layout = QHBoxLayout()
         self.battery_label = QLabel("Battery: 100%", self)
+        self.battery_label.setObjectName("battery")
         self.battery_label.setFont(QFont("Arial", 14))
         self.battery_label.setAlignment(Qt.AlignRight)
 
@@ -66,8 +176,8 @@ class InfusionPumpGUI(QWidget):
 
         # Connection Status
         self.connection_label = QLabel("Serial Connection: Disconnected", self)
+        self.connection_label.setObjectName("connection")
         self.connection_label.setFont(QFont("Arial", 12))
-        self.connection_label.setStyleSheet("color: red;")
 
         # LEFT PANEL COMPONENTS
         # Digital Flow Rate Display
@@ -80,13 +190,28 @@ class InfusionPumpGUI(QWidget):
         self.flow_display.setStyleSheet("background-color: black; color: green; border: 3px solid gray; padding: 10px;")
         self.flow_display.setAlignment(Qt.AlignCenter)
 
+        # Flow trend, from the monitor's telemetry history
+        trend_header = QHBoxLayout()
+        trend_label = QLabel("Flow Trend:", self)
+        trend_label.setFont(QFont("Arial", 15))
+        self.trend_window = QComboBox(self)
+        for name, seconds in TREND_WINDOWS:
+            self.trend_window.addItem(name, seconds)
+        self.trend_window.currentIndexChanged.connect(
+            lambda index: self.trend.set_window(self.trend_window.itemData(index)))
+        trend_header.addWidget(trend_label)
+        trend_header.addStretch()
+        trend_header.addWidget(self.trend_window)
+        self.trend = TrendChart(self.monitor.history, self, self.latency)
+        self.trend.setFixedWidth(400)
+
         # Status Display
         status_label = QLabel("Status:", self)
         status_label.setFont(QFont("Arial", 18))
         self.status_display = QLabel("NORMAL", self)
         self.status_display.setFont(QFont("Arial", 24, QFont.Weight.Bold))
+        self.status_display.setObjectName("status")
         self.status_display.setAlignment(Qt.AlignCenter)
-        self.status_display.setStyleSheet("color: green; border: 2px solid gray; padding: 5px;")
 
         # Pump Power Display
         self.power_display = QLabel("Pump Power: 0", self)
@@ -95,6 +220,7 @@ class InfusionPumpGUI(QWidget):
 
         # Mode Display
         self.mode_display = QLabel("Mode: AUTO", self)
+        self.mode_display.setObjectName("mode")
         self.mode_display.setFont(QFont("Arial", 16))
         self.mode_display.setAlignment(Qt.AlignCenter)
 
@@ -108,6 +234,8 @@ class InfusionPumpGUI(QWidget):
         left_layout.addWidget(self.connection_label)
         left_layout.addWidget(flow_label)
         left_layout.addWidget(self.flow_display)
+        left_layout.addLayout(trend_header)
+        left_layout.addWidget(self.trend)
         left_layout.addWidget(status_label)
         left_layout.addWidget(self.status_display)
         left_layout.addWidget(self.power_display)
@@ -196,259 +324,293 @@ class InfusionPumpGUI(QWidget):
         main_layout.addWidget(right_panel, 1)
 
         self.setLayout(main_layout)
-
-        # Timer for battery simulation
-        self.battery_timer = QTimer()
-        self.battery_timer.timeout.connect(self.simulate_battery_drain)
-        self.battery_timer.start(10000)  # Update every 10 seconds
-
-        # Timer for LCD updates (similar to Arduino's LCD refresh)
-        self.lcd_timer = QTimer()
-        self.lcd_timer.timeout.connect(self.update_displays)
-        self.lcd_timer.start(1000)  # Update every second
-
-        # Timer for alarm sounds
-        self.alarm_sound_timer = QTimer()
-        self.alarm_sound_timer.timeout.connect(self.play_alarm_sound)
+        self.setStyleSheet(DYNAMIC_STYLES)
+        self.render()
+
+        # Battery simulation; drain_battery() also checks for a critically low battery,
+        # which is checked again whenever a pump connects
+        self.battery_task = self.scheduler.every(BATTERY_INTERVAL, lambda: self.monitor.drain_battery(), "battery",
+                                                 slack=1.0, when_idle=True)
+
+        # Latency overlay: p50/p99 per stage, event loop stalls, dropped and coalesced frames
+        self.overlay = QLabel(self)
+        self.overlay.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.overlay.setStyleSheet("background-color: rgba(0, 0, 0, 200); color: #0f0; padding: 6px;")
+        self.overlay.hide()
+        self.overlay_shortcut = QShortcut(QKeySequence("F12"), self)
+        self.overlay_shortcut.activated.connect(self.toggle_overlay)
+        self.stall_task = None
+        self.stall_ticks = 0
+        if self.latency.enabled:
+            self.start_stall_sampling()
 
         # Signal connection
-        self.update_signal.connect(self.update_display)
-
-        # Preload the sound file
-        self.blood_leakage_sound = "blood_leakage.mp3"  # Replace with your sound file
+        self.monitor_signal.connect(self.handle_monitor_event)
+        self.history_loaded.connect(self.use_history)
+        self.monitor.subscribe(self.forward_event)
+
+    def use_monitor(self, monitor):
+        """Show another monitor from now on, e.g. one too slow to create before the first paint."""
+        self.monitor.unsubscribe(self.forward_event)
+        if monitor.history is None:
+            monitor.history = self.trend.history
+        self.trend.history = monitor.history
+        monitor.latency = self.latency
+        self.monitor = monitor
+        monitor.subscribe(self.forward_event)
+        self.schedule_render()
+
+    def forward_event(self, event, data):
+        # Reader thread: queue the event for the GUI thread
+        self.monitor_signal.emit(event, data, time.perf_counter() if self.latency.enabled else 0.0)
 
     def start_monitoring(self):
         try:
-            # Try to connect to Arduino on COM ports
-            ports = ['COM3', 'COM4', 'COM5', 'COM6', '/dev/ttyUSB0', '/dev/ttyACM0']
-            for port in ports:
-                try:
-                    self.serial_port = serial.Serial(port, 9600, timeout=1)
-                    self.connection_label.setText(f"Serial Connection: Connected to {port}")
-                    self.connection_label.setStyleSheet("color: green;")
-                    break
-                except:
-                    continue
-
-            if self.serial_port is None:
-                self.warning_label.setText("Failed to connect to Arduino. Check connections.")
-                self.trigger_alarm("connection_failure")
-                return
-
-            self.monitoring = True
-            self.start_button.setEnabled(False)
-            self.stop_button.setEnabled(True)
-            self.power_slider.setEnabled(True)
-            self.power_input.setEnabled(True)
-            self.auto_mode_button.setEnabled(True)
-
-            # Start the monitoring thread
-            self.monitor_thread = threading.Thread(target=self.read_serial_data)
-            self.monitor_thread.daemon = True
-            self.monitor_thread.start()
-
+            # Returns at once; the search runs in the background and reports back as events
+            self.monitor.start(wait=False)
         except Exception as e:
-            self.warning_label.setText(f"Error: {str(e)}")
-            self.trigger_alarm("connection_failure")
+            self.show_warning(f"Error: {str(e)}")
+            self.monitor.trigger_alarm("connection_failure")
 
     def stop_monitoring(self):
-        self.monitoring = False
-        self.stop_alarm()
-        if self.serial_port:
-            self.serial_port.close()
-            self.serial_port = None
-
-        self.start_button.setEnabled(True)
-        self.stop_button.setEnabled(False)
-        self.power_slider.setEnabled(False)
-        self.power_input.setEnabled(False)
-        self.auto_mode_button.setEnabled(False)
-        self.silence_alarm_button.setEnabled(False)
-        self.connection_label.setText("Serial Connection: Disconnected")
-        self.connection_label.setStyleSheet("color: red;")
-        self.occlusion_detected = False  # Reset occlusion state
-
-
-    def read_serial_data(self):
-        while self.monitoring and self.serial_port:
-            try:
-                if self.serial_port.in_waiting:
-                    line = self.serial_port.readline().decode('utf-8').strip()
-                    if line:
-                        # Check if this is a status line with the expected format
-                        if "Status:" in line and "|" in line:
-                            parts = line.split('|')
-                            if len(parts) >= 3:
-                                status = parts[0].strip().replace("Status: ", "")
-                                power = parts[1].strip().replace("Pump Speed: ", "")
-                                flow = parts[2].strip().replace("Flow Rate: ", "").split(" ")[0]
-                                self.update_signal.emit(status, power, flow)
-                        # Check for blood leakage alert
-                        elif "BLOOD LEAKAGE DETECTED" in line:
-                            self.blood_detected = True
-                            self.update_signal.emit("BLOOD LEAKAGE", "0", "0.0")
-                            self.trigger_alarm("blood_leakage")
-                        # Check for mode changes
-                        elif "Switched to AUTO mode" in line:
-                            self.update_mode_display("AUTO")
-                        elif "Manual Mode: Speed Set To" in line:
-                            self.update_mode_display("MANUAL")
-            except Exception as e:
-                self.warning_label.setText(f"Serial Error: {str(e)}")
-                self.trigger_alarm("communication_error")
-                break
-            time.sleep(0.1)
-
-    def update_mode_display(self, mode):
-        # This function is called from the serial thread, so we need to be thread-safe
-        self.mode_display.setText(f"Mode: {mode}")
-        if mode == "AUTO":
-            self.mode_display.setStyleSheet("color: blue;")
+        self.monitor.stop()
+
+    def handle_monitor_event(self, event, data, sent=0.0):
+        """Reflect a PumpMonitor event in the widgets (runs on the GUI thread)."""
+        if sent and self.latency.enabled:
+            self.latency.since("dispatch", sent)
+        if event in ("frames", "samples"):
+            # Keep the oldest batch not yet on screen, for the end-to-end time
+            arrived = self.latency.take_arrival()
+            if self.frames_arrived is None:
+                self.frames_arrived = arrived
+        elif event == "warning":
+            self.warning_text = data
+        elif event == "alarm":
+            self.show_alarm(data)
+        elif event == "state":
+            self.sound_alarms(data)
+        elif event == "searching":
+            self.connection_text = "Serial Connection: Searching for pump..."
+            self.set_controls_enabled(False, busy=True)
+        elif event == "reconnecting":
+            self.connection_text = f"Serial Connection: Lost, reconnecting (attempt {data})..."
+            self.set_controls_enabled(False, busy=True)
+        elif event == "connected":
+            self.connection_text = f"Serial Connection: Connected to {data}"
+            self.set_controls_enabled(True)
+            self.scheduler.call_later(0, self.monitor.check_battery, "battery check", when_idle=True)
+        elif event == "disconnected":
+            self.connection_text = "Serial Connection: Disconnected"
+            self.set_controls_enabled(False)
+            self.silence_alarm_button.setEnabled(False)
+        elif event == "protocol":
+            self.connection_text = f"{self.connection_text} ({data})"
+        self.schedule_render()
+
+    def set_controls_enabled(self, connected, busy=False):
+        # busy: a search is running, which the stop button cancels
+        self.start_button.setEnabled(not connected and not busy)
+        self.stop_button.setEnabled(connected or busy)
+        self.power_slider.setEnabled(connected)
+        self.power_input.setEnabled(connected)
+        self.auto_mode_button.setEnabled(connected)
+
+    def show_warning(self, text):
+        self.warning_text = text
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Render now, or once the current display frame is over if one was just drawn.
+
+        Nothing is drawn while the window is minimized; one render follows restoring it.
+        """
+        delay = self.pacer.request()
+        if self.render_task is not None and self.render_task.pending:
+            return
+        if delay <= 0 and not self.scheduler.idle:
+            self.render()
         else:
-            self.mode_display.setStyleSheet("color: white;")
+            self.render_task = self.scheduler.call_later(max(0.0, delay), self.render, "render")
 
-    def update_display(self, status, power, flow):
+    def arm_scheduler(self, wake_at):
+        # The scheduler's next wakeup moved: one timer, re-armed to it
+        if wake_at is None:
+            self.scheduler_timer.stop()
+        else:
+            self.scheduler_timer.start(max(0, math.ceil((wake_at - time.monotonic()) * 1000)))
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.set_idle(self.isMinimized())
+        super().changeEvent(event)
+
+    def hideEvent(self, event):
+        self.set_idle(True)
+        super().hideEvent(event)
+
+    def showEvent(self, event):
+        self.set_idle(self.isMinimized())
+        super().showEvent(event)
+
+    def set_idle(self, idle):
+        """Park rendering and overlay sampling while nobody can see the window."""
+        if idle != self.scheduler.idle:
+            self.scheduler.set_idle(idle)
+            if not idle:
+                self.schedule_render()
+
+    def restyle(self, widget):
+        # Re-apply the DYNAMIC_STYLES rule matching the widget's new state
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
+
+    def render(self):
+        """Show the monitor's current state, touching only widgets whose content changed."""
+        timed = self.latency.enabled
+        if timed:
+            started = time.perf_counter()
+        self.pacer.rendered()
+        monitor = self.monitor
+        ui = self.ui
+        # One snapshot, so every widget shows the same version of the pump's state
+        state = monitor.state
+        status, power, flow, alarm = state.display_status, state.power, state.flow, state.alarm_type
         try:
-            # Update flow rate display
-            try:
-                flow_value = float(flow)
-                if 0 <= flow_value < 500:  # Valid range check as in Arduino code
-                    self.flow_display.setText(f"{flow_value:.1f}")
-                else:
-                    self.flow_display.setText("----")
-            except ValueError:
-                self.flow_display.setText("----")
-
-            # Update status display
-            if "BLOOD LEAKAGE" in status:
-                self.status_display.setText("BLOOD LEAKAGE")
-                self.status_display.setStyleSheet("color: red; border: 2px solid red; padding: 5px;")
-                self.warning_label.setText("WARNING: Blood leakage detected!")
-                self.blood_detected = True
-                self.trigger_alarm("blood_leakage")
-                self.silence_alarm_button.setEnabled(True)
-            elif self.occlusion_detected: #added occlusin detection
-                self.status_display.setText("OCCLUSION")
-                self.status_display.setStyleSheet("color: red; border: 2px solid red; padding: 5px;")
-                self.warning_label.setText("WARNING: Occlusion detected!")
-            else:
-                if not self.blood_detected:  # Only update if blood not detected (similar to Arduino logic)
-                    self.status_display.setText(status)
-                    self.status_display.setStyleSheet("color: green; border: 2px solid gray; padding: 5px;")
-                    self.warning_label.setText("")
+            ui.text(self.connection_label, self.connection_text)
+            ui.style(self.connection_label, "connected" if monitor.serial_port else "disconnected")
 
+            # Flow rate, with the same valid range check as the Arduino code
+            ui.text(self.flow_display, f"{flow:.1f}" if 0 <= flow < 500 else "----")
 
-            # Update power display
-            try:
-                power_value = int(power)
-                if 0 <= power_value <= 255:  # Valid range check
-                    self.power_display.setText(f"Pump Power: {power_value}")
-                else:
-                    self.power_display.setText("Pump Power: ---")
-            except ValueError:
-                self.power_display.setText("Pump Power: ---")
-
-            # Update slider if in manual mode
-            if "MANUAL" in status and not self.power_slider.isSliderDown():
-                try:
-                    self.power_slider.setValue(int(power))
-                except ValueError:
-                    pass
-
-             # Check for low flow rate / occlusion alert
-            try:
-                flow_value = float(flow)
-                if flow_value <= 1.0 and int(power) > 50:
-                    # Occlusion detected
-                    self.occlusion_detected = True
-                    self.warning_label.setText("WARNING: Occlusion detected!")
-                    self.trigger_alarm("occlusion")
-                    self.silence_alarm_button.setEnabled(True)
-                elif flow_value > 1.0:
-                    # Reset occlusion if flow is back to normal
-                    self.occlusion_detected = False
-
-            except ValueError:
-                pass
+            ui.text(self.status_display, status)
+            if alarm in ("blood_leakage", "occlusion"):
+                ui.style(self.status_display, "alarm")
+            elif state.blood_detected or state.occlusion_detected:
+                ui.style(self.status_display, "alert")
+            else:
+                ui.style(self.status_display, "normal")
+
+            ui.text(self.power_display, f"Pump Power: {power}" if 0 <= power <= 255 else "Pump Power: ---")
+            ui.text(self.mode_display, f"Mode: {state.mode}")
+            ui.style(self.mode_display, state.mode)
+            ui.text(self.warning_label, self.warning_text)
 
+            level = int(state.battery_level)
+            ui.text(self.battery_label, f"Battery: {level}%")
+            if alarm == "low_battery":
+                ui.style(self.battery_label, "alarm")
+            else:
+                ui.style(self.battery_label, "low" if state.battery_level < 20 else "ok")
+            if level != self.battery_drawn:
+                self.battery_drawn = level
+                self.update_battery_display(level)
+
+            # The trend spans minutes to days; redrawing it once a second is plenty
+            now = time.monotonic()
+            if now - self.trend_drawn >= TREND_INTERVAL:
+                self.trend_drawn = now
+                self.trend.update()
+
+            # Follow the pump's power in manual mode, unless the operator is dragging the
+            # slider or a setpoint is still on its way. Signals are blocked so this does
+            # not send the value straight back to the pump.
+            if (monitor.status == "MANUAL" and not self.power_slider.isSliderDown()
+                    and not monitor.commands.pending):
+                self.power_slider.blockSignals(True)
+                self.power_slider.setValue(power)
+                self.power_slider.blockSignals(False)
 
         except Exception as e:
             self.warning_label.setText(f"Display Update Error: {str(e)}")
-
-    def update_displays(self):
-        """Simulates the Arduino's LCD refresh functionality"""
-        if not self.monitoring:
-            return
-
-        # Check for low battery alert
-        if self.battery_level < 10:
-            self.trigger_alarm("low_battery")
-
-        # Nothing specific to update here as our GUI refreshes when data arrives
-        # But this mimics the LCD refresh cycle in the Arduino code
+            self.ui.forget(self.warning_label)
+
+        if timed:
+            now = time.perf_counter()
+            self.latency.record("render", now - started)
+            if self.frames_arrived is not None:
+                self.latency.record("end_to_end", now - self.frames_arrived)
+        self.frames_arrived = None
+
+    def render_stats(self):
+        """Counters for applied versus skipped widget updates and coalesced renders."""
+        return {
+            "widget_updates_applied": self.ui.applied,
+            "widget_updates_skipped": self.ui.skipped,
+            "render_requests": self.pacer.requests,
+            "renders": self.pacer.renders,
+            "renders_coalesced": self.pacer.coalesced,
+        }
+
+    def latency_counters(self):
+        """Frames lost or folded together on the way to the screen, and scheduler wakeups."""
+        counters = {"renders_coalesced": self.pacer.coalesced,
+                    "setpoints_coalesced": self.monitor.commands.stats.coalesced}
+        reader = self.monitor.reader
+        if reader is not None:
+            stats = reader.stats
+            counters.update(frames_dropped=stats.dropped_frames, frames_corrupt=stats.corrupt_frames,
+                            lines_unparsed=stats.parse_misses, max_batch=stats.max_batch)
+        if self.monitor.store is not None:
+            counters["archive_rows_dropped"] = self.monitor.store.dropped
+        counters.update(timer_wakeups=self.scheduler.wakeups, idle_wakeups=self.scheduler.idle_wakeups,
+                        tasks_coalesced=self.scheduler.coalesced)
+        return counters
+
+    # Latency overlay
+
+    def toggle_overlay(self):
+        """F12: show or hide the overlay; the hooks run while it is shown or a dump is due."""
+        if self.overlay.isVisible():
+            self.overlay.hide()
+            if not self.latency_dump:
+                self.latency.enabled = False
+                self.scheduler.cancel(self.stall_task)
+        else:
+            self.latency.enabled = True
+            self.start_stall_sampling()
+            self.refresh_overlay()
+            self.overlay.show()
+            self.overlay.raise_()
+
+    def refresh_overlay(self):
+        self.overlay.setText(self.latency.format(self.latency_counters()))
+        self.overlay.adjustSize()
+
+    def start_stall_sampling(self):
+        if self.stall_task is None or not self.stall_task.pending:
+            self.stall_task = self.scheduler.every(STALL_INTERVAL, self.sample_stall, "stall", slack=0.0)
+
+    def sample_stall(self):
+        # How much later than its deadline the event loop got round to this task
+        self.latency.record("stall", self.stall_task.late)
+        self.stall_ticks += 1
+        if self.overlay.isVisible() and self.stall_ticks % OVERLAY_REFRESH == 0:
+            self.refresh_overlay()
 
     def set_pump_power(self):
-        if self.serial_port and self.serial_port.is_open:
-            power = self.power_slider.value()
-            self.serial_port.write(f"{power}\n".encode())
-            self.power_display.setText(f"Pump Power: {power}")
-            self.update_mode_display("MANUAL")
-            # Reset occlusion when power is manually set
-            self.occlusion_detected = False
+        if self.monitor.set_power(self.power_slider.value()):
+            self.schedule_render()
 
     def set_pump_power_from_input(self):
         try:
             power = int(self.power_input.text())
             if 0 <= power <= 255:
-                self.power_slider.setValue(power)
-                if self.serial_port and self.serial_port.is_open:
-                    self.serial_port.write(f"{power}\n".encode())
-                    self.power_display.setText(f"Pump Power: {power}")
-                    self.update_mode_display("MANUAL")
-                    # Reset occlusion when power is manually set
-                    self.occlusion_detected = False
+                if self.power_slider.value() != power:
+                    self.power_slider.setValue(power)  # Sends the command through set_pump_power
+                else:
+                    self.set_pump_power()
             else:
-                self.warning_label.setText("Power must be between 0 and 255")
-                self.trigger_alarm("input_error")
+                self.show_warning("Power must be between 0 and 255")
+                self.monitor.trigger_alarm("input_error")
         except ValueError:
-            self.warning_label.setText("Invalid power value")
-            self.trigger_alarm("input_error")
+            self.show_warning("Invalid power value")
+            self.monitor.trigger_alarm("input_error")
 
     def set_auto_mode(self):
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.write(b"AUTO\n")
-            self.update_mode_display("AUTO")
-            self.warning_label.setText("Switched to automatic mode")
-            # Reset blood detection and occlusion when switching to auto mode
-            self.blood_detected = False
-            self.occlusion_detected = False  # Reset occlusion
-            self.status_display.setText("NORMAL")
-            self.status_display.setStyleSheet("color: green; border: 2px solid gray; padding: 5px;")
-            self.stop_alarm()
+        if self.monitor.set_auto():
             self.silence_alarm_button.setEnabled(False)
 
-    def simulate_battery_drain(self):
-        if self.monitoring:
-            # Simulate battery drain when monitoring
-            self.battery_level = max(0, self.battery_level - 1)
-        else:
-            # Simulate slow battery drain when idle
-            self.battery_level = max(0, self.battery_level - 0.2)
-
-        # Update battery display
-        self.battery_label.setText(f"Battery: {int(self.battery_level)}%")
-        self.update_battery_display(int(self.battery_level))
-
-        # Low battery warning
-        if self.battery_level < 20:
-            self.battery_label.setStyleSheet("color: red;")
-            if self.battery_level < 10:
-                self.warning_label.setText("WARNING: Battery critically low!")
-                self.trigger_alarm("low_battery")
-                self.silence_alarm_button.setEnabled(True)
-        else:
-            self.battery_label.setStyleSheet("color: white;")
-
     def update_battery_display(self, level):
         """Draw battery level indicator."""
         pixmap = QPixmap(60, 20)
@@ -471,88 +633,127 @@ class InfusionPumpGUI(QWidget):
         painter.end()
         self.battery_display.setPixmap(pixmap)
 
-    def trigger_alarm(self, alarm_type):
-        """Start alarm sound based on the type of alarm"""
-        if not self.alarm_active:
-            self.alarm_active = True
-            self.silence_alarm_button.setEnabled(True)
-
-            # Flash UI element based on alarm type
-            if alarm_type == "blood_leakage":
-                self.status_display.setStyleSheet(
-                    "color: white; background-color: red; border: 2px solid red; padding: 5px;")
-                # Play sound for blood leakage immediately
-                try:
-                    playsound(self.blood_leakage_sound, block=False)  # Play asynchronously
-                except Exception as e:
-                    print(f"Error playing sound: {e}")
-
-            elif alarm_type == "low_battery":
-                self.battery_label.setStyleSheet("color: white; background-color: red;")
-            elif alarm_type == "occlusion":  # Occlusion alarm
-                self.status_display.setStyleSheet(
-                    "color: white; background-color: red; border: 2px solid red; padding: 5px;")
-
-            # Start sound timer (for beeps)
-            self.alarm_sound_timer.start(500)  # Sound every 500ms
-
-    def play_alarm_sound(self):
-        """Play sound for active alarm"""
-        try:
-            # Different frequencies for different types of alarms
-            if "BLOOD LEAKAGE" in self.status_display.text():
-                # High priority alarm - blood leakage (higher pitch, longer)
-                #winsound.Beep(1500, 200) #removed to avoid overlap
-                pass # The blood leakage sound is already handled in trigger_alarm
-            elif "OCCLUSION" in self.status_display.text():  # Occlusion alarm
-                winsound.Beep(1350, 200) # Different frequency for occlusion
-            elif "Low flow" in self.warning_label.text():
-                # Medium priority - flow issue
-                winsound.Beep(1200, 200)
-            elif "Battery" in self.warning_label.text():
-                # Lower priority - battery warning
-                winsound.Beep(900, 200)
-            else:
-                # Generic alarm
-                winsound.Beep(1000, 200)
-        except Exception as e:
-            print(f"Error in play_alarm_sound: {e}")
-            # Fallback for platforms without winsound
-            print("BEEP! Alarm activated")
-
-    def stop_alarm(self):
-        """Stop the alarm sound"""
-        self.alarm_active = False
-        self.alarm_sound_timer.stop()
-        # Reset flashing elements
-        if "BLOOD LEAKAGE" not in self.status_display.text() and not self.occlusion_detected:
-             self.status_display.setStyleSheet("color: green; border: 2px solid gray; padding: 5px;")
-        if self.battery_level < 20:
-            self.battery_label.setStyleSheet("color: red;")
-        else:
-            self.battery_label.setStyleSheet("color: white;")
+    def show_alarm(self, alarm_type):
+        """Offer to silence the alarm; render() flashes the matching UI element"""
+        self.silence_alarm_button.setEnabled(True)
+
+    def sound_alarms(self, state):
+        """Have the audio engine sound the raised alarms of a published state"""
+        if state.alarms == self.alarms_sounding:
+            return
+        self.alarms_sounding = state.alarms
+        # Returns at once: the audio engine repeats the most urgent alarm's tone every 500 ms
+        timed = self.latency.enabled
+        if timed:
+            started = time.perf_counter()
+        self.audio.set_alarms(state.alarms)
+        if timed:
+            self.latency.since("audio", started)
 
     def silence_alarm(self):
         """Silence the current alarm"""
-        self.stop_alarm()
+        self.monitor.stop_alarm()
         self.silence_alarm_button.setEnabled(False)
-        self.warning_label.setText(self.warning_label.text() + " (Alarm silenced)")
+        self.show_warning(self.warning_text + " (Alarm silenced)")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.finish_startup()
+
+    def finish_startup(self):
+        """After the first paint: load what the first frame did not need, off the GUI thread."""
+        if self.monitor.history is None:
+            threading.Thread(target=self.load_history, name="HistoryLoader", daemon=True).start()
+
+    def load_history(self):
+        # Importing NumPy takes longer than showing the rest of the window; until it is
+        # done the trend is blank and samples are not kept for it
+        from volume.history import TelemetryHistory
+        self.history_loaded.emit(TelemetryHistory(HISTORY_SAMPLES))
+
+    def use_history(self, history):
+        # GUI thread, so it cannot race use_monitor(); a monitor's own history is kept
+        if self.monitor.history is None:
+            self.monitor.history = history
+        self.trend.history = self.monitor.history
 
     def closeEvent(self, event):
-        self.monitoring = False
-        self.stop_alarm()
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        if self.latency_dump:
+            self.latency.dump(self.latency_dump, self.latency_counters())
+        self.monitor.stop()
+        self.scheduler.close()
+        self.scheduler_timer.stop()
+        self.audio.close()
+        if self.monitor.store is not None:
+            self.monitor.store.close()
         event.accept()
 
 
-# Run the Application
-if __name__ == "__main__":
+def main(ports=None, latency_dump=None, metrics_port=None, fanout_port=None, worker=False):
     app = QApplication(sys.argv)
 
     # Uncomment if you have qt_material installed
     # qt_material.apply_stylesheet(app, theme="dark_blue.xml")
 
-    window = InfusionPumpGUI()
+    if worker:
+        # Ingest, detection, archive and alarm tones run in a separate process that
+        # shares samples through shared memory; this window only displays them. The
+        # worker module needs NumPy, so the window is painted (with an idle stand-in
+        # monitor) before the monitor for the worker is created
+        window = InfusionPumpGUI(audio=AudioEngine(NullBackend()), latency_dump=latency_dump)
+        window.show()
+        app.processEvents()
+        from volume.worker import RemoteMonitor
+        monitor = RemoteMonitor(audio=AudioEngine(), ports=ports, capture_dir="captures", store="telemetry.db",
+                                port_cache=default_cache_path(), metrics_port=metrics_port, fanout_port=fanout_port)
+        window.use_monitor(monitor)
+        try:
+            return app.exec_()
+        finally:
+            monitor.close()
+            monitor.audio.close()
+
+    # Every session is recorded so field incidents can be replayed later, and its
+    # telemetry and alarms archived for handover and audits
+    from volume.store import TelemetryStore
+    window = InfusionPumpGUI(PumpMonitor(ports=ports, capture_dir="captures",
+                                         store=TelemetryStore("telemetry.db"), port_cache=default_cache_path()),
+                             latency_dump=latency_dump)
+    # Optional Prometheus endpoint; scrapes are answered off the GUI thread
+    metrics = None
+    if metrics_port is not None:
+        from volume.metrics import MetricsServer, monitor_source
+        metrics = MetricsServer([monitor_source(window.monitor)], port=metrics_port).start()
+    # Optional live feed for remote viewers, from this window's one serial connection
+    hub = None
+    if fanout_port is not None:
+        from volume.fanout import TelemetryHub
+        hub = TelemetryHub(port=fanout_port).start()
+        hub.attach(window.monitor)
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    try:
+        return app.exec_()
+    finally:
+        if metrics is not None:
+            metrics.close()
+        if hub is not None:
+            hub.close()
+
+
+# Run the Application
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VoluME infusion pump monitor")
+    parser.add_argument("--port", action="append",
+                        help="serial port to try (repeatable), e.g. a volume.simulator pty")
+    parser.add_argument("--latency-dump", metavar="JSON",
+                        help="record per-stage latencies and write them to this file on exit")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on localhost:PORT/metrics")
+    parser.add_argument("--fanout-port", type=int, metavar="PORT",
+                        help="publish live telemetry to remote viewers on localhost:PORT")
+    parser.add_argument("--worker", action="store_true",
+                        help="run ingest and alarms in a separate process sharing memory with the window")
+    args, _ = parser.parse_known_args()
+    sys.exit(main(args.port, args.latency_dump, args.metrics_port, args.fanout_port, args.worker))
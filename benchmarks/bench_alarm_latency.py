@@ -0,0 +1,55 @@
+"""Throughput and alarm latency against the virtual pump (no hardware needed).
+
+Starts volume.simulator.VirtualPump on a pty, connects a PumpMonitor to it
+through pyserial exactly as the GUI does, and reports frames/s received and
+the delay from each scripted fault starting to its alarm being raised, over
+the text protocol and then the binary one (which must be negotiated).
+Linux/macOS with pyserial installed. Run from the repository root:
+
+    python benchmarks/bench_alarm_latency.py [rate_hz ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.simulator import Episode, VirtualPump  # noqa: E402
+
+ALARMS = {"occlusion": "occlusion", "blood_leak": "blood_leakage"}
+
+
+def run(rate, binary, seconds=4.0):
+    pump = VirtualPump(rate=rate, episodes=[Episode("occlusion", 1.5, 1.0)], binary_capable=binary, seed=1)
+    pump.start()
+    monitor = PumpMonitor(ports=(pump.port_name,), binary=binary)
+    alarms = []
+    monitor.subscribe(lambda event, data: alarms.append((data, time.monotonic())) if event == "alarm" else None)
+    if not monitor.start():
+        pump.close()
+        raise SystemExit(f"Could not open {pump.port_name}")
+    time.sleep(seconds)
+    stats = monitor.reader.stats
+    frames, protocol = stats.frames, stats.protocol
+    monitor.stop()
+    pump.close()
+    if binary and protocol != "BIN":
+        # Otherwise the binary rows would silently measure the text protocol again
+        raise SystemExit(f"binary protocol was not negotiated ({protocol} at {rate:g} Hz)")
+
+    latencies = []
+    for kind, started in pump.episode_log:
+        raised = [t for alarm, t in alarms if alarm == ALARMS[kind] and t >= started]
+        if raised:
+            latencies.append((raised[0] - started) * 1000)
+    latency = f"{latencies[0]:7.1f} ms" if latencies else "   none"
+    print(f"{rate:7g} Hz  {protocol:<4}  {frames / seconds:8.1f} frames/s received "
+          f"(sent {pump.samples_sent / seconds:8.1f}/s)  occlusion alarm after {latency}")
+
+
+if __name__ == "__main__":
+    rates = [float(arg) for arg in sys.argv[1:]] or [2, 20, 50, 100]
+    for binary in (False, True):
+        for rate in rates:
+            run(rate, binary)
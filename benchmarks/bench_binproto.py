@@ -0,0 +1,52 @@
+"""Benchmark: binary frame decoding throughput and wire size against the text protocol.
+
+Run from the repository root:
+
+    python benchmarks/bench_binproto.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.binproto import BinaryDecoder, encode_frame  # noqa: E402
+from volume.protocol import LineDecoder  # noqa: E402
+
+FRAMES = 5000
+
+
+def make_streams():
+    binary = b"".join(encode_frame(i, "NORMAL", 180, 12.4 + (i % 7) / 10, 310, 420, 515)
+                      for i in range(FRAMES))
+    text = b"".join(b"Status: NORMAL | Pump Speed: 180 | Flow Rate: %.2f mL/min\r\n" % (12.4 + (i % 7) / 10)
+                    for i in range(FRAMES))
+    return binary, text
+
+
+def bench(decoder_class, stream):
+    best = min(timeit.repeat(lambda: decoder_class().feed(stream), number=1, repeat=7))
+    return FRAMES / best
+
+
+def bench_single(decoder_class, stream, size):
+    # One frame per read, as at the firmware's normal rate
+    reads = [stream[i:i + size] for i in range(0, len(stream), size)]
+
+    def run():
+        feed = decoder_class().feed
+        for read in reads:
+            feed(read)
+    return FRAMES / min(timeit.repeat(run, number=1, repeat=7))
+
+
+if __name__ == "__main__":
+    binary, text = make_streams()
+    print(f"bytes/sample   text: {len(text) / FRAMES:6.1f}   binary: {len(binary) / FRAMES:6.1f}")
+    print(f"max rate @9600 text: {960 / (len(text) / FRAMES):6.1f}/s binary: {960 / (len(binary) / FRAMES):6.1f}/s")
+    print(f"decode, {FRAMES} frames per read:")
+    print(f"  text   : {bench(LineDecoder, text):12,.0f} frames/s")
+    print(f"  binary : {bench(BinaryDecoder, binary):12,.0f} frames/s")
+    print("decode, 1 frame per read:")
+    print(f"  text   : {bench_single(LineDecoder, text, len(text) // FRAMES):12,.0f} frames/s")
+    print(f"  binary : {bench_single(BinaryDecoder, binary, len(binary) // FRAMES):12,.0f} frames/s")
@@ -0,0 +1,155 @@
+"""Benchmark: blood leak classification over recorded sessions.
+
+Each device gets a synthetic session recorded as a binary-protocol capture.
+The sessions differ in sensor sensitivity per channel, ambient light (a
+warm tint that drifts and steps when room lights switch), 3% reading noise,
+0.1% bubble readings and 10 s blood leaks of varying concentration every
+20 minutes. Each session is replayed from its capture (decode only), then
+scored four ways: the firmware's red-is-largest rule, the host detector
+with the default calibration, and the host detector calibrated on the
+session's first 30 s, without and with a dark reading (ambient light
+alone, taken before the session). The report gives false alarms per hour,
+the share of time alarmed without a leak, leaks detected with their mean
+delay, and decode and classification throughput.
+Other captures can be scored too, with their truth unknown. Needs NumPy.
+Run from the repository root:
+
+    python benchmarks/bench_blood.py [hours] [rate_hz] [devices] [capture.vcap ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.binproto import encode_frame  # noqa: E402
+from volume.blood import BloodClassifier, BloodLeakDetector, ColorCalibration, capture_colors, detect_blood  # noqa: E402
+from volume.capture import CaptureWriter  # noqa: E402
+from volume.simulator import BLOOD_RGB, NORMAL_RGB  # noqa: E402
+
+SCALE = 1e5  # intensity * pulse width (us)
+TINT = np.array([1.0, 0.6, 0.4])   # incandescent room light is mostly red
+PREAMBLE = b"Enter a pump speed (0-255) or type 'auto' for color-based control.\r\nProtocols: TEXT BIN\r\n" \
+           b"Protocol active: BIN\r\n"
+BATCH = 10   # frames per capture record, like a reader's batch
+
+
+def synthetic_session(path, seconds, rate, seed):
+    """Record a session to path; returns the truth (bool per sample) and 30 s of dark readings."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    led = SCALE / np.array(NORMAL_RGB) * rng.lognormal(0.0, 0.35, 3)
+    leak = np.array(NORMAL_RGB) / np.array(BLOOD_RGB)
+    # Ambient light: a slow drift plus room lights switching every 15-45 minutes
+    level = rng.uniform(0.05, 0.6) * led.mean()
+    drift = 1.0 + 0.5 * np.sin(2 * np.pi * t / rng.uniform(1800, 7200) + rng.uniform(0, 2 * np.pi))
+    switches = np.cumsum(rng.uniform(900, 2700, int(seconds / 900) + 2))
+    lights = (np.searchsorted(switches, t) % 2) * 0.3 * led.mean()
+    ambient = (level * drift + lights)[:, None] * TINT
+
+    transmission = np.ones((n, 3))
+    truth = np.zeros(n, dtype=bool)
+    for start in np.arange(300, seconds - 10, 1200) * rate:
+        start = int(start)
+        end = start + 10 * rate
+        transmission[start:end] = 1.0 + rng.uniform(0.5, 1.0) * (leak - 1.0)
+        truth[start:end] = True
+    bubbles = rng.random(n) < 0.001
+    transmission[bubbles] = rng.uniform(0.2, 3.0, (int(bubbles.sum()), 3))
+
+    intensity = (led * transmission + ambient) * rng.normal(1.0, 0.03, (n, 3))
+    widths = np.clip(SCALE / np.maximum(intensity, 1.0), 1, 65535).astype(int).tolist()
+
+    # The sensor's LEDs covered before the session: ambient light alone
+    dark = np.clip(SCALE / (ambient[:30 * rate] * rng.normal(1.0, 0.03, (30 * rate, 3))), 1, 65535)
+
+    writer = CaptureWriter(path)
+    started = time.time() - seconds
+    writer.record(PREAMBLE, timestamp=started)
+    for first in range(0, n, BATCH):
+        chunk = b"".join(encode_frame(i, "NORMAL", 180, 12.0, *widths[i]) for i in range(first, min(n, first + BATCH)))
+        writer.record(chunk, timestamp=started + first / rate)
+    writer.close()
+    return truth, dark.T
+
+
+def firmware_rule(red, green, blue):
+    """finalcode1.ino: map(width, 30, 1000, 255, 0) per channel, blood if red is the largest."""
+    def mapped(width):
+        return np.trunc((width - 30) * -255 / 970) + 255
+    r, g, b = mapped(red), mapped(green), mapped(blue)
+    return (r >= g) & (r >= b)
+
+
+def score(state, truth, rate, hours):
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], state, [False])).astype(np.int8)))
+    runs = list(zip(edges[::2], edges[1::2]))
+    false = sum(1 for start, end in runs if not truth[start:end].any())
+    onsets = np.flatnonzero(np.diff(np.concatenate(([False], truth)).astype(np.int8)) == 1)
+    delays = []
+    for onset in onsets:
+        hits = np.flatnonzero(state[onset:onset + 12 * rate])
+        if len(hits):
+            delays.append(hits[0] / rate)
+    delay = f"{np.mean(delays) * 1000:6.0f} ms" if delays else "     n/a"
+    wrong = 100 * np.count_nonzero(state & ~truth) / len(state)
+    return (f"false alarms {false / hours:8.1f}/h  alarm without leak {wrong:6.2f}% of the time  "
+            f"leaks {len(delays):2d}/{len(onsets):<2d}  mean delay {delay}")
+
+
+def classify(path, truth, rate, dark=None):
+    started = time.perf_counter()
+    _, red, green, blue = capture_colors(path)
+    decode = time.perf_counter() - started
+    n = len(red)
+    hours = n / rate / 3600
+
+    started = time.perf_counter()
+    default = detect_blood(red, green, blue)
+    batched = time.perf_counter() - started
+
+    detector = BloodLeakDetector()
+    started = time.perf_counter()
+    for first in range(0, min(n, 100_000), BATCH):
+        detector.update(red[first:first + BATCH], green[first:first + BATCH], blue[first:first + BATCH])
+    streamed = (time.perf_counter() - started) / (min(n, 100_000) / BATCH)
+
+    head = slice(0, int(30 * rate))
+    calibration = ColorCalibration.fit(red[head], green[head], blue[head])
+    calibrated = detect_blood(red, green, blue, BloodLeakDetector(BloodClassifier(calibration)))
+    if dark is not None:
+        calibration = ColorCalibration.fit(red[head], green[head], blue[head], dark)
+        darkened = detect_blood(red, green, blue, BloodLeakDetector(BloodClassifier(calibration)))
+
+    print(f"  {n:,} readings: replay decode {n / decode:9,.0f}/s, batch classify {n / batched:11,.0f}/s, "
+          f"streaming {streamed * 1e6:.0f} us per {BATCH}-reading batch")
+    if truth is None:
+        print(f"  episodes: firmware {int(np.count_nonzero(np.diff(firmware_rule(red, green, blue).astype(np.int8)) == 1))}, "
+              f"default {int(np.count_nonzero(np.diff(default.astype(np.int8)) == 1))}, "
+              f"calibrated {int(np.count_nonzero(np.diff(calibrated.astype(np.int8)) == 1))}")
+        return
+    print(f"  firmware rule       : {score(firmware_rule(red, green, blue), truth, rate, hours)}")
+    print(f"  host, default cal.  : {score(default, truth, rate, hours)}")
+    print(f"  host, calibrated    : {score(calibrated, truth, rate, hours)}")
+    if dark is not None:
+        print(f"  host, cal. + dark   : {score(darkened, truth, rate, hours)}")
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    devices = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    captures = sys.argv[4:]
+    with tempfile.TemporaryDirectory() as tmp:
+        for device in range(devices):
+            path = os.path.join(tmp, f"device-{device}.vcap")
+            truth, dark = synthetic_session(path, int(hours * 3600), rate, seed=device + 1)
+            print(f"device {device}: {hours:g} h at {rate} Hz, synthetic ({os.path.getsize(path) / 1e6:.1f} MB capture)")
+            classify(path, truth, rate, dark)
+    for path in captures:
+        print(f"{path}: truth unknown, rate taken as {rate} Hz")
+        classify(path, None, rate)
@@ -0,0 +1,98 @@
+"""Benchmark: occlusion detector cost, batch tuning speed and alarm flapping.
+
+A synthetic session (default: 10 hours at 50 Hz) of noisy flow readings with
+short dropouts and real occlusion episodes is scored three ways: the old
+single-sample rule, the streaming OcclusionDetector and detect_occlusions()
+over the whole arrays, followed by a small threshold sweep. Needs NumPy.
+Run from the repository root:
+
+    python benchmarks/bench_detector.py [hours] [rate]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.detector import FlowModel, OcclusionDetector, detect_occlusions  # noqa: E402
+
+
+def synthetic_session(samples, rate, seed=1):
+    """(power, flow, truth): noisy flow with 1-2 sample dropouts and 20 s occlusions."""
+    rng = np.random.default_rng(seed)
+    power = np.repeat(rng.choice([120, 180, 240], samples // (600 * rate) + 1), 600 * rate)[:samples]
+    flow = np.maximum(0.0, power / 255 * 20 + rng.normal(0.0, 1.5, samples))
+    dropouts = rng.integers(0, samples, samples // (30 * rate))
+    flow[dropouts] = rng.uniform(0.0, 1.0, len(dropouts))
+    truth = np.zeros(samples, dtype=bool)
+    for start in range(300 * rate, samples, 1800 * rate):
+        end = start + 20 * rate
+        flow[start:end] = rng.uniform(0.0, 0.6, len(flow[start:end]))
+        truth[start:end] = True
+    return power.astype(np.float64), flow, truth
+
+
+def transitions(state):
+    return int(np.count_nonzero(state[1:] != state[:-1]))
+
+
+def score(state, truth, rate):
+    onsets = np.flatnonzero(truth[1:] & ~truth[:-1]) + 1
+    delays = []
+    for onset in onsets:
+        hits = np.flatnonzero(state[onset:onset + 20 * rate])
+        delays.append(hits[0] / rate if len(hits) else None)
+    detected = [d for d in delays if d is not None]
+    return {
+        "transitions": transitions(state),
+        "false_samples": int(np.count_nonzero(state & ~truth)),
+        "detected": f"{len(detected)}/{len(onsets)}",
+        "mean_delay_s": round(float(np.mean(detected)), 3) if detected else None,
+    }
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    samples = int(hours * 3600 * rate)
+    power, flow, truth = synthetic_session(samples, rate)
+    print(f"{samples:,} samples ({hours:g} h at {rate} Hz)")
+
+    # The old rule: occluded while flow <= 1 at power > 50, cleared by any flow > 1
+    legacy = np.zeros(samples, dtype=bool)
+    state = False
+    for i, (p, f) in enumerate(zip(power.tolist(), flow.tolist())):
+        if f <= 1.0 and p > 50:
+            state = True
+        elif f > 1.0:
+            state = False
+        legacy[i] = state
+    print(f"  single-sample rule : {score(legacy, truth, rate)}")
+
+    streamed = min(samples, 500_000)
+    detector = OcclusionDetector()
+    start = time.perf_counter()
+    stream_state = np.fromiter((detector.update(p, f) for p, f in
+                                zip(power[:streamed].tolist(), flow[:streamed].tolist())), bool, streamed)
+    per_sample = (time.perf_counter() - start) / streamed
+    print(f"  streaming detector : {per_sample * 1e6:.2f} us/sample")
+
+    start = time.perf_counter()
+    batch = detect_occlusions(power, flow)
+    elapsed = time.perf_counter() - start
+    assert (batch[:streamed] == stream_state).all(), "batch and streaming decisions differ"
+    print(f"  batch detector     : {elapsed:.2f} s ({samples / elapsed:,.0f} samples/s)"
+          f" {score(batch, truth, rate)}")
+
+    model = FlowModel.fit(power[~truth], flow[~truth])
+    print(f"  fitted model       : flow = {model.gain:.4f} * power + {model.offset:.3f}")
+    print("threshold sweep (drift, threshold, confirm):")
+    start = time.perf_counter()
+    for drift in (0.3, 0.5):
+        for threshold in (0.4, 1.0):
+            for confirm in (1, 2, 4):
+                candidate = OcclusionDetector(model, drift=drift, threshold=threshold, confirm=confirm)
+                print(f"  {drift:.1f} {threshold:.1f} {confirm} {score(detect_occlusions(power, flow, candidate), truth, rate)}")
+    print(f"sweep took {time.perf_counter() - start:.1f} s")
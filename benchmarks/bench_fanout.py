@@ -0,0 +1,139 @@
+"""Load test: telemetry fan-out to hundreds of local subscribers.
+
+The publisher (this process) feeds synthetic status frames through
+PumpMonitor.process_frames for several pumps, with a TelemetryHub attached
+to each. Subscriber processes open many TelemetryViewer connections each
+and measure delivery latency (publish time to receipt). One extra
+subscriber connects and never reads, to show a stalled viewer is held
+back (and resynced once it reads again) instead of slowing ingest.
+Reports frames ingested, delivery latency, resyncs and the publisher
+process's CPU use for each subscriber count.
+Linux/macOS. Run from the repository root:
+
+    python benchmarks/bench_fanout.py [pumps] [rate_hz] [seconds] [subscribers ...]
+"""
+import multiprocessing
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.fanout import TelemetryHub, TelemetryViewer  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.protocol import StatusFrame  # noqa: E402
+
+SUBSCRIBER_PROCESSES = 4
+
+
+def subscribe(port, count, seconds, ready, results):
+    """Subscriber process: count viewers on one selector; reports latencies in ms."""
+    latencies = []
+    viewers = []
+    selector = selectors.DefaultSelector()
+
+    def record(pump_id, message):
+        if pump_id is not None:
+            latencies.append((time.time() - message["time"]) * 1000)
+
+    for _ in range(count):
+        viewer = TelemetryViewer("127.0.0.1", port, record)
+        viewer.sock.setblocking(False)
+        selector.register(viewer.sock, selectors.EVENT_READ, viewer)
+        viewers.append(viewer)
+    ready.put(count)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for key, _ in selector.select(0.1):
+            try:
+                data = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            if data:
+                key.data.feed(data)
+    results.put((latencies, sum(viewer.resyncs - 1 for viewer in viewers)))
+    for viewer in viewers:
+        viewer.close()
+
+
+def run(pumps, rate, seconds, subscribers):
+    # Small per-subscriber buffers, so the stalled viewer is resynced within the run
+    hub = TelemetryHub(port=0, max_buffered=4096, send_buffer=4096).start()
+    monitors = [PumpMonitor(pump_id=f"bed-{i}") for i in range(pumps)]
+    for monitor in monitors:
+        hub.attach(monitor)
+
+    context = multiprocessing.get_context("fork")
+    ready, results = context.Queue(), context.Queue()
+    processes = []
+    shares = [subscribers // SUBSCRIBER_PROCESSES + (i < subscribers % SUBSCRIBER_PROCESSES)
+              for i in range(SUBSCRIBER_PROCESSES)]
+    for share in shares:
+        if share:
+            process = context.Process(target=subscribe, args=(hub.port, share, seconds + 1.0, ready, results))
+            process.start()
+            processes.append(process)
+    for _ in processes:
+        ready.get()
+    # Never reads; a small receive window makes its backlog reach the hub quickly
+    stalled = socket.socket()
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(("127.0.0.1", hub.port))
+
+    stop = threading.Event()
+    fed = [0]
+
+    def feed():
+        interval = 1.0 / rate
+        next_time = time.perf_counter()
+        step = 0
+        while not stop.is_set():
+            step += 1
+            for i, monitor in enumerate(monitors):
+                monitor.process_frames([StatusFrame("NORMAL", 180, 12.0 + (step + i) % 40 / 10)])
+            fed[0] += pumps
+            next_time += interval
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    feeder.start()
+    time.sleep(seconds)
+    stop.set()
+    feeder.join()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies, resyncs = [], 0
+    for _ in processes:
+        values, count = results.get()
+        latencies += values
+        resyncs += count
+    for process in processes:
+        process.join()
+    held_back = hub.stats.lagging
+    stalled.close()
+    hub.close()
+
+    latencies.sort()
+    if latencies:
+        latency = (f"latency p50 {latencies[len(latencies) // 2]:6.2f} ms  "
+                   f"p99 {latencies[int(len(latencies) * 0.99)]:6.2f} ms")
+    else:
+        latency = "latency      n/a"
+    print(f"{subscribers:5d} subscribers  {fed[0] / wall:7.0f} frames/s in  {len(latencies) / wall:9.0f} deltas/s out  "
+          f"{latency}  CPU {100 * cpu / wall:5.1f}%  resyncs {resyncs}  stalled held back {held_back}")
+
+
+if __name__ == "__main__":
+    pumps = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    counts = [int(arg) for arg in sys.argv[4:]] or [0, 100, 300, 500]
+    print(f"{pumps} pumps at {rate:g} Hz, {seconds:g} s per run, publisher CPU includes the frame feeder")
+    for count in counts:
+        run(pumps, rate, seconds, count)
@@ -0,0 +1,85 @@
+"""Benchmark: telemetry history memory, fill rate and trend draw time at 1e5 and 1e7 samples.
+
+Draw time is measured twice: decimate() alone, and a full TrendChart paint
+into an offscreen widget when PyQt5 is installed. The Python-list figure is
+what the same columns would cost as a list of per-sample tuples. Needs NumPy.
+Run from the repository root:
+
+    python benchmarks/bench_history.py [pixels]
+"""
+import os
+import sys
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.history import TelemetryHistory  # noqa: E402
+
+SIZES = (10 ** 5, 10 ** 7)
+BATCH = 10 ** 5
+RATE = 50.0  # samples per second in the synthetic session
+KEEP = []
+
+
+def list_bytes(samples):
+    """Approximate size of the same samples as a list of (time, flow, pwm, status) tuples."""
+    row = (time.time(), 12.34, 180, 0)
+    per_row = sys.getsizeof(row) + sys.getsizeof(row[0]) + sys.getsizeof(row[1]) + 8  # list slot
+    return samples * per_row
+
+
+def filled(samples):
+    history = TelemetryHistory(samples)
+    rng = np.random.default_rng(1)
+    start = time.time() - samples / RATE
+    began = time.perf_counter()
+    for first in range(0, samples, BATCH):
+        count = min(BATCH, samples - first)
+        times = start + np.arange(first, first + count) / RATE
+        history.extend(times, 12 + 3 * np.sin(times / 600) + rng.normal(0, 1, count),
+                       np.full(count, 180), np.zeros(count))
+    return history, samples / (time.perf_counter() - began)
+
+
+def chart_painter(history):
+    """A paint function for an offscreen TrendChart, or None without PyQt5."""
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        import VoluME
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    chart = VoluME.TrendChart(history)
+    KEEP.append((app, chart))  # Qt deletes widgets whose application is collected
+    chart.resize(PIXELS, 150)
+    chart.set_window(history.span()[1] - history.span()[0])
+    chart.show()
+    app.processEvents()
+    return chart.repaint
+
+
+def best_ms(function, repeat=20):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+if __name__ == "__main__":
+    PIXELS = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    for samples in SIZES:
+        history, fill_rate = filled(samples)
+        start, end = history.span()
+        print(f"{samples:>12,} samples ({samples / RATE / 3600:.1f} h at {RATE:g} Hz)")
+        print(f"  memory        : {history.nbytes / 1e6:8.1f} MB (as Python tuples: ~{list_bytes(samples) / 1e6:,.0f} MB)")
+        print(f"  fill          : {fill_rate:12,.0f} samples/s")
+        points = len(history.decimate(start, end, PIXELS)[0]) * 2
+        print(f"  decimate all  : {best_ms(lambda: history.decimate(start, end, PIXELS)):8.2f} ms -> {points} points")
+        last_hour = end - 3600
+        print(f"  decimate 1 h  : {best_ms(lambda: history.decimate(last_hour, end, PIXELS)):8.2f} ms")
+        paint = chart_painter(history)
+        if paint is None:
+            print("  chart paint   :      n/a (PyQt5 not installed)")
+        else:
+            print(f"  chart paint   : {best_ms(paint):8.2f} ms")
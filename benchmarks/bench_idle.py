@@ -0,0 +1,121 @@
+"""Benchmark: wakeups and CPU time of an idle VoluME.
+
+Three measurements, each over the same number of seconds:
+
+- the serial reader on a silent pseudo-terminal, with the port's 0.1 s
+  read timeout (as before) and with its idle timeout and cancellable reads;
+- an offscreen InfusionPumpGUI with no pump: shown (as started, overlay
+  off), shown with the latency overlay and its stall sampling on, and
+  minimized, next to the QTimers the scheduler replaced (10 s battery,
+  1 s battery check, 100 ms stall). Measuring starts once the trend
+  history, loaded after the first paint, is ready;
+- a threaded Scheduler with a battery step, a watchdog and a flush task
+  whose deadlines drift against each other, counting wakeups against runs.
+
+CPU is process time over the interval. Linux/macOS with PyQt5 and
+pyserial. Run from the repository root:
+
+    python benchmarks/bench_idle.py [seconds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import serial  # noqa: E402
+from PyQt5.QtCore import QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import VoluME  # noqa: E402
+from volume.audio import AudioEngine, NullBackend  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.reader import SerialReader  # noqa: E402
+from volume.scheduler import Scheduler  # noqa: E402
+
+KEEP = []
+
+
+def measure(seconds, run):
+    cpu, wall = time.process_time(), time.monotonic()
+    run(seconds)
+    return (time.process_time() - cpu) / (time.monotonic() - wall) * 100
+
+
+def silent_reader(seconds, idle_timeout):
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave), 9600, timeout=0.1)
+    reader = SerialReader(port, lambda frames: None, idle_timeout=idle_timeout)
+    reader.start()
+    cpu = measure(seconds, time.sleep)
+    stopping = time.monotonic()
+    reader.stop()
+    reader.join()
+    stopped = time.monotonic() - stopping
+    port.close()
+    os.close(master)
+    os.close(slave)
+    label = f"idle timeout {idle_timeout:g} s" if idle_timeout else "port timeout 0.1 s"
+    print(f"reader, {label:<20} {reader.stats.empty_reads / seconds:6.2f} wakeups/s  "
+          f"CPU {cpu:5.2f}%  stop() took {stopped * 1000:5.1f} ms")
+
+
+def event_loop(app, seconds):
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+
+
+def window(app, seconds):
+    gui = VoluME.InfusionPumpGUI(PumpMonitor(), audio=AudioEngine(NullBackend()))
+    KEEP.append(gui)  # Qt deletes widgets whose application is collected
+    gui.show()
+    while gui.monitor.history is None:   # NumPy loading on its thread is startup, not idle, CPU
+        app.processEvents()
+        time.sleep(0.01)
+    scheduler = gui.scheduler
+    for label in ("shown, overlay off", "shown, overlay on", "minimized, overlay on"):
+        if label == "shown, overlay on":
+            gui.toggle_overlay()
+        elif label.startswith("minimized"):
+            gui.showMinimized()
+            gui.set_idle(True)  # offscreen platforms may not report the state change
+        wakeups, runs = scheduler.wakeups, scheduler.runs
+        cpu = measure(seconds, lambda s: event_loop(app, s))
+        print(f"GUI, {label:<24} {(scheduler.wakeups - wakeups) / seconds:6.2f} "
+              f"wakeups/s  CPU {cpu:5.2f}%  ({(scheduler.runs - runs) / seconds:.2f} task runs/s)")
+    gui.close()
+
+    # The timers the scheduler replaced, which fired whether or not anyone was looking
+    fired = [0]
+    timers = []
+    for interval in (10000, 1000, 100):
+        timer = QTimer()
+        timer.timeout.connect(lambda: fired.__setitem__(0, fired[0] + 1))
+        timer.start(interval)
+        timers.append(timer)
+    cpu = measure(seconds, lambda s: event_loop(app, s))
+    print(f"GUI, {'old QTimers (any state)':<24} {fired[0] / seconds:6.2f} wakeups/s  CPU {cpu:5.2f}%")
+    for timer in timers:
+        timer.stop()
+
+
+def coalescing(seconds):
+    scheduler = Scheduler().start()
+    scheduler.every(10.0, lambda: None, "battery", slack=1.0)
+    scheduler.every(1.0, lambda: None, "watchdog", slack=0.5)
+    scheduler.every(0.7, lambda: None, "flush", slack=0.3)
+    time.sleep(seconds)
+    scheduler.close()
+    print(f"scheduler, 3 drifting tasks    {scheduler.wakeups / seconds:6.2f} wakeups/s  "
+          f"for {scheduler.runs / seconds:.2f} task runs/s ({scheduler.coalesced} runs coalesced)")
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    silent_reader(seconds, None)
+    silent_reader(seconds, 1.0)
+    app = QApplication(sys.argv)
+    KEEP.append(app)
+    window(app, seconds)
+    coalescing(seconds)
@@ -0,0 +1,130 @@
+"""Benchmark: per-stage latency hooks, their overhead and a live run through the GUI.
+
+First pushes a recorded-size stream of status lines through SerialReader and
+PumpMonitor with the latency hooks off and on, to show what they cost. Then,
+on Linux/macOS with PyQt5 and pyserial, connects an offscreen
+InfusionPumpGUI to volume.simulator and reports p50/p99 per stage from bytes
+read to labels updated. Run from the repository root:
+
+    python benchmarks/bench_latency.py [rate_hz] [seconds] [--json latency.json]
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.latency import LatencyProbe  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.reader import SerialReader  # noqa: E402
+
+LINES = 200000
+CHUNK = 640  # bytes per read, about ten status lines
+KEEP = []
+
+
+class BufferPort:
+    """A port that hands out a fixed byte string in chunks, then reports it is done."""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.done = threading.Event()
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return min(CHUNK, len(self.data) - self.offset)
+
+    def read(self, size):
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        if not chunk:
+            self.done.set()
+            time.sleep(0.01)
+        return chunk
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+def ingest_rate(enabled):
+    lines = b"".join(b"Status: NORMAL | Pump Speed: %d | Flow Rate: %.2f mL/min\n" % (180, 12 + i % 50 / 10)
+                     for i in range(LINES))
+    monitor = PumpMonitor(binary=False, latency=LatencyProbe(enabled))
+    port = BufferPort(lines)
+    reader = SerialReader(port, monitor.process_frames, binary=False, latency=monitor.latency)
+    began = time.perf_counter()
+    reader.start()
+    port.done.wait()
+    elapsed = time.perf_counter() - began
+    reader.stop()
+    reader.join()
+    return LINES / elapsed, monitor.latency
+
+
+def live(rate, seconds):
+    """Stage latencies of an offscreen GUI fed by the simulator, or None if that cannot run."""
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        from volume.audio import AudioEngine, NullBackend
+        from volume.simulator import Episode, VirtualPump
+        import VoluME
+    except ImportError as e:
+        print(f"live run skipped: {e}")
+        return None
+    app = QApplication.instance() or QApplication([])
+    pump = VirtualPump(rate=rate, episodes=[Episode("occlusion", seconds / 2, 1.0)], seed=1)
+    pump.start()
+    window = VoluME.InfusionPumpGUI(PumpMonitor(ports=(pump.port_name,)),
+                                    audio=AudioEngine(NullBackend()))
+    KEEP.append((app, window))  # Qt deletes widgets whose application is collected
+    window.show()
+    window.toggle_overlay()
+    window.start_monitoring()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+    report = window.latency.as_dict(window.latency_counters())
+    window.close()
+    pump.close()
+    return report
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:]]
+    dump = None
+    if "--json" in args:
+        index = args.index("--json")
+        dump = args[index + 1]
+        del args[index:index + 2]
+    rate = float(args[0]) if args else 50.0
+    seconds = float(args[1]) if len(args) > 1 else 5.0
+
+    print(f"{LINES:,} text lines through SerialReader + PumpMonitor.process_frames")
+    off, _ = ingest_rate(False)
+    on, probe = ingest_rate(True)
+    print(f"  hooks off : {off:12,.0f} lines/s")
+    print(f"  hooks on  : {on:12,.0f} lines/s ({(off / on - 1) * 100:+.1f}% time)")
+    print(probe.format())
+
+    report = live(rate, seconds)
+    if report is not None:
+        print(f"\nGUI on the simulator at {rate:g} Hz for {seconds:g} s")
+        for stage, stats in report["stages"].items():
+            print(f"  {stage:<11} {stats['count']:7d}  p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms"
+                  f"  max {stats['max_ms']:8.3f} ms")
+        for name, value in report["counters"].items():
+            print(f"  {name:<22} {value}")
+    if dump:
+        with open(dump, "w", encoding="utf-8") as f:
+            json.dump({"ingest_lines_per_s": {"off": off, "on": on},
+                       "ingest_stages": probe.snapshot(), "gui": report}, f, indent=2)
+        print(f"\nwrote {dump}")
@@ -0,0 +1,76 @@
+"""Benchmark: metrics snapshot cost and scrape throughput for 1 to 1000 pumps.
+
+Builds monitors with live-looking ingest counters, serves them from a
+MetricsServer on a free localhost port and hammers /metrics from several
+keep-alive clients at once. Snapshot time grows with the number of pumps
+but is paid once per interval; scrape time only depends on the snapshot
+size. Run from the repository root:
+
+    python benchmarks/bench_metrics.py [seconds] [clients]
+"""
+import http.client
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.metrics import MetricsServer  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.protocol import StatusFrame  # noqa: E402
+from volume.reader import ReaderStats  # noqa: E402
+
+PUMPS = (1, 100, 1000)
+
+
+def fleet(count):
+    pumps = []
+    for i in range(count):
+        monitor = PumpMonitor(ports=(f"/dev/ttyUSB{i}",), pump_id=f"bed-{i:04d}")
+        monitor.process_frames([StatusFrame("NORMAL", 180, 12.5 + i % 7)])
+        stats = ReaderStats()
+        stats.bytes_read, stats.lines, stats.frames = 10 ** 6, 20000, 20000
+        pumps.append((monitor.pump_id, monitor, stats, 0))
+    return lambda: pumps
+
+
+def scraper(port, stop, timings):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    while not stop.is_set():
+        began = time.perf_counter()
+        connection.request("GET", "/metrics")
+        connection.getresponse().read()
+        timings.append(time.perf_counter() - began)
+    connection.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for count in PUMPS:
+        server = MetricsServer([fleet(count)], port=0, interval=1.0).start()
+        builds = []
+        for _ in range(5):
+            began = time.perf_counter()
+            server.refresh()
+            builds.append(time.perf_counter() - began)
+        stop = threading.Event()
+        timings = [[] for _ in range(clients)]
+        threads = [threading.Thread(target=scraper, args=(server.port, stop, timings[i])) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        server.close()
+        scrapes = [t for client in timings for t in client]
+        print(f"{count:5d} pumps: snapshot {min(builds) * 1000:7.2f} ms, {len(server.snapshot) / 1024:7.1f} KiB; "
+              f"{len(scrapes) / seconds:7,.0f} scrapes/s from {clients} clients, "
+              f"p50 {percentile(scrapes, 0.5) * 1000:.2f} ms, p99 {percentile(scrapes, 0.99) * 1000:.2f} ms")
@@ -0,0 +1,79 @@
+"""Micro-benchmark: telemetry lines parsed per second, legacy vs. compiled parser.
+
+Run from the repository root:
+
+    python benchmarks/bench_parser.py [rounds]
+
+The parsers are timed in alternating rounds and the speed-up is the median
+of the per-round ratios, so a noisy machine does not flip the comparison.
+"match only" is the pattern's match() call with nothing done to the result,
+the floor for any parser that runs one regular expression per line.
+"""
+import os
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.protocol import _STATUS_RE, parse_line  # noqa: E402
+
+
+def legacy_parse(raw):
+    """The split/replace parsing that used to live in read_serial_data and update_display."""
+    line = raw.decode('utf-8').strip()
+    if not line:
+        return None
+    if "Status:" in line and "|" in line:
+        parts = line.split('|')
+        if len(parts) >= 3:
+            status = parts[0].strip().replace("Status: ", "")
+            power = parts[1].strip().replace("Pump Speed: ", "")
+            flow = parts[2].strip().replace("Flow Rate: ", "").split(" ")[0]
+            # update_display then converted the strings, some of them twice
+            float(flow)
+            "BLOOD LEAKAGE" in status
+            int(power)
+            if "MANUAL" in status:
+                int(power)
+            float(flow)
+            return status, power, flow
+    elif "BLOOD LEAKAGE DETECTED" in line:
+        return "BLOOD LEAKAGE", "0", "0.0"
+    elif "Switched to AUTO mode" in line:
+        return "AUTO"
+    elif "Manual Mode: Speed Set To" in line:
+        return "MANUAL"
+    return None
+
+
+# Roughly what the firmware sends: status lines with the odd acknowledgement
+SAMPLE = [
+    b"Status: NORMAL | Pump Speed: 180 | Flow Rate: 12.40 mL/min",
+    b"Status: BLOOD LEAKAGE | Pump Speed: 240 | Flow Rate: 15.73 mL/min",
+    b"Status: MANUAL | Pump Speed: 95 | Flow Rate: 0.00 mL/min",
+] * 330 + [
+    b"Manual Mode: Pump Speed Set To 95",
+    b"Switched to AUTO mode (color-based control).",
+] * 5
+
+
+def bench(parse):
+    """Seconds for one pass over SAMPLE, best of three."""
+    def run():
+        for line in SAMPLE:
+            parse(line)
+    return min(timeit.repeat(run, number=5, repeat=3)) / 5
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    parsers = {"legacy split/replace": legacy_parse, "compiled parser": parse_line, "match only": _STATUS_RE.match}
+    times = {name: [] for name in parsers}
+    for _ in range(rounds):
+        for name, parse in parsers.items():
+            times[name].append(bench(parse))
+    for name in parsers:
+        print(f"{name:21s}: {len(SAMPLE) / min(times[name]):12,.0f} lines/s")
+    ratios = [old / new for old, new in zip(times["legacy split/replace"], times["compiled parser"])]
+    print(f"speed-up             : {statistics.median(ratios):12.2f}x (median of {rounds} rounds)")
@@ -0,0 +1,58 @@
+"""Replay throughput: a capture fed at max speed through reader, parser and detection.
+
+Without an argument a synthetic one-hour, 2 Hz text session (with a few
+occlusion episodes) is recorded to a temporary file first. Run from the
+repository root:
+
+    python benchmarks/bench_replay.py [capture.vcap]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.__main__ import EventLogger  # noqa: E402
+from volume.capture import CaptureWriter, ReplayPort  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+
+
+def synthetic_capture(path, seconds=3600, rate=2):
+    writer = CaptureWriter(path)
+    start = time.time() - seconds
+    for i in range(seconds * rate):
+        flow = 0.2 if (i // 600) % 10 == 9 else 12.0 + (i % 7) / 10
+        line = f"Status: NORMAL | Pump Speed: 180 | Flow Rate: {flow:.2f} mL/min\r\n".encode()
+        writer.record(line, timestamp=start + i / rate)
+    writer.close()
+    return seconds * rate
+
+
+def replay(path, render):
+    monitor = PumpMonitor()
+    frames = [0]
+    monitor.subscribe(lambda event, data: frames.__setitem__(0, frames[0] + len(data)) if event == "frames" else None)
+    if render:
+        monitor.subscribe(EventLogger(io.StringIO()))
+    port = ReplayPort(path, speed=0)
+    start = time.perf_counter()
+    monitor.attach(port, path)
+    port.finished.wait()
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+    return frames[0], elapsed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.vcap")
+        synthetic_capture(path)
+    print(f"capture {path}: {os.path.getsize(path):,} bytes")
+    for render in (False, True):
+        frames, elapsed = replay(path, render)
+        label = "parse + detect + text log" if render else "parse + detect"
+        print(f"{label:<26} {frames:8,} frames in {elapsed:6.3f} s = {frames / elapsed:10,.0f} frames/s")
@@ -0,0 +1,121 @@
+"""Benchmark: cold start of the window, with a regression budget.
+
+Each run starts a fresh interpreter that imports VoluME, builds the window
+as VoluME.main() does (archive in a temporary directory) and shows it
+offscreen. Times are measured from just before the process is spawned:
+interpreter up, VoluME imported, window built, first paint, and trend
+history ready (NumPy loads after the first paint). The median of the runs
+is compared with the budget. The modules that are meant to load lazily
+(NumPy, pyserial, the metrics and fan-out servers, the worker, platform
+sound modules) must not be loaded by the first paint. One more run with
+-X importtime lists the slowest imports made by the startup itself. Exits
+with status 1 if the budget is exceeded or a lazy module was loaded early.
+Needs PyQt5.
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [runs] [first_paint_budget_ms]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PAINT_BUDGET_MS = 400   # about twice the median on a 1-CPU build VM (before lazy loading: 410)
+IMPORT_BUDGET_MS = 300
+LAZY_MODULES = ("numpy", "serial", "http.server", "volume.metrics", "volume.fanout", "volume.history",
+                "volume.worker", "volume.supervisor", "winsound", "playsound", "concurrent.futures")
+MARKS = ("interpreter", "import", "window", "first_paint", "history")
+IMPORTS_START = "-- startup imports --"
+
+
+def child(spawned, tmp):
+    marks = {"interpreter": time.time()}
+    print(IMPORTS_START, file=sys.stderr)   # the harness's own imports come before this line
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import VoluME
+    from volume.monitor import PumpMonitor
+    from volume.store import TelemetryStore
+    marks["import"] = time.time()
+
+    app = QApplication([])
+    window = VoluME.InfusionPumpGUI(PumpMonitor(store=TelemetryStore(os.path.join(tmp, "telemetry.db"))))
+    marks["window"] = time.time()
+    early = []
+    finish_startup = window.finish_startup
+
+    def first_paint():
+        # What was loaded when the first frame was drawn, before the deferred loading starts
+        marks["first_paint"] = time.time()
+        early.extend(name for name in LAZY_MODULES if name in sys.modules)
+        finish_startup()
+
+    window.finish_startup = first_paint
+    window.show()
+    while window.monitor.history is None:
+        app.processEvents()
+        time.sleep(0.001)
+    marks["history"] = time.time()
+    window.close()
+    print(json.dumps({"ms": {name: (t - spawned) * 1000 for name, t in marks.items()}, "early": early}))
+
+
+def spawn(tmp, *flags):
+    spawned = time.time()
+    result = subprocess.run([sys.executable, *flags, os.path.abspath(__file__), "--child", repr(spawned), tmp],
+                            cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    if result.returncode:
+        raise SystemExit(f"child failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, count=12):
+    # -X importtime lines: "import time: self [us] | cumulative | name"
+    rows = []
+    for line in stderr.split(IMPORTS_START, 1)[-1].splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.rstrip()))
+    top = [(cumulative, name) for cumulative, name in rows if len(name) - len(name.lstrip()) <= 3]   # top level
+    return sorted(top, reverse=True)[:count]
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(float(sys.argv[2]), sys.argv[3])
+        sys.exit(0)
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else FIRST_PAINT_BUDGET_MS
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            results.append(spawn(tmp)[0])
+        _, importtime = spawn(tmp, "-X", "importtime")
+
+    medians = {name: statistics.median(result["ms"][name] for result in results) for name in MARKS}
+    print(f"{runs} cold starts, median ms from spawn: " +
+          "  ".join(f"{name} {medians[name]:.0f}" for name in MARKS))
+    print("slowest top-level imports (cumulative, one -X importtime run):")
+    for cumulative, name in slowest_imports(importtime):
+        print(f"  {cumulative / 1000:7.1f} ms  {name.strip()}")
+
+    early = sorted({name for result in results for name in result["early"]})
+    failures = []
+    if medians["first_paint"] > budget:
+        failures.append(f"first paint {medians['first_paint']:.0f} ms > budget {budget:.0f} ms")
+    if medians["import"] > IMPORT_BUDGET_MS:
+        failures.append(f"import {medians['import']:.0f} ms > budget {IMPORT_BUDGET_MS} ms")
+    if early:
+        failures.append(f"loaded before the first paint: {', '.join(early)}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    if not failures:
+        print(f"within budget (first paint {budget:.0f} ms, import {IMPORT_BUDGET_MS} ms), no lazy module loaded early")
+    sys.exit(1 if failures else 0)
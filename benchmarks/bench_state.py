@@ -0,0 +1,195 @@
+"""State store fuzzing: the alarm state machine and PumpMonitor's snapshots.
+
+First, random raise / clear / clear-all sequences run through
+AlarmStateMachine and a brute-force reference model (a list scanned on
+every step); any difference in the current alarm or the active list stops
+the run. The same sequences through the old rule (the first alarm holds
+until stopped) count the steps on which a more urgent raised alarm went
+unannounced. Then random frame batches, alarms, clears and battery steps
+drive a PumpMonitor while a subscriber checks every published snapshot:
+versions go up by one, the current alarm is the most urgent, first in the
+list and the last one announced, and each snapshot is the monitor's state
+when delivered.
+Captures given as arguments are replayed through a monitor with the same
+checks. Run from the repository root:
+
+    python benchmarks/bench_state.py [steps] [capture.vcap ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.audio import ALARM_PRIORITIES, alarm_priority  # noqa: E402
+from volume.capture import ReplayPort  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.protocol import StatusFrame  # noqa: E402
+from volume.state import AlarmStateMachine  # noqa: E402
+
+ALARM_TYPES = tuple(ALARM_PRIORITIES) + ("communication_error", "connection_failure", "input_error")
+
+
+def random_ops(steps, seed):
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(steps):
+        roll = rng.random()
+        if roll < 0.55:
+            ops.append(("raise", rng.choice(ALARM_TYPES)))
+        elif roll < 0.95:
+            ops.append(("clear", rng.choice(ALARM_TYPES)))
+        else:
+            ops.append(("clear_all", None))
+    return ops
+
+
+def reference_current(raised):
+    # raised is in raise order; the most urgent wins, the oldest among equals
+    return min(raised, key=lambda alarm: (alarm_priority(alarm), raised.index(alarm))) if raised else None
+
+
+def check_machine(ops):
+    machine = AlarmStateMachine()
+    raised = []
+    old = None
+    masked = 0
+    for step, (op, alarm) in enumerate(ops):
+        if op == "raise":
+            machine.raise_alarm(alarm)
+            if alarm not in raised:
+                raised.append(alarm)
+            old = old or alarm
+        elif op == "clear":
+            machine.clear(alarm)
+            if alarm in raised:
+                raised.remove(alarm)
+            old = None if old == alarm else old
+        else:
+            machine.clear_all()
+            raised.clear()
+            old = None
+        expected = reference_current(raised)
+        active = tuple(sorted(raised, key=alarm_priority))
+        if machine.current != expected or machine.active != active:
+            raise SystemExit(f"step {step} {op}({alarm}): machine {machine.current} {machine.active}, "
+                             f"reference {expected} {active}")
+        if expected is not None and (old is None or alarm_priority(expected) < alarm_priority(old)):
+            masked += 1
+    return masked
+
+
+def machine_throughput(ops):
+    machine = AlarmStateMachine()
+    methods = {"raise": machine.raise_alarm, "clear": machine.clear}
+    start = time.perf_counter()
+    for op, alarm in ops:
+        if alarm is None:
+            machine.clear_all()
+        else:
+            methods[op](alarm)
+    return len(ops) / (time.perf_counter() - start), machine.transitions
+
+
+class SnapshotChecker:
+    """Subscriber asserting the invariants of every published state."""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.last = monitor.state
+        self.snapshots = 0
+        self.announced = False
+        monitor.subscribe(self)
+
+    def __call__(self, event, data):
+        if event in ("alarm", "alarm_stopped"):
+            self.announced = data   # the batch's last announcement is the current alarm
+            return
+        if event != "state":
+            return
+        state = data
+        problems = []
+        announced, self.announced = self.announced, False
+        if announced is not False and announced != state.alarm_type:
+            problems.append(f"announced {announced} but current is {state.alarm_type}")
+        if state.version != self.last.version + 1:
+            problems.append(f"version {self.last.version} -> {state.version}")
+        if state is not self.monitor.state:
+            problems.append("delivered snapshot is not the monitor's state")
+        if state.alarm_type != (state.alarms[0] if state.alarms else None):
+            problems.append(f"current {state.alarm_type} not first of {state.alarms}")
+        if list(state.alarms) != sorted(state.alarms, key=alarm_priority) or len(set(state.alarms)) != len(state.alarms):
+            problems.append(f"alarms out of priority order: {state.alarms}")
+        if not state.changed(self.last):
+            problems.append("snapshot without changes")
+        if problems:
+            raise SystemExit(f"state v{state.version}: " + "; ".join(problems))
+        self.last = state
+        self.snapshots += 1
+
+
+def fuzz_monitor(steps, seed):
+    rng = random.Random(seed)
+    monitor = PumpMonitor()
+    checker = SnapshotChecker(monitor)
+    start = time.perf_counter()
+    for _ in range(steps):
+        roll = rng.random()
+        if roll < 0.6:
+            frames = []
+            for _ in range(rng.randint(1, 10)):
+                status = rng.choice(("NORMAL", "NORMAL", "NORMAL", "BLOOD LEAKAGE", "MANUAL"))
+                flow = rng.choice((0.1, 12.0, 12.5, 13.0))
+                frames.append(StatusFrame(status, rng.choice((0, 180, 240)), flow))
+            monitor.process_frames(frames)
+        elif roll < 0.75:
+            alarm = rng.choice(ALARM_TYPES)
+            monitor.trigger_alarm(alarm)
+            if alarm not in monitor.state.alarms:
+                raise SystemExit(f"raised {alarm} missing from {monitor.state.alarms}")
+        elif roll < 0.9:
+            alarm = rng.choice(ALARM_TYPES)
+            monitor.clear_alarm(alarm)
+            if alarm in monitor.state.alarms:
+                raise SystemExit(f"cleared {alarm} still in {monitor.state.alarms}")
+        elif roll < 0.95:
+            monitor.stop_alarm()
+        else:
+            monitor.drain_battery()
+    elapsed = time.perf_counter() - start
+    return steps / elapsed, checker.snapshots / elapsed, checker.snapshots
+
+
+def replay(path):
+    monitor = PumpMonitor()
+    checker = SnapshotChecker(monitor)
+    frames = [0]
+    monitor.subscribe(lambda event, data: frames.__setitem__(0, frames[0] + len(data)) if event == "frames" else None)
+    port = ReplayPort(path, speed=0)
+    start = time.perf_counter()
+    monitor.attach(port, path)
+    port.finished.wait()
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+    return frames[0], checker.snapshots, elapsed
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    captures = sys.argv[2:]
+
+    ops = random_ops(steps, seed=1)
+    masked = check_machine(ops)
+    rate, transitions = machine_throughput(ops)
+    print(f"alarm state machine: {steps:,} random ops match the reference model, "
+          f"{transitions:,} transitions at {rate:,.0f} ops/s")
+    print(f"old first-alarm-wins rule: a more urgent alarm unannounced on {100 * masked / steps:.1f}% of steps")
+
+    ops_rate, snapshot_rate, snapshots = fuzz_monitor(steps // 4, seed=2)
+    print(f"PumpMonitor fuzz: {steps // 4:,} ops at {ops_rate:,.0f} ops/s, "
+          f"{snapshots:,} snapshots checked at {snapshot_rate:,.0f}/s")
+
+    for path in captures:
+        frames, snapshots, elapsed = replay(path)
+        print(f"{path}: {frames:,} frames, {snapshots:,} snapshots checked, {frames / elapsed:,.0f} frames/s")
@@ -0,0 +1,96 @@
+"""Benchmark: telemetry archive inserts at a target rate while range queries run.
+
+Producer threads stand in for reader threads of several pumps and queue
+batches at a fixed total rate (default 10,000 rows/s) for a fixed time. A
+query thread meanwhile runs the handover queries in a loop: the last minute
+of raw samples of one pump, per-minute flow summaries of the last hour and
+alarm counts. The run passes if the writer keeps up (no drops, backlog
+drained at the end) and reports query latencies. Run from the repository
+root:
+
+    python benchmarks/bench_store.py [rows_per_second] [seconds] [pumps]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.store import TelemetryStore  # noqa: E402
+
+BATCH_SECONDS = 0.05  # how often each producer hands over a batch, like a reader at 20 Hz
+
+
+def producer(store, pump, rate, seconds, stop):
+    interval = BATCH_SECONDS
+    per_batch = max(1, int(rate * interval))
+    started = time.monotonic()
+    sent = 0
+    while not stop.is_set() and time.monotonic() - started < seconds:
+        now = time.time()
+        rows = [(pump, now + i / rate, 0, 180, 12.0 + (sent + i) % 50 / 10) for i in range(per_batch)]
+        store.add_samples(rows)
+        if sent % (per_batch * 100) == 0:
+            store.add_event(pump, "alarm", "occlusion", now)
+        sent += per_batch
+        delay = started + sent / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def querier(store, pump, stop, timings):
+    while not stop.is_set():
+        now = time.time()
+        for name, query in (("last minute, one pump", lambda: store.samples(now - 60, now, pump)),
+                            ("per-minute flow, 1 h", lambda: store.flow_summary(now - 3600, now, bucket=60)),
+                            ("alarm counts, 1 h", lambda: store.alarm_counts(now - 3600, now))):
+            began = time.perf_counter()
+            query()
+            timings.setdefault(name, []).append(time.perf_counter() - began)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+if __name__ == "__main__":
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 10000.0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    pumps = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TelemetryStore(os.path.join(directory, "bench.db"))
+        stop = threading.Event()
+        timings = {}
+        producers = [threading.Thread(target=producer, args=(store, f"pump{i}", rate / pumps, seconds, stop))
+                     for i in range(pumps)]
+        query_thread = threading.Thread(target=querier, args=(store, "pump0", stop, timings))
+        started = time.monotonic()
+        for thread in producers:
+            thread.start()
+        query_thread.start()
+        max_backlog = 0
+        while any(thread.is_alive() for thread in producers):
+            max_backlog = max(max_backlog, store.pending)
+            time.sleep(0.1)
+        produced_for = time.monotonic() - started
+        drained = store.flush(timeout=30)
+        stop.set()
+        query_thread.join()
+        total = time.monotonic() - started
+        size = os.path.getsize(os.path.join(directory, "bench.db"))
+        store.close()
+
+    print(f"{pumps} producers at {rate:,.0f} rows/s total for {seconds:g} s")
+    print(f"  written      : {store.rows_written:,} rows in {store.batches} transactions, "
+          f"{store.rows_written / total:,.0f} rows/s sustained ({produced_for:.1f} s producing)")
+    print(f"  backlog      : max {max_backlog:,} rows, dropped {store.dropped}, "
+          f"drained {'yes' if drained else 'NO'}, slowest commit {store.max_commit_time * 1000:.1f} ms")
+    print(f"  database     : {size / 1e6:.1f} MB")
+    for name, values in timings.items():
+        print(f"  {name:<22}: {len(values):5d} queries  p50 {percentile(values, 0.5) * 1000:7.2f} ms"
+              f"  p99 {percentile(values, 0.99) * 1000:7.2f} ms")
+    sys.exit(0 if drained and not store.dropped else 1)
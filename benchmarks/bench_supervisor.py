@@ -0,0 +1,116 @@
+"""Scaling benchmark: one PumpSupervisor loop serving 1, 8, 32 and 64 simulated pumps.
+
+Each simulated pump is a pipe fed with firmware-format status lines at a
+fixed rate. The benchmark reports frames handled per second, end-to-end
+latency (write to PumpMonitor event) and the supervisor process's CPU use.
+POSIX only. Run from the repository root:
+
+    python benchmarks/bench_supervisor.py [rate_hz] [seconds]
+"""
+import fcntl
+import os
+import struct
+import sys
+import termios
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from volume.supervisor import PumpSupervisor  # noqa: E402
+
+
+class PipePort:
+    """Just enough of the pyserial interface over the read end of a pipe."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.is_open = True
+        os.set_blocking(fd, False)
+
+    def fileno(self):
+        return self.fd
+
+    @property
+    def in_waiting(self):
+        return struct.unpack("i", fcntl.ioctl(self.fd, termios.FIONREAD, b"\0\0\0\0"))[0]
+
+    def read(self, size):
+        try:
+            return os.read(self.fd, size)
+        except BlockingIOError:
+            return b""
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            os.close(self.fd)
+
+
+def run(pumps, rate, seconds):
+    pipes = {f"pump{i}": os.pipe() for i in range(pumps)}
+    sent = {name: {} for name in pipes}
+    latencies = []
+    frames = [0]
+
+    def on_event(pump_id, event, data):
+        if event == "frames":
+            now = time.perf_counter()
+            for frame in data:
+                start = sent[pump_id].pop(frame.power, None)
+                if start is not None:
+                    latencies.append(now - start)
+            frames[0] += len(data)
+
+    supervisor = PumpSupervisor(port_factory=lambda name, baud: PipePort(pipes[name][0]))
+    supervisor.subscribe(on_event)
+    for name in pipes:
+        supervisor.add_pump(name, name)
+    supervisor.start()
+    time.sleep(0.2)
+
+    stop = threading.Event()
+
+    def feed():
+        seq = 0
+        interval = 1.0 / rate
+        next_time = time.perf_counter()
+        while not stop.is_set():
+            seq = seq % 50000 + 1
+            for name, (_, write_fd) in pipes.items():
+                sent[name][seq] = time.perf_counter()
+                os.write(write_fd, b"Status: NORMAL | Pump Speed: %d | Flow Rate: 12.50 mL/min\r\n" % seq)
+            next_time += interval
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    feeder.start()
+    time.sleep(seconds)
+    stop.set()
+    feeder.join()
+    time.sleep(0.1)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    supervisor.stop()
+    for _, write_fd in pipes.values():
+        os.close(write_fd)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan")
+    print(f"{pumps:4d} pumps  {frames[0] / wall:9.0f} frames/s  "
+          f"latency p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  CPU {100 * cpu / wall:5.1f}% "
+          f"(incl. feeder)")
+
+
+if __name__ == "__main__":
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    print(f"{rate:g} Hz per pump, {seconds:g} s per run")
+    for count in (1, 8, 32, 64):
+        run(count, rate, seconds)
@@ -0,0 +1,113 @@
+"""Benchmark: GUI frame pacing with ingest in-process versus in a worker process.
+
+Runs an offscreen InfusionPumpGUI against volume.simulator (in its own
+process, so it competes with neither side) at a high telemetry rate, once
+with PumpMonitor in the GUI process and once with RemoteMonitor and the
+ingest worker. Reports renders per second, the spread of render intervals,
+event-loop stalls and samples ingested. Then kills the worker and reports
+how long the ingest_failure alarm took and how long until the pump was
+connected again. Linux/macOS with PyQt5 and pyserial. Run from the
+repository root:
+
+    python benchmarks/bench_worker.py [rate_hz] [seconds]
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QTimer  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import VoluME  # noqa: E402
+from volume.audio import AudioEngine, NullBackend  # noqa: E402
+from volume.history import TelemetryHistory  # noqa: E402
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.worker import RemoteMonitor  # noqa: E402
+
+KEEP = []
+
+
+def simulator(rate):
+    process = subprocess.Popen([sys.executable, "-m", "volume.simulator", "--rate", str(rate)],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()   # "Virtual pump on /dev/pts/N (Ctrl+C to stop)"
+    return process, line.split()[3]
+
+
+def wait_until(app, condition, timeout=10.0):
+    """Run the event loop until condition() holds; returns the seconds it took, or None."""
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            return None
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(len(values) * fraction)] if values else 0.0
+
+
+def run(app, monitor, seconds):
+    window = VoluME.InfusionPumpGUI(monitor, audio=AudioEngine(NullBackend()))
+    KEEP.append(window)  # Qt deletes widgets whose Python wrapper is collected
+    renders = []
+    render = window.render
+
+    def timed_render():
+        renders.append(time.perf_counter())
+        render()
+
+    window.render = timed_render   # the scheduler's render tasks look it up on the window
+    window.show()
+    window.toggle_overlay()   # turns the stall and render timings on
+    window.start_monitoring()
+    wait_until(app, lambda: monitor.serial_port is not None)
+    window.latency.reset()
+    del renders[:]
+    ingested = monitor.history.total
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    intervals = [(b - a) * 1000 for a, b in zip(renders, renders[1:])]
+    stall = window.latency.snapshot()["stall"]
+    print(f"  renders {len(renders) / seconds:5.1f}/s  interval p50 {percentile(intervals, 0.5):6.1f} ms  "
+          f"p99 {percentile(intervals, 0.99):6.1f} ms  stall p99 {stall['p99_ms']:6.1f} ms  "
+          f"max {stall['max_ms']:6.1f} ms  samples {(monitor.history.total - ingested) / seconds:6.0f}/s")
+    return window
+
+
+if __name__ == "__main__":
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 1000.0
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    app = QApplication.instance() or QApplication([])
+    KEEP.append(app)
+    print(f"offscreen GUI, simulator at {rate:g} Hz, {seconds:g} s per run")
+
+    pump, port = simulator(rate)
+    try:
+        print("ingest in the GUI process")
+        window = run(app, PumpMonitor(ports=(port,), history=TelemetryHistory(VoluME.HISTORY_SAMPLES)), seconds)
+        window.close()
+        wait_until(app, lambda: window.monitor.serial_port is None)
+
+        print("ingest in a worker process")
+        monitor = RemoteMonitor(history=TelemetryHistory(VoluME.HISTORY_SAMPLES), audio=AudioEngine(NullBackend()),
+                                ports=(port,), capture_dir=None)
+        window = run(app, monitor, seconds)
+        os.kill(monitor._process.pid, signal.SIGKILL)
+        alarm = wait_until(app, lambda: window.monitor.alarm_type == "ingest_failure")
+        sounding = "ingest_failure" in monitor.audio._active
+        back = wait_until(app, lambda: monitor.serial_port is not None)
+        print(f"  worker killed: alarm after {alarm * 1000:.1f} ms (sounding: {sounding}), "
+              f"pump reconnected after {alarm + back:.2f} s")
+        window.close()
+        monitor.close()
+    finally:
+        pump.send_signal(signal.SIGINT)
+        pump.wait()
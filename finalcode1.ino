@@ -19,6 +19,18 @@ unsigned long lastTime = 0;   // Time tracking for flow calculation
 int redFreq = 0, greenFreq = 0, blueFreq = 0;
 int pumpSpeed = 0;  // Default speed
 
+// BINARY TELEMETRY (see volume/binproto.py)
+// Frame: seq(u16) status(u8) pwm(u8) flow(u16, 0.01 mL/min) red/green/blue(u16),
+// little-endian, then CRC-16/CCITT-FALSE big-endian, COBS-encoded, 0x00 delimited.
+#define STATUS_NORMAL 0
+#define STATUS_BLOOD  1
+#define STATUS_MANUAL 2
+#define TEXT_INTERVAL_MS 500
+#define BINARY_INTERVAL_MS 20  // 16 bytes/frame -> 800 B/s, fits 9600 baud
+
+bool binaryMode = false;
+uint16_t frameSeq = 0;
+
 void countPulse() {
     pulseCount++;  // Interrupt function to count pulses
 }
@@ -41,6 +53,7 @@ void setup() {
 
     Serial.begin(9600);
     Serial.println("Enter a pump speed (0-255) or type 'auto' for color-based control.");
+    Serial.println("Protocols: TEXT BIN");
 }
 
 void loop() {
@@ -53,36 +66,47 @@ void loop() {
 
         if (input.equalsIgnoreCase("auto")) {
             autoMode = true;
-            Serial.println("Switched to AUTO mode (color-based control).");
+            if (!binaryMode) Serial.println("Switched to AUTO mode (color-based control).");
+        } else if (input.equalsIgnoreCase("bin")) {
+            Serial.println("Protocol active: BIN");
+            binaryMode = true;
+        } else if (input.equalsIgnoreCase("text")) {
+            binaryMode = false;
+            Serial.println("Protocol active: TEXT");
         } else {
             int userSpeed = input.toInt();
             if (userSpeed >= 0 && userSpeed <= 255) {
                 pumpSpeed = userSpeed;
                 autoMode = false;
-                Serial.print("Manual Mode: Pump Speed Set To ");
-                Serial.println(pumpSpeed);
-            } else {
+                // In binary mode the next frame's status/PWM fields are the acknowledgement
+                if (!binaryMode) {
+                    Serial.print("Manual Mode: Pump Speed Set To ");
+                    Serial.println(pumpSpeed);
+                }
+            } else if (!binaryMode) {
                 Serial.println("Invalid input! Enter 0-255 or 'auto'.");
             }
         }
     }
 
-    if (autoMode) {
-        // Read RED
-        digitalWrite(S2, LOW);
-        digitalWrite(S3, LOW);
-        redFreq = pulseIn(sensorOut, LOW);
+    // Colour readings are taken in every mode and streamed raw, so the host can
+    // classify them (volume/blood.py) even while the pump runs in manual mode
+    // Read RED
+    digitalWrite(S2, LOW);
+    digitalWrite(S3, LOW);
+    redFreq = pulseIn(sensorOut, LOW);
 
-        // Read GREEN
-        digitalWrite(S2, HIGH);
-        digitalWrite(S3, HIGH);
-        greenFreq = pulseIn(sensorOut, LOW);
+    // Read GREEN
+    digitalWrite(S2, HIGH);
+    digitalWrite(S3, HIGH);
+    greenFreq = pulseIn(sensorOut, LOW);
 
-        // Read BLUE
-        digitalWrite(S2, LOW);
-        digitalWrite(S3, HIGH);
-        blueFreq = pulseIn(sensorOut, LOW);
+    // Read BLUE
+    digitalWrite(S2, LOW);
+    digitalWrite(S3, HIGH);
+    blueFreq = pulseIn(sensorOut, LOW);
 
+    if (autoMode) {
         // Convert frequencies to RGB values
         int red = map(redFreq, 30, 1000, 255, 0);
         int green = map(greenFreq, 30, 1000, 255, 0);
@@ -112,13 +136,80 @@ void loop() {
         lastTime = currentTime;
     }
 
+    if (binaryMode) {
+        sendBinaryFrame(autoMode ? (pumpSpeed == 240 ? STATUS_BLOOD : STATUS_NORMAL) : STATUS_MANUAL);
+        delay(BINARY_INTERVAL_MS);
+        return;
+    }
+
     // Print all outputs in one line
     Serial.print("Status: "); Serial.print(autoMode ? (pumpSpeed == 240 ? "BLOOD LEAKAGE" : "NORMAL") : "MANUAL");
     Serial.print(" | Pump Speed: "); Serial.print(pumpSpeed);
     Serial.print(" | Flow Rate: "); Serial.print(flowRate, 2);
-    Serial.println(" mL/min");
+    Serial.print(" mL/min | RGB: "); Serial.print(redFreq);
+    Serial.print(" "); Serial.print(greenFreq);
+    Serial.print(" "); Serial.println(blueFreq);
+
+    delay(TEXT_INTERVAL_MS);
+}
+
+uint16_t crc16(const uint8_t *data, size_t len) {
+    uint16_t crc = 0xFFFF;
+    for (size_t i = 0; i < len; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for (uint8_t bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+// COBS-encode len bytes (len < 254) into out, returns the encoded length
+size_t cobsEncode(const uint8_t *in, size_t len, uint8_t *out) {
+    size_t codeIndex = 0, write = 1;
+    uint8_t code = 1;
+    for (size_t read = 0; read < len; read++) {
+        if (in[read] == 0) {
+            out[codeIndex] = code;
+            code = 1;
+            codeIndex = write++;
+        } else {
+            out[write++] = in[read];
+            code++;
+        }
+    }
+    out[codeIndex] = code;
+    return write;
+}
+
+void putU16(uint8_t *buf, uint16_t value) {
+    buf[0] = value & 0xFF;
+    buf[1] = value >> 8;
+}
+
+uint16_t clampU16(long value) {
+    return value < 0 ? 0 : (value > 0xFFFF ? 0xFFFF : value);
+}
 
-    delay(500);
+void sendBinaryFrame(uint8_t status) {
+    uint8_t raw[14];
+    uint8_t out[16];
+
+    putU16(raw, frameSeq++);
+    raw[2] = status;
+    raw[3] = pumpSpeed;
+    putU16(raw + 4, clampU16((long)(flowRate * 100.0 + 0.5)));
+    putU16(raw + 6, clampU16(redFreq));
+    putU16(raw + 8, clampU16(greenFreq));
+    putU16(raw + 10, clampU16(blueFreq));
+
+    uint16_t crc = crc16(raw, 12);
+    raw[12] = crc >> 8;
+    raw[13] = crc & 0xFF;
+
+    size_t n = cobsEncode(raw, sizeof(raw), out);
+    out[n++] = 0;
+    Serial.write(out, n);
 }
 
 void buzzerOn() {
@@ -0,0 +1,89 @@
+import time
+import wave
+
+import pytest
+
+from volume.audio import BATTERY, BLOOD_LEAKAGE, LOW_FLOW, OCCLUSION, AudioEngine, NullBackend
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def engine():
+    engine = AudioEngine(NullBackend(), asset_path=None, cadence=0.01)
+    yield engine
+    engine.close()
+
+
+def tones(engine):
+    return [priority for kind, priority in list(engine.backend.played) if kind == "tone"]
+
+
+def test_the_most_urgent_alarm_is_sounded_and_hands_back(engine):
+    engine.request("low_battery")
+    assert wait_for(lambda: BATTERY in tones(engine))
+    engine.request("occlusion")
+    engine.request("low_flow")
+    assert engine.current == OCCLUSION
+    assert wait_for(lambda: OCCLUSION in tones(engine))
+    switched = len(tones(engine))
+    assert wait_for(lambda: len(tones(engine)) > switched + 3)
+    assert set(tones(engine)[switched:]) == {OCCLUSION}
+
+    engine.cancel("occlusion")
+    assert engine.current == LOW_FLOW
+    assert wait_for(lambda: LOW_FLOW in tones(engine))
+
+
+def test_set_alarms_replaces_the_playing_alarm(engine):
+    engine.set_alarms(["low_flow", "low_battery"])
+    assert wait_for(lambda: LOW_FLOW in tones(engine))
+    engine.set_alarms(["occlusion"])
+    assert engine.current == OCCLUSION
+    assert wait_for(lambda: OCCLUSION in tones(engine))
+    switched = len(tones(engine))
+    assert wait_for(lambda: len(tones(engine)) > switched + 3)
+    assert set(tones(engine)[switched:]) == {OCCLUSION}
+
+    engine.set_alarms([])
+    assert engine.current is None
+    time.sleep(0.05)
+    stopped = len(engine.backend.played)
+    time.sleep(0.05)
+    assert len(engine.backend.played) == stopped
+
+
+def test_blood_leakage_plays_its_asset_instead_of_the_beep(tmp_path):
+    path = str(tmp_path / "leak.wav")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b"\0\0" * 80)
+    engine = AudioEngine(NullBackend(), asset_path=path, cadence=0.01)
+    try:
+        engine.request("blood_leakage")
+        assert wait_for(lambda: engine.backend.played)
+        time.sleep(0.05)
+        assert engine.backend.played == [("asset", path)]
+        assert engine.current == BLOOD_LEAKAGE
+    finally:
+        engine.close()
+
+
+def test_close_joins_the_thread_and_silences_the_engine():
+    engine = AudioEngine(NullBackend(), asset_path=None, cadence=0.01)
+    engine.request("occlusion")
+    assert wait_for(lambda: tones(engine))
+    engine.close()
+    assert not engine._thread.is_alive()
+    assert engine.current is None
+    played = len(engine.backend.played)
+    engine.request("low_flow")
+    time.sleep(0.05)
+    assert len(engine.backend.played) == played
@@ -0,0 +1,77 @@
+from binascii import crc_hqx
+
+import pytest
+
+from volume.binproto import RECORD, BinaryDecoder, cobs_decode, cobs_encode, encode_frame
+
+
+def test_cobs_round_trip():
+    for data in (b"", b"\0", b"\0\0", b"abc\0def", bytes(range(1, 255)), bytes(300), bytes(range(256)) * 2):
+        encoded = cobs_encode(data)
+        assert b"\0" not in encoded
+        assert cobs_decode(encoded) == data
+
+
+def test_cobs_rejects_bad_codes():
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x05ab")      # claims more bytes than there are
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x02a\x00")   # zero inside a packet
+
+
+def test_decodes_frames_split_across_reads():
+    decoder = BinaryDecoder()
+    wire = encode_frame(1, "NORMAL", 180, 14.2, 420, 230, 250) + encode_frame(2, "BLOOD LEAKAGE", 240, 0.5)
+    assert decoder.feed(wire[:5]) == []
+    frames = decoder.feed(wire[5:])
+    assert [(frame.seq, frame.status, frame.power, frame.flow) for frame in frames] == [
+        (1, "NORMAL", 180, 14.2), (2, "BLOOD LEAKAGE", 240, 0.5)]
+    assert (frames[0].red, frames[0].green, frames[0].blue) == (420, 230, 250)
+    assert decoder.corrupt == 0 and decoder.dropped == 0
+
+
+def test_rejects_a_bad_crc_and_keeps_the_next_frame():
+    decoder = BinaryDecoder()
+    damaged = bytearray(encode_frame(1, "NORMAL", 180, 14.2))
+    damaged[4] ^= 0x10
+    frames = decoder.feed(bytes(damaged) + encode_frame(2, "NORMAL", 180, 14.2))
+    assert [frame.seq for frame in frames] == [2]
+    assert decoder.corrupt == 1
+
+
+def test_resyncs_on_the_delimiter_after_garbage_and_truncation():
+    decoder = BinaryDecoder()
+    truncated = encode_frame(1, "NORMAL", 180, 14.2)[:7] + b"\0"
+    frames = decoder.feed(b"\x07noise" + b"\0" + truncated + encode_frame(2, "NORMAL", 180, 14.2))
+    assert [frame.seq for frame in frames] == [2]
+    assert decoder.corrupt == 2
+
+
+def test_counts_dropped_and_out_of_order_frames():
+    decoder = BinaryDecoder()
+    decoder.feed(b"".join(encode_frame(seq, "NORMAL", 0, 0.0) for seq in (0xFFFE, 0xFFFF, 2, 1)))
+    assert decoder.dropped == 2        # 0 and 1 missing across the wrap
+    assert decoder.out_of_order == 1
+
+
+def test_unknown_status_codes():
+    record = RECORD.pack(1, 9, 0, 0, 0, 0, 0)
+    wire = cobs_encode(record + crc_hqx(record, 0xFFFF).to_bytes(2, "big")) + b"\0"
+    assert BinaryDecoder().feed(wire)[0].status == "UNKNOWN"
+
+
+def test_batch_decoding_matches_packet_decoding():
+    pytest.importorskip("numpy")
+    frames = [encode_frame(seq, ("NORMAL", "BLOOD LEAKAGE", "MANUAL")[seq % 3], seq % 256, seq / 10,
+                           seq, 0x100 * (seq % 5), 7) for seq in range(200)]
+    frames[10] = frames[10][:6] + b"\0"                 # truncated
+    frames[20] = b"\x01" * 16 + b"\0"                   # right length, bad CRC
+    frames[30] = frames[30][:3] + b"\x0f" + frames[30][4:]  # code pointing past the end
+    wire = b"\0" + b"".join(frames)
+    batch, single = BinaryDecoder(), BinaryDecoder()
+    expected = [frame for i in range(len(frames)) for frame in single.feed(frames[i])]
+    got = batch.feed(wire)
+    assert len(got) == 197
+    assert [repr(frame) for frame in got] == [repr(frame) for frame in expected]
+    assert batch.corrupt == single.corrupt == 3
+    assert batch.dropped == single.dropped == 3
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from volume.capture import RX, TX, CaptureWriter, ReplayPort, read_capture
+
+RECORDS = [
+    (1000.0, RX, b"Status: NORMAL | Pump Speed: 120 | Flow Rate: 12.00 mL/min\n"),
+    (1000.25, TX, b"BIN\n"),
+    (1000.5, RX, b"\x05\x01\x02\x03\x04\x00"),
+    (1001.0, RX, b""),
+    (1002.125, RX, b"x" * 5000),
+]
+
+
+def write(path, records, **options):
+    writer = CaptureWriter(path, **options)
+    for timestamp, direction, data in records:
+        writer.record(data, direction, timestamp)
+    writer.close()
+    return writer
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_records_round_trip_across_chunks(tmp_path, compress):
+    path = str(tmp_path / "session.vcap")
+    writer = write(path, RECORDS, chunk_bytes=64, compress=compress)
+    assert writer.records == len(RECORDS)
+    assert writer.bytes_written == os.path.getsize(path) - len(b"VOLCAP1\n")
+
+    both = list(read_capture(path, directions=(RX, TX)))
+    assert [(direction, data) for _, direction, data in both] == [(d, data) for _, d, data in RECORDS]
+    assert [timestamp for timestamp, _, _ in both] == pytest.approx([t for t, _, _ in RECORDS], abs=1e-6)
+    assert [data for _, _, data in read_capture(path)] == [data for _, d, data in RECORDS if d == RX]
+
+
+def test_appending_reopens_and_a_truncated_chunk_is_skipped(tmp_path):
+    path = str(tmp_path / "session.vcap")
+    write(path, RECORDS[:2])
+    write(path, RECORDS[2:])
+    assert len(list(read_capture(path, directions=(RX, TX)))) == len(RECORDS)
+
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+    assert [data for _, _, data in read_capture(path, directions=(RX, TX))] == [data for _, _, data in RECORDS[:2]]
+
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"not a capture")
+    with pytest.raises(ValueError):
+        list(read_capture(str(other)))
+
+
+def read_all(port, limit=5.0):
+    data = bytearray()
+    deadline = time.monotonic() + limit
+    while not port.finished.is_set() and time.monotonic() < deadline:
+        data += port.read(4096)
+    return bytes(data)
+
+
+@pytest.fixture
+def paced(tmp_path):
+    path = str(tmp_path / "paced.vcap")
+    write(path, [(50.0, RX, b"first\n"), (50.1, TX, b"ignored\n"), (50.3, RX, b"second\n")])
+    return path
+
+
+def test_replay_follows_the_recorded_timing(paced):
+    port = ReplayPort(paced, speed=1.0, timeout=0.02)
+    started = time.monotonic()
+    assert port.read(64) == b"first\n"
+    assert port.in_waiting == 0                 # the next record is due 0.3 s in
+    assert read_all(port) == b"second\n"
+    assert 0.25 <= time.monotonic() - started < 2.0
+    port.close()
+    with pytest.raises(OSError):
+        port.read()
+
+
+def test_replay_speed_scales_the_timing(paced):
+    port = ReplayPort(paced, speed=3.0, timeout=0.02)
+    started = time.monotonic()
+    assert read_all(port) == b"first\nsecond\n"
+    assert 0.08 <= time.monotonic() - started < 0.3    # 0.1 s at three times the speed
+
+    port = ReplayPort(paced, speed=None, timeout=0.02)
+    started = time.monotonic()
+    assert port.in_waiting == len(b"first\n")
+    assert read_all(port) == b"first\nsecond\n"
+    assert time.monotonic() - started < 0.2     # as fast as it is read
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import pytest
+
+from volume.commands import CommandWriter
+from volume.protocol import ModeFrame, StatusFrame
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class Link:
+    """Records written lines; write() returns ok."""
+
+    def __init__(self):
+        self.lines = []
+        self.ok = True
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        with self.lock:
+            self.lines.append(data.decode().strip())
+        return self.ok
+
+
+@pytest.fixture
+def link():
+    return Link()
+
+
+@pytest.fixture
+def writer(link):
+    acks, timeouts = [], []
+    writer = CommandWriter(link.write, lambda command, rtt: acks.append((command.text, rtt)),
+                           timeouts.append, ack_timeout=0.2)
+    writer.acks, writer.timeouts = acks, timeouts
+    yield writer
+    writer.close()
+
+
+def test_setpoints_while_one_is_in_flight_are_coalesced(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    for power in (110, 120, 130):
+        writer.set_power(power)
+    assert writer.stats.coalesced == 2 and writer.pending == 2
+
+    writer.acknowledge([ModeFrame("MANUAL", 100)])
+    assert wait_for(lambda: link.lines == ["100", "130"])
+    assert writer.acks[0][0] == "100" and writer.acks[0][1] >= 0
+    writer.acknowledge([StatusFrame("MANUAL", 130, 10.0)])   # binary mode: the status shows it
+    assert wait_for(lambda: writer.pending == 0)
+    assert (writer.stats.sent, writer.stats.acked, writer.stats.timeouts) == (2, 2, 0)
+
+
+def test_frames_that_do_not_match_are_not_acks(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    writer.acknowledge([ModeFrame("MANUAL", 90), StatusFrame("MANUAL", 90, 1.0), StatusFrame("NORMAL", 180, 14.0)])
+    assert writer.pending == 1 and writer.acks == []
+
+
+def test_mode_commands_supersede_queued_setpoints_and_are_never_dropped(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    writer.set_power(150)
+    writer.send("AUTO")
+    writer.set_power(200)
+    writer.send("AUTO")
+    assert writer.stats.coalesced == 2
+    writer.acknowledge([ModeFrame("MANUAL", 100)])
+    assert wait_for(lambda: link.lines == ["100", "AUTO"])
+    writer.acknowledge([ModeFrame("AUTO")])
+    assert wait_for(lambda: link.lines == ["100", "AUTO", "AUTO"])
+
+
+def test_unacknowledged_command_times_out_and_the_next_goes_out(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    writer.send("AUTO")
+    assert wait_for(lambda: link.lines == ["100", "AUTO"])
+    assert [command.text for command in writer.timeouts] == ["100"]
+    assert writer.stats.timeouts == 1
+
+
+def test_failed_write_frees_the_slot(link, writer):
+    link.ok = False
+    writer.set_power(100)
+    assert wait_for(lambda: writer.pending == 0)
+    link.ok = True
+    writer.set_power(120)
+    assert wait_for(lambda: link.lines == ["100", "120"])
+    assert writer.stats.sent == 1 and writer.timeouts == []
+
+
+def test_clear_forgets_queued_and_in_flight_commands(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    writer.set_power(120)
+    writer.clear()
+    assert writer.pending == 0
+    time.sleep(0.3)
+    assert link.lines == ["100"] and writer.timeouts == []
+
+
+def test_auto_is_acked_only_after_the_pump_was_seen_in_manual(link, writer):
+    writer.send("AUTO")
+    assert wait_for(lambda: writer.stats.sent == 1)
+    # A status frame of a pump already in AUTO, in flight before the command
+    writer.acknowledge([StatusFrame("NORMAL", 180, 14.0)])
+    assert writer.acks == []
+    writer.acknowledge([StatusFrame("MANUAL", 90, 6.0), StatusFrame("NORMAL", 180, 14.0)])
+    assert [text for text, _ in writer.acks] == ["AUTO"]
+
+
+def test_auto_is_acked_by_the_firmware_mode_line(link, writer):
+    writer.send("AUTO")
+    assert wait_for(lambda: writer.stats.sent == 1)
+    writer.acknowledge([ModeFrame("AUTO")])
+    assert [text for text, _ in writer.acks] == ["AUTO"]
+
+
+def test_round_trip_counts_from_the_end_of_the_write(writer):
+    writer.write = lambda data: time.sleep(0.1) or True   # a port that blocks while writing
+    writer.set_power(100)
+    assert wait_for(lambda: writer.stats.sent == 1)
+    writer.acknowledge([ModeFrame("MANUAL", 100)])
+    assert writer.acks[0][1] < 0.05
+
+
+def test_close_stops_the_thread_and_a_later_command_restarts_it(link, writer):
+    writer.set_power(100)
+    assert wait_for(lambda: link.lines == ["100"])
+    thread = writer._thread
+    writer.set_power(120)
+    writer.close()
+    assert not thread.is_alive() and writer.pending == 0
+    writer.set_power(130)
+    assert wait_for(lambda: link.lines == ["100", "130"])
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from volume.detector import FlowModel, OcclusionDetector, detect_occlusions
+
+POWER = 180
+NORMAL = FlowModel().expected(POWER)
+
+
+def feed(detector, flows, power=POWER):
+    return [detector.update(power, flow) for flow in flows]
+
+
+def test_trips_after_the_confirmation_window():
+    detector = OcclusionDetector()
+    assert feed(detector, [NORMAL] * 5 + [0.0, 0.0]) == [False] * 6 + [True]
+    assert detector.transitions == 1
+
+
+def test_one_low_reading_does_not_trip():
+    detector = OcclusionDetector()
+    assert not any(feed(detector, [NORMAL, 0.0, NORMAL, 0.0, NORMAL, 0.0, NORMAL]))
+    assert detector.cusum < detector.threshold
+
+
+def test_partial_shortfall_below_the_drift_never_trips():
+    detector = OcclusionDetector()
+    assert not any(feed(detector, [NORMAL * 0.6] * 200))
+
+
+def test_clears_only_after_the_smoothed_flow_recovers():
+    detector = OcclusionDetector()
+    feed(detector, [0.0] * 10)
+    assert detector.occluded
+    # The EWMA climbs from zero: 0.3, 0.51, 0.657 (recovered), 0.76, 0.83 of the normal flow
+    assert feed(detector, [NORMAL] * 5) == [True] * 4 + [False]
+    assert detector.cusum == 0.0 and detector.transitions == 2
+
+
+def test_a_relapse_restarts_the_clear_window():
+    detector = OcclusionDetector(clear_confirm=3)
+    feed(detector, [0.0] * 10)
+    # Two recovered samples, then a dry one pulls the EWMA back under the clear level
+    states = feed(detector, [NORMAL] * 4 + [0.0] + [NORMAL] * 3)
+    assert states == [True] * 7 + [False]
+
+
+def test_idle_pump_is_never_occluded():
+    detector = OcclusionDetector()
+    assert not any(feed(detector, [0.0] * 50, power=40))
+
+
+def test_rejects_bad_parameters():
+    with pytest.raises(ValueError):
+        OcclusionDetector(confirm=0)
+    with pytest.raises(ValueError):
+        OcclusionDetector(alpha=0)
+
+
+def test_batch_detection_matches_streaming():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(3)
+    power, flow = [], []
+    for _ in range(40):
+        level = rng.choice([0, 120, 180, 255])
+        blocked = rng.random() < 0.3
+        for _ in range(rng.randint(1, 30)):
+            power.append(level)
+            flow.append(rng.uniform(0.0, 0.5) if blocked else max(0.0, rng.gauss(level * 20 / 255, 1.0)))
+    detector = OcclusionDetector()
+    streaming = [detector.update(p, f) for p, f in zip(power, flow)]
+    assert detector.transitions > 2
+    assert np.array_equal(detect_occlusions(power, flow), np.array(streaming))
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from volume.discovery import PortCache, PortDiscovery
+from volume.monitor import PumpMonitor
+
+STATUS = b"Status: NORMAL | Pump Speed: 180 | Flow Rate: 14.00 mL/min\r\n"
+
+
+class FakeSerial:
+    """A port that prints a status line answer_after seconds after opening (never if None)."""
+
+    in_waiting = 0
+
+    def __init__(self, answer_after):
+        self.opened = time.monotonic()
+        self.answer_after = answer_after
+        self.answered = False
+        self.closed = False
+
+    def read(self, size):
+        if (self.answer_after is not None and not self.answered
+                and time.monotonic() - self.opened >= self.answer_after):
+            self.answered = True
+            return STATUS
+        time.sleep(0.005)
+        return b""
+
+    def close(self):
+        self.closed = True
+
+
+class Devices:
+    """open_port for PortDiscovery: name -> answer delay; names not listed cannot be opened."""
+
+    def __init__(self, **answers):
+        self.answers = answers
+        self.opened = {}
+
+    def __call__(self, name, baudrate):
+        if name not in self.answers:
+            raise OSError(f"no such port: {name}")
+        port = self.opened[name] = FakeSerial(self.answers[name])
+        return port
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PortCache(str(tmp_path / "last_port.json"))
+
+
+def find(devices, cache, ports, grace=0.2):
+    discovery = PortDiscovery(ports, cache=cache, timeout=2.0, open_port=devices, cache_grace=grace)
+    started = time.monotonic()
+    result = discovery.find()
+    return result, time.monotonic() - started
+
+
+def test_first_port_to_answer_wins_and_is_cached(cache):
+    devices = Devices(A=None, B=0.05, C=0.3)
+    result, elapsed = find(devices, cache, ("A", "B", "C"))
+    assert result.name == "B" and elapsed < 1.0
+    assert devices.opened["A"].closed and devices.opened["C"].closed and not devices.opened["B"].closed
+    assert cache.load() == ("B", 9600)
+
+
+def test_cached_port_that_answers_is_preferred(cache):
+    cache.save("A", 9600)
+    devices = Devices(A=0.1, B=0.02)
+    result, _ = find(devices, cache, ("A", "B"), grace=0.5)
+    assert result.name == "A"
+    assert devices.opened["B"].closed
+
+
+def test_silent_cached_port_costs_at_most_the_grace(cache):
+    cache.save("A", 9600)
+    devices = Devices(A=None, B=0.05)
+    result, elapsed = find(devices, cache, ("A", "B"), grace=0.2)
+    assert result.name == "B"
+    assert elapsed < 1.0            # not the cached port's 2 s probe timeout
+    assert devices.opened["A"].closed
+    assert cache.load() == ("B", 9600)
+
+
+def test_missing_cached_port_is_no_delay(cache):
+    cache.save("gone", 9600)
+    devices = Devices(B=0.05)
+    discovery = PortDiscovery(cache=cache, timeout=2.0, open_port=devices, cache_grace=1.0)
+    discovery.candidates = lambda: ["B"]     # what enumeration found; the cached port is probed too
+    started = time.monotonic()
+    result = discovery.find()
+    assert result.name == "B" and time.monotonic() - started < 0.5
+    assert discovery.probes == 2
+
+
+def test_monitor_port_cache_is_opt_in(tmp_path):
+    assert PumpMonitor().discovery.cache is None
+    path = str(tmp_path / "last_port.json")
+    assert PumpMonitor(port_cache=path).discovery.cache.path == path
@@ -0,0 +1,101 @@
+import json
+import socket
+import time
+
+import pytest
+
+from volume.fanout import TelemetryHub, TelemetryViewer
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def read_until(viewer, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        assert viewer.poll()
+    return condition()
+
+
+@pytest.fixture
+def hub():
+    hub = TelemetryHub(port=0).start()
+    yield hub
+    hub.close()
+
+
+def test_viewers_get_a_snapshot_then_only_changed_fields(hub):
+    hub.publish("bed-3", {"flow": 12.0, "power": 180, "mode": "AUTO"})
+    messages = []
+    viewer = TelemetryViewer(hub.host, hub.port, lambda pump_id, message: messages.append(message), timeout=0.2)
+    try:
+        assert read_until(viewer, lambda: messages)
+        assert messages[0]["type"] == "snapshot"
+        assert viewer.pumps == {"bed-3": {"flow": 12.0, "power": 180, "mode": "AUTO"}}
+
+        assert not hub.publish("bed-3", {"flow": 12.0, "power": 180})
+        assert hub.publish("bed-3", {"flow": 12.5, "power": 180})
+        assert hub.publish("bed-4", {"flow": 3.0})
+        assert read_until(viewer, lambda: len(messages) == 3)
+        assert [(m["type"], m["pump"], m["fields"]) for m in messages[1:]] == [
+            ("delta", "bed-3", {"flow": 12.5}), ("delta", "bed-4", {"flow": 3.0})]
+        assert [m["seq"] for m in messages] == [1, 2, 3]
+        assert viewer.pumps == {"bed-3": {"flow": 12.5, "power": 180, "mode": "AUTO"}, "bed-4": {"flow": 3.0}}
+        assert hub.stats.unchanged == 1 and hub.stats.resyncs == 0
+    finally:
+        viewer.close()
+
+
+def test_a_slow_viewer_is_resynced_with_bounded_buffering():
+    hub = TelemetryHub(port=0, max_queue=8, max_buffered=2048, send_buffer=4096).start()
+    # A small receive buffer set before connecting, so the kernel cannot absorb the backlog
+    slow = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect((hub.host, hub.port))
+    try:
+        assert wait_for(lambda: hub.stats.clients == 1)
+        padding = "x" * 200
+        for i in range(3000):
+            hub.publish("bed-3", {"flow": float(i), "note": padding + str(i)})
+        assert wait_for(lambda: hub.stats.lagging == 1)
+        # What the hub holds for it stays bounded however far behind it is
+        largest = max(len(message) for _, message in hub._log)
+        assert all(len(subscriber.out) <= hub.max_buffered + hub.max_queue * largest
+                   for subscriber in hub._subscribers.values())
+
+        # Once it reads again it skips what it missed and catches up from a snapshot
+        messages, buffer = [], b""
+        slow.settimeout(5.0)
+        while not messages or messages[-1]["seq"] < 3000:
+            data = slow.recv(65536)
+            assert data
+            lines = (buffer + data).split(b"\n")
+            buffer = lines.pop()
+            messages.extend(json.loads(line) for line in lines)
+        kinds = [message["type"] for message in messages]
+        assert kinds[0] == "snapshot" and "snapshot" in kinds[1:]
+        assert len(messages) < 3001
+        last = messages[-1]
+        assert (last["pumps"]["bed-3"] if last["type"] == "snapshot" else last["fields"])["flow"] == 2999.0
+        assert hub.stats.resyncs >= 1 and hub.stats.skipped > 0
+    finally:
+        slow.close()
+        hub.close()
+
+
+def test_disconnected_viewers_are_dropped(hub):
+    first = TelemetryViewer(hub.host, hub.port, timeout=0.2)
+    second = TelemetryViewer(hub.host, hub.port, timeout=0.2)
+    try:
+        assert wait_for(lambda: hub.stats.clients == 2)
+        first.close()
+        assert wait_for(lambda: hub.stats.clients == 1)
+        hub.publish("bed-3", {"flow": 1.0})
+        assert read_until(second, lambda: second.pumps == {"bed-3": {"flow": 1.0}})
+        assert hub.stats.accepted == 2
+    finally:
+        second.close()
@@ -0,0 +1,32 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from volume.history import BLOCK, TelemetryHistory  # noqa: E402
+
+
+def fill(history, times):
+    history.extend(times, [float(i) for i in range(len(times))], [0] * len(times), [0] * len(times))
+
+
+def test_decimate_returns_only_the_requested_window():
+    history = TelemetryHistory(4 * BLOCK)
+    fill(history, [float(i) for i in range(3 * BLOCK)])
+    times, low, high = history.decimate(100.0, 199.0, 1000)
+    assert times[0] == 100.0 and times[-1] == 199.0
+    assert list(low) == list(high) == [float(i) for i in range(100, 200)]
+
+
+def test_a_clock_stepping_backwards_does_not_break_lookups():
+    history = TelemetryHistory(4 * BLOCK)
+    fill(history, [1000.0 + i for i in range(BLOCK)])
+    # The wall clock steps back an hour, within and between batches
+    fill(history, [1000.0 + BLOCK, 1000.0 + BLOCK - 3600.0, 1000.0 + BLOCK - 3599.0])
+    fill(history, [1000.0 + BLOCK - 3598.0 + i for i in range(BLOCK)])
+    assert np.all(np.diff(history.latest(len(history))["time"]) >= 0)
+    oldest, newest = history.span()
+    assert (oldest, newest) == (1000.0, 1000.0 + BLOCK)
+    # Every sample after the step sits at the last good time instead of an hour back
+    times, low, high = history.decimate(1000.0 + BLOCK, newest, 1000)
+    assert len(times) == BLOCK + 3 and set(times) == {1000.0 + BLOCK}
+    assert len(history.decimate(oldest, newest, 1000)[0]) == len(history)
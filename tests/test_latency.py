@@ -0,0 +1,39 @@
+import threading
+
+from volume.latency import LatencyProbe
+
+
+def test_arrival_hand_off_keeps_the_oldest_unshown_stamp():
+    probe = LatencyProbe()
+    assert probe.take_arrival() is None
+    probe.arrived(1.0)
+    probe.arrived(2.0)                              # still unshown: 1.0 stays
+    assert probe.take_arrival() == 1.0
+    assert probe.take_arrival() is None
+    probe.arrived(3.0)
+    probe.reset()
+    assert probe.take_arrival() is None
+
+
+def test_arrivals_from_another_thread_are_taken_in_order():
+    probe = LatencyProbe()
+    done = threading.Event()
+
+    def reader():
+        for stamp in range(1, 20001):
+            probe.arrived(float(stamp))
+        done.set()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    taken = []
+    while not done.is_set():
+        stamp = probe.take_arrival()
+        if stamp is not None:
+            taken.append(stamp)
+    thread.join()
+    stamp = probe.take_arrival()
+    if stamp is not None:
+        taken.append(stamp)
+    assert taken and taken == sorted(set(taken))
+    assert probe.take_arrival() is None
@@ -0,0 +1,107 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from volume.metrics import CONTENT_TYPE, FAMILIES, MetricsServer
+from volume.monitor import PumpMonitor
+from volume.protocol import BloodLeakFrame, StatusFrame
+from volume.reader import ReaderStats
+
+
+class FakePort:
+    is_open = True
+    port = "fake"
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line of an exposition."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, value = line.rsplit(" ", 1)
+            values[key] = float(value)
+    return values
+
+
+@pytest.fixture
+def pump():
+    monitor = PumpMonitor(reconnect=False)
+    monitor.attach(FakePort(), start_reader=False)
+    monitor.process_frames([StatusFrame("NORMAL", 140, 12.5)])
+    stats = ReaderStats()
+    stats.bytes_read, stats.lines, stats.frames = 4096, 70, 68
+    stats.parse_misses, stats.corrupt_frames = 2, 1
+    yield monitor, stats
+    monitor.stop()
+
+
+def test_snapshot_is_prometheus_text(pump):
+    monitor, stats = pump
+    server = MetricsServer([lambda: [('bay "3"\n', monitor, stats, 2)]], port=0)
+    try:
+        server.refresh()
+        text = server.snapshot.decode()
+    finally:
+        server.close()
+
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    for name, (kind, help_text) in FAMILIES.items():
+        if f"# TYPE {name} {kind}" in lines:
+            assert lines[lines.index(f"# TYPE {name} {kind}") - 1] == f"# HELP {name} {help_text}"
+    pump_label = 'pump="bay \\"3\\"\\n"'
+    values = samples(text)
+    assert values[f"volume_up{{{pump_label}}}"] == 1
+    assert values[f"volume_flow_ml_per_minute{{{pump_label}}}"] == 12.5
+    assert values[f"volume_pump_power_pwm{{{pump_label}}}"] == 140
+    assert values[f'volume_mode{{{pump_label},mode="AUTO"}}'] + values[f'volume_mode{{{pump_label},mode="MANUAL"}}'] == 1
+    assert values[f"volume_reconnects_total{{{pump_label}}}"] == 2
+    assert values[f"volume_ingest_bytes_total{{{pump_label}}}"] == 4096
+    assert values[f"volume_ingest_parse_errors_total{{{pump_label}}}"] == 3
+    assert not any(key.startswith("volume_alarm_active") for key in values)
+    assert "volume_metrics_snapshot_timestamp_seconds" in values
+
+
+def test_alarms_rates_and_pumps_without_stats(pump):
+    monitor, stats = pump
+    idle = PumpMonitor(reconnect=False)
+    server = MetricsServer([lambda: [("a", monitor, stats, 0), ("b", idle, None, 0)]], port=0)
+    try:
+        server.refresh()
+        monitor.process_frames([BloodLeakFrame()])
+        stats.frames += 100
+        server.refresh()
+        values = samples(server.snapshot.decode())
+    finally:
+        server.close()
+        idle.stop()
+
+    assert values['volume_alarm_active{pump="a",alarm="blood_leakage"}'] == 1
+    assert values['volume_blood_detected{pump="a"}'] == 1
+    assert values['volume_ingest_frames_per_second{pump="a"}'] > 0
+    # A pump with no link yet reports its state but no ingest counters
+    assert values['volume_up{pump="b"}'] == 0
+    assert not any(key.startswith("volume_ingest_") and 'pump="b"' in key for key in values)
+
+
+def test_scrapes_are_served_from_the_snapshot(pump):
+    monitor, stats = pump
+    server = MetricsServer([lambda: [("a", monitor, stats, 0)]], port=0, interval=60).start()
+    try:
+        with urllib.request.urlopen(f"http://{server.host}:{server.port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert response.read() == server.snapshot
+        assert server.scrapes == 1
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://{server.host}:{server.port}/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.close()
@@ -0,0 +1,135 @@
+import time
+
+import pytest
+
+from volume.monitor import PumpMonitor
+from volume.simulator import BLOOD_RGB, NORMAL_RGB
+
+
+class FakePort:
+    is_open = True
+    port = "fake"
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    def close(self):
+        self.is_open = False
+
+
+def test_reattach_clears_communication_alarm():
+    monitor = PumpMonitor(reconnect=False)
+    monitor.attach(FakePort(), start_reader=False)
+    monitor.connection_lost(OSError("gone"))
+    assert monitor.state.alarms == ("communication_error",)
+    assert monitor.warning == "Serial Error: gone"
+
+    monitor.attach(FakePort(), start_reader=False)
+    assert monitor.state.alarms == ()
+    assert monitor.warning == ""
+
+
+def test_stop_closes_the_command_writer_and_a_new_link_gets_one():
+    monitor = PumpMonitor(reconnect=False)
+    port = FakePort()
+    monitor.attach(port, start_reader=False)
+    monitor.set_power(120)
+    deadline = time.monotonic() + 2
+    while not port.written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    thread = monitor.commands._thread
+    monitor.stop()
+    assert not thread.is_alive() and monitor.commands.pending == 0
+
+    port = FakePort()
+    monitor.attach(port, start_reader=False)
+    monitor.set_power(90)
+    deadline = time.monotonic() + 2
+    while not port.written and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert port.written == [b"90\n"]
+    monitor.stop()
+
+
+def color_frames(status, rgb, count=20):
+    from volume.protocol import ColorStatusFrame
+    return [ColorStatusFrame(status, 180, 14.0, *rgb) for _ in range(count)]
+
+
+@pytest.fixture
+def calibrations(tmp_path):
+    pytest.importorskip("numpy")
+    from volume.blood import CalibrationCache
+    return CalibrationCache(str(tmp_path / "calibration.json"))
+
+
+def test_firmware_blood_alarm_is_kept_on_an_uncalibrated_device(calibrations):
+    monitor = PumpMonitor(pump_id="pump-1", calibrations=calibrations)
+    monitor.process_frames(color_frames("BLOOD LEAKAGE", NORMAL_RGB))
+    state = monitor.state
+    assert state.blood_detected and state.alarms == ("blood_leakage",)
+    assert state.display_status == "BLOOD LEAKAGE"
+
+    # Clear readings from the host do not clear what the firmware raised
+    monitor.process_frames(color_frames("NORMAL", NORMAL_RGB))
+    assert monitor.state.blood_detected and monitor.state.alarms == ("blood_leakage",)
+
+
+def test_host_verdict_adds_to_the_firmware_on_an_uncalibrated_device(calibrations):
+    monitor = PumpMonitor(pump_id="pump-1", calibrations=calibrations)
+    monitor.process_frames(color_frames("NORMAL", BLOOD_RGB))
+    assert monitor.state.blood_detected and monitor.state.alarms == ("blood_leakage",)
+
+
+def test_calibrated_host_verdict_replaces_the_firmware(calibrations):
+    from volume.blood import ColorCalibration
+    calibrations.save("pump-1", ColorCalibration(NORMAL_RGB))
+    monitor = PumpMonitor(pump_id="pump-1", calibrations=calibrations)
+    monitor.process_frames(color_frames("BLOOD LEAKAGE", NORMAL_RGB))
+    state = monitor.state
+    assert monitor.colors_calibrated
+    assert not state.blood_detected and state.alarms == ()
+    assert state.display_status == "NORMAL"   # never the firmware's verdict without the alarm
+
+    monitor.process_frames(color_frames("NORMAL", BLOOD_RGB))
+    assert monitor.state.blood_detected and monitor.state.display_status == "BLOOD LEAKAGE"
+    monitor.process_frames(color_frames("NORMAL", NORMAL_RGB))
+    assert not monitor.state.blood_detected
+    assert monitor.state.alarms == ("blood_leakage",)   # a raised alarm stays until silenced
+
+
+def test_firmware_blood_alarm_without_colour_readings():
+    from volume.protocol import StatusFrame
+    monitor = PumpMonitor()
+    monitor.process_frames([StatusFrame("BLOOD LEAKAGE", 240, 15.0)])
+    assert monitor.state.blood_detected and monitor.state.alarm_type == "blood_leakage"
+
+
+def test_calibrating_from_the_live_stream_lets_the_host_overrule_the_firmware(calibrations):
+    monitor = PumpMonitor(pump_id="pump-1", calibrations=calibrations)
+    with pytest.raises(ValueError):
+        monitor.calibrate_colors()
+    monitor.process_frames(color_frames("NORMAL", NORMAL_RGB))
+    assert monitor.color_readings() == 20 and not monitor.colors_calibrated
+
+    monitor.calibrate_colors()
+    assert monitor.colors_calibrated
+    assert calibrations.load("pump-1") is not None
+    monitor.process_frames(color_frames("BLOOD LEAKAGE", NORMAL_RGB))
+    assert not monitor.state.blood_detected and monitor.state.alarms == ()
+    monitor.process_frames(color_frames("BLOOD LEAKAGE", BLOOD_RGB))
+    assert monitor.state.blood_detected and monitor.state.alarms == ("blood_leakage",)
+
+
+def test_calibrate_without_a_calibration_cache(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    from volume.blood import BloodLeakDetector
+    monkeypatch.setenv("HOME", str(tmp_path))
+    detector = BloodLeakDetector()
+    detector.update(*([value] * 8 for value in NORMAL_RGB))
+    monitor = PumpMonitor(pump_id="pump-1", blood_detector=detector)
+    monitor.calibrate_colors()
+    assert (tmp_path / ".volume" / "calibration.json").exists()
@@ -0,0 +1,54 @@
+from volume.protocol import (BloodLeakFrame, ColorStatusFrame, LineDecoder, ModeFrame, ProtocolFrame,
+                             StatusFrame, frame_to_dict, parse_line)
+
+
+def test_status_line():
+    frame = parse_line(b"Status: MANUAL | Pump Speed: 90 | Flow Rate: 7.25 mL/min\r")
+    assert type(frame) is StatusFrame
+    assert (frame.status, frame.power, frame.flow) == ("MANUAL", 90, 7.25)
+
+
+def test_status_line_with_colour_readings():
+    frame = parse_line(b"Status: BLOOD LEAKAGE | Pump Speed: 240 | Flow Rate: 18.00 mL/min | RGB: 90 520 480")
+    assert isinstance(frame, ColorStatusFrame)
+    assert frame.status == "BLOOD LEAKAGE"
+    assert (frame.red, frame.green, frame.blue) == (90, 520, 480)
+
+
+def test_other_lines():
+    assert isinstance(parse_line(b"!!! BLOOD LEAKAGE DETECTED !!!"), BloodLeakFrame)
+    assert parse_line(b"Switched to AUTO mode (color-based control).").mode == "AUTO"
+    manual = parse_line(b"Manual Mode: Pump Speed Set To 120")
+    assert isinstance(manual, ModeFrame) and (manual.mode, manual.power) == ("MANUAL", 120)
+    offer = parse_line(b"Protocols: TEXT BIN\r")
+    assert isinstance(offer, ProtocolFrame) and offer.offered == ("TEXT", "BIN")
+    assert parse_line(b"Protocol active: BIN\r").active == "BIN"
+
+
+def test_unrecognised_and_damaged_lines():
+    assert parse_line(b"") is None
+    assert parse_line(b"Enter a pump speed (0-255) or type 'auto' for color-based control.") is None
+    assert parse_line(b"Status: NORMAL | Pump Sp\xffed: 180 | Flow Rate: 14.2") is None
+    assert parse_line(b"Status: NORMAL | Pump Speed: 180 | Flow Rate: x") is None
+
+
+def test_decoder_keeps_partial_lines_and_counts_misses():
+    decoder = LineDecoder()
+    assert decoder.feed(b"garbage\nStatus: NORMAL | Pump Speed: 1") == []
+    frames = decoder.feed(b"80 | Flow Rate: 14.20 mL/min\r\n")
+    assert [frame.power for frame in frames] == [180]
+    assert (decoder.lines, decoder.misses) == (2, 1)
+    assert decoder.buffer == bytearray()
+
+
+def test_decoder_leaves_bytes_after_a_protocol_switch():
+    decoder = LineDecoder()
+    frames = decoder.feed(b"Protocol active: BIN\r\n\x03ab\x00more\n")
+    assert [frame.kind for frame in frames] == ["protocol"]
+    assert bytes(decoder.buffer) == b"\x03ab\x00more\n"
+
+
+def test_frame_to_dict_includes_inherited_fields():
+    frame = ColorStatusFrame("NORMAL", 180, 14.2, 1, 2, 3)
+    assert frame_to_dict(frame) == {"kind": "status", "red": 1, "green": 2, "blue": 3,
+                                    "status": "NORMAL", "power": 180, "flow": 14.2}
@@ -0,0 +1,68 @@
+import queue
+
+from volume.binproto import encode_frame
+from volume.reader import SerialReader, StreamIngest
+
+STATUS = b"Status: NORMAL | Pump Speed: 180 | Flow Rate: 14.20 mL/min\r\n"
+
+
+class ScriptedPort:
+    """Serial-like port returning queued chunks, then failing once they run out."""
+
+    def __init__(self, chunks):
+        self.chunks = queue.Queue()
+        for chunk in chunks:
+            self.chunks.put(chunk)
+        self.written = []
+        self.timeout = 0.1
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    def read(self, size):
+        try:
+            return self.chunks.get(timeout=self.timeout)
+        except queue.Empty:
+            raise OSError("device disconnected")
+
+    def write(self, data):
+        self.written.append(data)
+
+
+def test_ingest_joins_lines_split_across_reads():
+    ingest = StreamIngest(lambda data: None)
+    assert ingest.feed(STATUS[:20]) == []
+    frames = ingest.feed(STATUS[20:] + STATUS)
+    assert [frame.power for frame in frames] == [180, 180]
+    assert ingest.stats.lines == 2 and ingest.stats.parse_misses == 0
+
+
+def test_ingest_negotiates_binary_and_decodes_the_rest_of_the_read():
+    written = []
+    ingest = StreamIngest(written.append)
+    ingest.feed(b"Protocols: TEXT BIN\r\n")
+    assert written == [b"BIN\n"]
+    frames = ingest.feed(b"Protocol active: BIN\r\n" + encode_frame(7, "NORMAL", 180, 14.2))
+    assert ingest.stats.protocol == "BIN"
+    assert [frame.kind for frame in frames] == ["protocol", "status"]
+    assert frames[1].seq == 7 and frames[1].flow == 14.2
+
+
+def test_ingest_stays_on_text_when_binary_is_disabled():
+    written = []
+    ingest = StreamIngest(written.append, binary=False)
+    ingest.feed(b"Protocols: TEXT BIN\r\n")
+    assert written == [] and ingest.stats.protocol == "TEXT"
+
+
+def test_reader_delivers_batches_and_reports_the_failure():
+    batches, errors = [], []
+    port = ScriptedPort([STATUS * 3, STATUS[:10], STATUS[10:]])
+    reader = SerialReader(port, batches.append, errors.append, idle_timeout=None)
+    reader.start()
+    reader.join(2)
+    assert not reader.is_alive()
+    assert [len(batch) for batch in batches] == [3, 1]
+    assert reader.stats.frames == 4 and reader.stats.batches == 2
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
@@ -0,0 +1,30 @@
+from volume.render import FramePacer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_unrequested_render_does_not_make_coalesced_negative():
+    pacer = FramePacer(fps=10, clock=Clock())
+    pacer.rendered()   # e.g. the window's first render
+    assert pacer.request() > 0
+    pacer.rendered()
+    assert pacer.coalesced == 0
+
+
+def test_requests_while_pending_are_coalesced():
+    clock = Clock()
+    pacer = FramePacer(fps=10, clock=clock)
+    assert pacer.request() == 0
+    pacer.rendered()
+    for _ in range(3):
+        pacer.request()
+    assert pacer.coalesced == 2
+    clock.now = 0.1
+    pacer.rendered()
+    assert pacer.request() == 0.1 and pacer.coalesced == 2
@@ -0,0 +1,59 @@
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the simulator needs a pseudo-terminal")
+
+from volume.monitor import PumpMonitor  # noqa: E402
+from volume.simulator import VirtualPump  # noqa: E402
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def pump():
+    pump = VirtualPump(rate=50, seed=1)
+    pump.start()
+    yield pump
+    pump.close()
+
+
+def test_banner_is_resent_on_every_open(pump):
+    import serial
+    for opened in (1, 2):
+        port = serial.Serial(pump.port_name, 9600, timeout=0.5)
+        try:
+            assert port.read_until(b"Protocols: TEXT BIN\r\n").endswith(b"Protocols: TEXT BIN\r\n")
+        finally:
+            port.close()
+        assert pump.resets == opened
+        assert wait_for(lambda: not pump.attached)
+
+
+def test_monitor_negotiates_binary(pump, tmp_path):
+    monitor = PumpMonitor(ports=(pump.port_name,), port_cache=str(tmp_path / "last_port.json"))
+    assert monitor.start()
+    try:
+        assert wait_for(lambda: monitor.reader.stats.protocol == "BIN")
+        assert wait_for(lambda: pump.binary_mode)
+    finally:
+        monitor.stop()
+
+
+def test_calibrate_flag_saves_the_device_calibration(pump, tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    from volume.__main__ import main
+    from volume.blood import CalibrationCache
+    monkeypatch.setenv("HOME", str(tmp_path))
+    output = tmp_path / "out.log"
+    assert main(["--headless", "--calibrate", "--port", pump.port_name, "--no-store", "--no-capture",
+                 "--output", str(output)]) == 0
+    assert "calibrated" in output.read_text()
+    assert CalibrationCache(str(tmp_path / ".volume" / "calibration.json")).load(pump.port_name) is not None
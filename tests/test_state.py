@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from volume.state import AlarmStateMachine, PumpState, StateDraft
+
+
+def test_more_urgent_alarm_takes_over_and_hands_back():
+    alarms = AlarmStateMachine()
+    assert alarms.raise_alarm("low_battery")
+    assert alarms.raise_alarm("occlusion")          # more urgent: becomes current
+    assert not alarms.raise_alarm("low_flow")       # less urgent: waits
+    assert alarms.current == "occlusion"
+    assert alarms.active == ("occlusion", "low_flow", "low_battery")
+    assert alarms.clear("occlusion")
+    assert alarms.current == "low_flow"
+
+
+def test_same_priority_alarms_are_first_raised_first():
+    alarms = AlarmStateMachine()
+    alarms.raise_alarm("communication_error")
+    assert not alarms.raise_alarm("connection_failure")
+    assert alarms.current == "communication_error"
+    assert alarms.clear("communication_error")
+    assert alarms.current == "connection_failure"
+
+
+def test_repeated_and_unknown_operations_change_nothing():
+    alarms = AlarmStateMachine()
+    alarms.raise_alarm("occlusion")
+    transitions = alarms.transitions
+    assert not alarms.raise_alarm("occlusion")
+    assert not alarms.clear("blood_leakage")
+    assert alarms.transitions == transitions and len(alarms) == 1
+
+
+def test_clear_all():
+    alarms = AlarmStateMachine()
+    assert not alarms.clear_all()
+    alarms.raise_alarm("blood_leakage")
+    alarms.raise_alarm("low_battery")
+    assert alarms.clear_all()
+    assert alarms.current is None and alarms.active == () and "blood_leakage" not in alarms
+
+
+def test_snapshots_are_immutable_versions():
+    state = PumpState()
+    with pytest.raises(AttributeError):
+        state.power = 10
+    with pytest.raises(TypeError):
+        PumpState(colour="red")
+    later = state.replace(power=120, alarm_type="occlusion", alarms=("occlusion",))
+    assert (later.version, state.power, later.power) == (1, 0, 120)
+    assert set(later.changed(state)) == {"power", "alarm_type", "alarms"}
+    assert later.alarm_active and not state.alarm_active
+
+
+def test_snapshot_round_trips_through_pickle_and_draft():
+    state = PumpState(4, status="MANUAL", power=90, alarms=("low_battery",), alarm_type="low_battery")
+    copy = pickle.loads(pickle.dumps(state))
+    assert copy.version == 4 and copy.changed(state) == ()
+    draft = StateDraft(state)
+    draft.flow = 3.5
+    assert draft.snapshot(5).changed(state) == ("flow",)
+
+
+def test_display_status_follows_the_detection_flags():
+    assert PumpState(status="MANUAL", occlusion_detected=True).display_status == "OCCLUSION"
+    assert PumpState(status="MANUAL", blood_detected=True, occlusion_detected=True).display_status == "BLOOD LEAKAGE"
+    assert PumpState(status="BLOOD LEAKAGE").display_status == "NORMAL"
+    assert PumpState(status="MANUAL").display_status == "MANUAL"
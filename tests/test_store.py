@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from volume.store import TelemetryStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "telemetry.db")
+
+
+def test_queries_see_flushed_rows(path):
+    store = TelemetryStore(path)
+    try:
+        store.add_samples([("pump-1", 100.0 + i, 0, 180, 14.0 + i) for i in range(10)])
+        store.add_event("pump-1", "alarm", "occlusion", timestamp=104.5)
+        store.add_event("pump-1", "warning", "WARNING: Occlusion detected!", timestamp=104.5)
+        assert store.flush(5)
+        assert len(store.samples(102, 105, "pump-1")) == 3
+        assert store.samples(102, 105, "other") == []
+        assert store.alarm_counts(100, 200) == [(None, "occlusion", 1)]
+        assert [row[2] for row in store.events(100, 200, kind="warning")] == ["warning"]
+        assert store.pumps() == ["pump-1"]
+    finally:
+        store.close()
+
+
+def test_close_closes_every_thread_connection(path):
+    store = TelemetryStore(path)
+    store.add_samples([("pump-1", 1.0, 0, 180, 14.0)])
+    store.flush(5)
+    connections = []
+
+    def query():
+        store.pumps()
+        connections.append(store._local.connection)
+
+    threads = [threading.Thread(target=query) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.pumps()
+    assert len(set(map(id, connections))) == 3
+
+    store.close()
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+    # The last connection to close checkpoints and removes the write-ahead log
+    assert not os.path.exists(path + "-wal")
+
+    # A thread that never queried before cannot open a new connection either
+    errors = []
+
+    def late_query():
+        try:
+            store.pumps()
+        except sqlite3.ProgrammingError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=late_query)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from volume.discovery import ReconnectPolicy
+from volume.supervisor import PumpSupervisor
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class FakePort:
+    """A serial port with no file descriptor, so the supervisor polls it."""
+
+    def __init__(self, name):
+        self.port = name
+        self.buffer = bytearray()
+        self.broken = False
+        self.closed = False
+
+    @property
+    def in_waiting(self):
+        if self.broken:
+            raise OSError("device disconnected")
+        return len(self.buffer)
+
+    def read(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.closed = True
+
+
+class Ports:
+    """Port factory: hands out FakePorts, failing a port's first `failures[name]` opens."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.opened = {}
+        self.attempts = {}
+
+    def __call__(self, name, baudrate):
+        self.attempts[name] = self.attempts.get(name, 0) + 1
+        if self.failures.get(name, 0):
+            self.failures[name] -= 1
+            raise OSError(f"could not open {name}")
+        port = self.opened[name] = FakePort(name)
+        return port
+
+
+def status_line(flow):
+    return f"Status: NORMAL | Pump Speed: 120 | Flow Rate: {flow:.2f} mL/min\n".encode()
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = PumpSupervisor(port_factory=Ports({"b": 2}), poll_interval=0.005,
+                                policy=ReconnectPolicy(initial=0.02, maximum=0.05))
+    supervisor.add_pump("a", "a", binary=False)
+    supervisor.add_pump("b", "b", binary=False)
+    supervisor.start()
+    yield supervisor
+    supervisor.stop()
+
+
+def test_each_pump_connects_with_its_own_backoff(supervisor):
+    ports = supervisor.port_factory
+    assert wait_for(lambda: supervisor.links["a"].connected and supervisor.links["b"].connected)
+    assert ports.attempts == {"a": 1, "b": 3}
+    status = supervisor.status()
+    assert status["a"]["reconnects"] == status["b"]["reconnects"] == 0
+
+
+def test_a_dropped_link_reconnects_without_disturbing_the_others(supervisor):
+    ports = supervisor.port_factory
+    assert wait_for(lambda: supervisor.links["a"].connected and supervisor.links["b"].connected)
+    first_a = ports.opened["a"]
+    first_a.broken = True
+    assert wait_for(lambda: ports.opened["a"] is not first_a and supervisor.links["a"].connected)
+    assert first_a.closed
+    assert supervisor.links["a"].reconnects == 1
+    assert supervisor.links["b"].reconnects == 0
+    assert ports.attempts["b"] == 3
+
+    # Both links carry telemetry afterwards, and the lost link's alarm is over
+    ports.opened["a"].buffer += status_line(11.5)
+    ports.opened["b"].buffer += status_line(7.25)
+    assert wait_for(lambda: supervisor.monitor("a").flow == 11.5 and supervisor.monitor("b").flow == 7.25)
+    assert not supervisor.monitor("a").alarm_active
+    assert supervisor.active_alarms() == []
+
+
+def test_removing_a_pump_closes_only_its_port(supervisor):
+    ports = supervisor.port_factory
+    assert wait_for(lambda: supervisor.links["a"].connected and supervisor.links["b"].connected)
+    supervisor.remove_pump("a")
+    assert ports.opened["a"].closed
+    assert not ports.opened["b"].closed
+    ports.opened["b"].buffer += status_line(3.5)
+    assert wait_for(lambda: supervisor.monitor("b").flow == 3.5)
@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("serial")
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="the simulator needs a pseudo-terminal")
+
+from volume.audio import AudioEngine, NullBackend  # noqa: E402
+from volume.simulator import Episode, VirtualPump  # noqa: E402
+from volume.worker import RemoteMonitor  # noqa: E402
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.002)
+    return condition()
+
+
+def test_setpoint_clearing_an_occlusion_reaches_the_gui_without_a_sample(tmp_path):
+    # 2 samples/s: a change that waited for the next sample would take up to 500 ms
+    pump = VirtualPump(rate=2, episodes=[Episode("occlusion", 0.5, 60)], seed=1)
+    pump.start()
+    monitor = RemoteMonitor(audio=AudioEngine(NullBackend()), ports=[pump.port_name], capture_dir=None)
+    try:
+        assert monitor.start(wait=True)
+        monitor.set_power(120)
+        assert wait_for(lambda: monitor.occlusion_detected)
+        monitor.set_power(130)   # already manual: only power and the occlusion flag change
+        assert wait_for(lambda: not monitor.occlusion_detected, timeout=0.2)
+    finally:
+        monitor.close()
+        monitor.audio.close()
+        pump.close()
+
+
+class SlowContext:
+    """A multiprocessing context whose processes take `delay` seconds to start."""
+
+    def __init__(self, context, starting, delay):
+        self.context = context
+        self.starting = starting
+        self.delay = delay
+
+    def Queue(self):
+        return self.context.Queue()
+
+    def Process(self, **kwargs):
+        return SlowProcess(self.context.Process(**kwargs), self)
+
+
+class SlowProcess:
+    def __init__(self, process, context):
+        self.process = process
+        self.context = context
+
+    def start(self):
+        self.context.starting.set()
+        time.sleep(self.context.delay)
+        self.process.start()
+
+    def __getattr__(self, name):
+        return getattr(self.process, name)
+
+
+def test_restarting_the_worker_does_not_block_gui_calls():
+    monitor = RemoteMonitor(audio=AudioEngine(NullBackend()), capture_dir=None)
+    starting = threading.Event()
+    try:
+        monitor._context = SlowContext(monitor._context, starting, 0.5)
+        monitor._process.kill()
+        assert starting.wait(10)
+        called = time.monotonic()
+        monitor.stop_alarm()   # takes the monitor's lock while the ingest failure alarm is up
+        assert time.monotonic() - called < 0.2
+        assert monitor.restarts == 1
+        assert wait_for(lambda: monitor._process is not None and monitor._process.is_alive(), timeout=10)
+    finally:
+        monitor.close()
+        monitor.audio.close()
@@ -0,0 +1 @@
+"""Support package for the VoluME infusion pump monitor."""
@@ -0,0 +1,261 @@
+"""Command line entry point.
+
+    python -m volume                                 # the PyQt window (VoluME.py)
+    python -m volume --headless --port /dev/ttyACM0  # log telemetry and alarms to stdout
+    python -m volume --headless --output pump.log --format json
+    python -m volume --headless --multi --port /dev/ttyUSB0 --port /dev/ttyUSB1
+    python -m volume --headless --replay captures/20261016-101500-COM3.vcap --speed 10
+    python -m volume --headless --calibrate --port /dev/ttyACM0  # with clear fluid flowing
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from .capture import ReplayPort
+from .discovery import default_cache_path
+from .monitor import PumpMonitor
+from .protocol import frame_to_dict
+from .scheduler import Scheduler
+from .store import TelemetryStore
+
+CALIBRATION_READINGS = 40     # colour readings of clear fluid for --calibrate
+CALIBRATION_TIMEOUT = 60.0    # seconds to wait for them
+
+# The metrics endpoint, the fan-out hub and the supervisor are imported by the
+# modes that use them, so starting the window does not load them
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m volume", description="VoluME infusion pump monitor")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without the GUI and stream telemetry and alarms")
+    parser.add_argument("--port", action="append",
+                        help="serial port to try (repeatable); defaults to searching every serial device")
+    parser.add_argument("--multi", action="store_true",
+                        help="with --headless: every --port is a separate pump on one supervisor loop")
+    parser.add_argument("--baud", type=int, default=9600, help="baud rate (default: 9600)")
+    parser.add_argument("--no-reconnect", action="store_true",
+                        help="exit when the link drops instead of reconnecting in the background")
+    parser.add_argument("--text-only", action="store_true",
+                        help="never negotiate the binary telemetry protocol")
+    parser.add_argument("--output", help="append to this file instead of writing to stdout")
+    parser.add_argument("--format", choices=("text", "json"), default="text",
+                        help="output format (default: text)")
+    parser.add_argument("--capture-dir", default="captures",
+                        help="directory for the always-on session capture (default: captures)")
+    parser.add_argument("--no-capture", action="store_true", help="do not record the session")
+    parser.add_argument("--store", default="telemetry.db",
+                        help="SQLite archive for telemetry and alarms (default: telemetry.db)")
+    parser.add_argument("--no-store", action="store_true", help="do not archive telemetry")
+    parser.add_argument("--replay", metavar="CAPTURE",
+                        help="with --headless: feed a recorded .vcap session instead of a serial port")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier, 0 for as fast as possible (default: 1)")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="with --headless: calibrate the colour sensor on the clear fluid now flowing, "
+                             "save it for this device and exit")
+    parser.add_argument("--simulate-battery", action="store_true",
+                        help="run the simulated battery model and its low battery alarm")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on localhost:PORT/metrics")
+    parser.add_argument("--fanout-port", type=int, metavar="PORT",
+                        help="publish live telemetry to remote viewers on PORT (python -m volume.fanout)")
+    parser.add_argument("--fanout-host", default="127.0.0.1",
+                        help="address the fan-out server listens on (default: 127.0.0.1)")
+    parser.add_argument("--latency-dump", metavar="JSON",
+                        help="record per-stage latencies and write them to this file on exit")
+    parser.add_argument("--worker", action="store_true",
+                        help="GUI only: run ingest and alarms in a separate process sharing memory with the window")
+    return parser.parse_args(argv)
+
+
+class EventLogger:
+    """Monitor subscriber that writes one line per sample or event."""
+
+    def __init__(self, stream, fmt="text"):
+        self.stream = stream
+        self.fmt = fmt
+        self.lock = threading.Lock()
+
+    def __call__(self, event, data, pump_id=None):
+        if event == "state":
+            return  # the telemetry and event lines already record every change
+        now = time.time()
+        if event == "frames":
+            # Mode and protocol frames are reported by their own monitor events
+            lines = [self.format(now, "telemetry", frame_to_dict(frame), pump_id)
+                     for frame in data if frame.kind == "status"]
+        else:
+            lines = [self.format(now, event, data, pump_id)]
+        with self.lock:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+
+    def format(self, now, event, data, pump_id=None):
+        if self.fmt == "json":
+            record = {"time": round(now, 3), "event": event, "data": data}
+            if pump_id is not None:
+                record["pump"] = pump_id
+            return json.dumps(record) + "\n"
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        if pump_id is not None:
+            stamp = f"{stamp} [{pump_id}]"
+        if isinstance(data, dict):
+            data = " ".join(f"{key}={value}" for key, value in data.items() if key != "kind")
+        elif data is None:
+            data = ""
+        return f"{stamp} {event.upper():<14} {data}\n"
+
+
+def write_latency(path, pumps):
+    """--latency-dump: each pump's stage histograms with its ingest counters, as JSON.
+
+    pumps maps a name to (PumpMonitor, ReaderStats or None).
+    """
+    report = {name: monitor.latency.as_dict(stats.as_dict() if stats else None)
+              for name, (monitor, stats) in pumps.items()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def calibrate(monitor, stream, readings=CALIBRATION_READINGS, timeout=CALIBRATION_TIMEOUT):
+    """--calibrate: wait for enough colour readings, then save them as this device's clear fluid."""
+    deadline = time.monotonic() + timeout
+    while monitor.color_readings() < readings:
+        if time.monotonic() > deadline or not monitor.monitoring:
+            print(f"calibration failed: {monitor.color_readings()} of {readings} colour readings received "
+                  "(firmware without raw RGB?)", file=sys.stderr)
+            return 1
+        time.sleep(0.1)
+    calibration = monitor.calibrate_colors()
+    stream.write(f"{monitor.pump_id or monitor.port_name}: calibrated {calibration.as_dict()} "
+                 f"from {monitor.color_readings()} readings\n")
+    stream.flush()
+    return 0
+
+
+def run_headless(args):
+    stream = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    capture_dir = None if args.no_capture or args.replay else args.capture_dir
+    store = None if args.no_store or args.replay else TelemetryStore(args.store)
+    monitor = PumpMonitor(ports=args.port, baudrate=args.baud, binary=not args.text_only,
+                          capture_dir=capture_dir, reconnect=not args.no_reconnect, store=store,
+                          port_cache=None if args.replay else default_cache_path())
+    monitor.latency.enabled = bool(args.latency_dump)
+    monitor.subscribe(EventLogger(stream, args.format))
+    metrics = None
+    if args.metrics_port is not None:
+        from .metrics import MetricsServer, monitor_source
+        metrics = MetricsServer([monitor_source(monitor)], port=args.metrics_port).start()
+    hub = None
+    if args.fanout_port is not None:
+        from .fanout import TelemetryHub
+        hub = TelemetryHub(args.fanout_host, args.fanout_port).start()
+        hub.attach(monitor)
+    try:
+        if args.replay:
+            replay = ReplayPort(args.replay, speed=args.speed)
+            monitor.attach(replay, args.replay)
+            replay.finished.wait()
+            return 0
+        if not monitor.start():
+            return 1
+        if args.calibrate:
+            return calibrate(monitor, stream)
+        monitor.check_battery()
+        # The battery steps and the link watchdog share the main thread's wakeups
+        scheduler = Scheduler()
+        failed = []
+
+        def watchdog():
+            if not monitor.monitoring:
+                scheduler.close()
+            elif monitor.serial_port is None and not monitor.connecting:
+                failed.append(True)  # the link failed for good; the error has been logged
+                scheduler.close()
+
+        scheduler.every(1.0, watchdog, "watchdog", slack=0.5)
+        if args.simulate_battery:
+            scheduler.every(10.0, monitor.drain_battery, "battery", slack=1.0)
+        scheduler.run()
+        if failed:
+            return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.latency_dump:
+            reader = monitor.reader
+            write_latency(args.latency_dump, {monitor.port_name or "pump": (monitor, reader and reader.stats)})
+        if metrics is not None:
+            metrics.close()
+        monitor.stop()
+        if hub is not None:
+            hub.close()
+        if store is not None:
+            store.close()
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
+
+
+def run_supervisor(args):
+    from .supervisor import PumpSupervisor
+    if not args.port:
+        print("--multi needs at least one --port", file=sys.stderr)
+        return 2
+    stream = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    logger = EventLogger(stream, args.format)
+    supervisor = PumpSupervisor()
+    supervisor.subscribe(lambda pump_id, event, data: logger(event, data, pump_id))
+    capture_dir = None if args.no_capture else args.capture_dir
+    # One archive for every pump; rows are tagged with the pump id
+    store = None if args.no_store else TelemetryStore(args.store)
+    hub = None
+    if args.fanout_port is not None:
+        from .fanout import TelemetryHub
+        hub = TelemetryHub(args.fanout_host, args.fanout_port).start()
+    for port in args.port:
+        monitor = supervisor.add_pump(port, port, baudrate=args.baud, binary=not args.text_only,
+                                      capture_dir=capture_dir, store=store)
+        monitor.latency.enabled = bool(args.latency_dump)
+        if hub is not None:
+            hub.attach(monitor, port)
+    metrics = None
+    if args.metrics_port is not None:
+        from .metrics import MetricsServer, supervisor_source
+        metrics = MetricsServer([supervisor_source(supervisor)], port=args.metrics_port).start()
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.latency_dump:
+            write_latency(args.latency_dump, {
+                pump_id: (link.monitor, link.ingest and link.ingest.stats)
+                for pump_id, link in list(supervisor.links.items())})
+        if metrics is not None:
+            metrics.close()
+        supervisor.stop()
+        if hub is not None:
+            hub.close()
+        if store is not None:
+            store.close()
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.headless:
+        return run_supervisor(args) if args.multi else run_headless(args)
+
+    # The window lives in VoluME.py next to this package
+    import VoluME
+    return VoluME.main(args.port, args.latency_dump, args.metrics_port, args.fanout_port, args.worker)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
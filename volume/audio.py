@@ -0,0 +1,254 @@
+"""Alarm audio on a worker thread.
+
+AudioEngine keeps the set of active alarms and, on its own thread, repeats
+the tone of the highest-priority one at the alarm cadence (a 200 ms beep
+every 500 ms, as the GUI's old alarm timer did). Nothing here ever blocks
+the caller. Tones are synthesized once into PCM buffers, on the engine's
+thread as it starts so creating an engine never delays a window, and the
+blood leakage sound asset is loaded once; backends only play them.
+
+Backends: WinsoundBackend (Windows), AplayBackend (Linux, ALSA's aplay) and
+NullBackend, which just records what would have been played.
+"""
+import io
+import math
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+SAMPLE_RATE = 22050
+BEEP_SECONDS = 0.2
+CADENCE_SECONDS = 0.5
+
+# Priority order (lowest number wins) and tone frequency for each alarm class
+BLOOD_LEAKAGE, OCCLUSION, LOW_FLOW, BATTERY, GENERIC = range(5)
+TONES = {
+    BLOOD_LEAKAGE: 1500,
+    OCCLUSION: 1350,
+    LOW_FLOW: 1200,
+    BATTERY: 900,
+    GENERIC: 1000,
+}
+ALARM_PRIORITIES = {
+    "blood_leakage": BLOOD_LEAKAGE,
+    "occlusion": OCCLUSION,
+    "low_flow": LOW_FLOW,
+    "low_battery": BATTERY,
+}
+
+
+def alarm_priority(alarm_type):
+    return ALARM_PRIORITIES.get(alarm_type, GENERIC)
+
+
+def synthesize_tone(frequency, seconds=BEEP_SECONDS, rate=SAMPLE_RATE, volume=0.5):
+    """16-bit mono PCM sine tone with 5 ms fades to avoid clicks."""
+    count = int(seconds * rate)
+    fade = max(1, int(0.005 * rate))
+    amplitude = 32767 * volume
+    step = 2 * math.pi * frequency / rate
+    samples = []
+    for i in range(count):
+        envelope = min(1.0, i / fade, (count - 1 - i) / fade)
+        samples.append(int(amplitude * envelope * math.sin(step * i)))
+    return struct.pack(f"<{count}h", *samples)
+
+
+def pcm_to_wav(pcm, rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class SoundAsset:
+    """A sound file loaded once: WAV files are kept in memory, others by path."""
+
+    def __init__(self, path):
+        self.path = path
+        self.wav = None
+        self.available = bool(path) and os.path.exists(path)
+        if self.available and path.lower().endswith(".wav"):
+            with open(path, "rb") as f:
+                self.wav = f.read()
+
+
+class NullBackend:
+    """Plays nothing; records (kind, name) pairs for tests and headless runs."""
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self.played = []
+
+    def play_tone(self, priority, pcm, wav):
+        self.played.append(("tone", priority))
+        if self.realtime:
+            time.sleep(len(pcm) / 2 / SAMPLE_RATE)
+
+    def play_asset(self, asset):
+        self.played.append(("asset", asset.path))
+        return True
+
+
+class WinsoundBackend:
+    """Windows: tones from memory through winsound, compressed assets through playsound."""
+
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play_tone(self, priority, pcm, wav):
+        self.winsound.PlaySound(wav, self.winsound.SND_MEMORY)
+
+    def play_asset(self, asset):
+        if asset.wav is not None:
+            self.winsound.PlaySound(asset.wav, self.winsound.SND_MEMORY)
+            return True
+        try:
+            from playsound import playsound
+            playsound(asset.path, block=True)
+            return True
+        except Exception:
+            return False
+
+
+class AplayBackend:
+    """Linux: raw PCM piped to ALSA's aplay; assets through paplay/aplay if present."""
+
+    def __init__(self, command="aplay"):
+        self.command = command
+
+    def play_tone(self, priority, pcm, wav):
+        subprocess.run([self.command, "-q", "-t", "raw", "-f", "S16_LE", "-r", str(SAMPLE_RATE), "-c", "1"],
+                       input=pcm, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+    def play_asset(self, asset):
+        player = shutil.which("paplay") or (self.command if asset.wav is not None else None)
+        if player is None:
+            return False
+        result = subprocess.run([player, asset.path], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, check=False)
+        return result.returncode == 0
+
+
+def default_backend():
+    """The best backend available on this platform, falling back to NullBackend."""
+    if sys.platform == "win32":
+        try:
+            return WinsoundBackend()
+        except ImportError:
+            pass
+    elif shutil.which("aplay"):
+        return AplayBackend()
+    return NullBackend()
+
+
+class AudioEngine:
+    """Priority-ordered alarm sounds played on a dedicated thread."""
+
+    def __init__(self, backend=None, asset_path="blood_leakage.mp3", cadence=CADENCE_SECONDS):
+        self.backend = backend or default_backend()
+        self.cadence = cadence
+        self.asset = SoundAsset(asset_path)
+        self.tones = {}            # priority -> (pcm, wav), filled by the engine thread
+
+        self.errors = 0
+        self._active = {}          # alarm type -> priority
+        self._asset_due = False
+        self._wake = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="AudioEngine", daemon=True)
+        self._thread.start()
+
+    def request(self, alarm_type):
+        """Start sounding an alarm; repeated requests for the same alarm are no-ops."""
+        with self._wake:
+            if alarm_type in self._active:
+                return
+            self._active[alarm_type] = alarm_priority(alarm_type)
+            if alarm_type == "blood_leakage":
+                self._asset_due = True
+            self._wake.notify()
+
+    def cancel(self, alarm_type):
+        with self._wake:
+            self._active.pop(alarm_type, None)
+            self._wake.notify()
+
+    def clear(self):
+        with self._wake:
+            self._active.clear()
+            self._asset_due = False
+            self._wake.notify()
+
+    def set_alarms(self, alarm_types):
+        """Sound exactly these alarms (a state snapshot's raised alarms); new ones start at once."""
+        with self._wake:
+            wanted = set(alarm_types)
+            for alarm_type in list(self._active):
+                if alarm_type not in wanted:
+                    del self._active[alarm_type]
+            for alarm_type in alarm_types:
+                if alarm_type not in self._active:
+                    self._active[alarm_type] = alarm_priority(alarm_type)
+                    if alarm_type == "blood_leakage":
+                        self._asset_due = True
+            if not self._active:
+                self._asset_due = False
+            self._wake.notify()
+
+    @property
+    def current(self):
+        """Priority of the alarm being sounded, or None."""
+        with self._wake:
+            return min(self._active.values()) if self._active else None
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._active.clear()
+            self._wake.notify()
+        self._thread.join()
+
+    def _run(self):
+        # Synthesized once; playing an alarm never generates audio on the fly
+        for priority, frequency in TONES.items():
+            pcm = synthesize_tone(frequency)
+            self.tones[priority] = (pcm, pcm_to_wav(pcm))
+        while True:
+            with self._wake:
+                while not self._active and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                priority = min(self._active.values())
+                play_asset, self._asset_due = self._asset_due, False
+
+            started = time.monotonic()
+            try:
+                if play_asset and self.asset.available and self.backend.play_asset(self.asset):
+                    pass
+                elif priority != BLOOD_LEAKAGE or not self.asset.available:
+                    # The blood leakage asset replaces its beep when it can be played
+                    pcm, wav = self.tones[priority]
+                    self.backend.play_tone(priority, pcm, wav)
+            except Exception:
+                self.errors += 1
+
+            # Wait out the rest of the cadence, cutting it short only when the alarms
+            # stop or a more urgent one starts
+            deadline = started + self.cadence
+            with self._wake:
+                while not self._closed and self._active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or min(self._active.values()) < priority:
+                        break
+                    self._wake.wait(remaining)
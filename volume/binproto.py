@@ -0,0 +1,201 @@
+"""Compact binary telemetry frames ("BIN" protocol) sent by finalcode1.ino.
+
+Each sample is a fixed 12-byte little-endian record followed by a big-endian
+CRC-16/CCITT-FALSE, COBS-encoded and terminated by a zero byte (16 bytes on
+the wire, against ~60 for the text status line):
+
+    uint16 seq | uint8 status | uint8 pwm | uint16 flow (0.01 mL/min)
+    uint16 red | uint16 green | uint16 blue   (TCS3200 pulse widths, us)
+"""
+import struct
+from binascii import crc_hqx
+
+from .protocol import ColorStatusFrame
+
+RECORD = struct.Struct("<HBBHHHH")
+FRAME_SIZE = RECORD.size + 2  # record + CRC
+_FRAME = struct.Struct(RECORD.format + "2x")  # the CRC is skipped when unpacking
+PACKET_SIZE = FRAME_SIZE + 1  # COBS adds one code byte to a packet this short
+FLOW_SCALE = 100.0
+# Reads with fewer packets than this are decoded one by one: NumPy's fixed cost
+# per call is larger than the loop's for a handful of frames
+BATCH_PACKETS = 32
+
+STATUS_NAMES = ("NORMAL", "BLOOD LEAKAGE", "MANUAL")
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+UNKNOWN_STATUS = 255  # code for status texts outside STATUS_NAMES, where codes are stored
+
+
+class BinaryStatusFrame(ColorStatusFrame):
+    """Status sample from the binary protocol, with sequence number and raw colour readings."""
+
+    __slots__ = ("seq",)
+
+    def __init__(self, status, power, flow, seq, red, green, blue):
+        # Built once per sample, so the slots are set here rather than through the base classes
+        self.status = status
+        self.power = power
+        self.flow = flow
+        self.seq = seq
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    def __repr__(self):
+        return (f"BinaryStatusFrame({self.status!r}, {self.power}, {self.flow}, seq={self.seq}, "
+                f"rgb=({self.red}, {self.green}, {self.blue}))")
+
+
+def cobs_encode(data):
+    """COBS-encode data (without the trailing zero delimiter)."""
+    out = bytearray()
+    for block in bytes(data).split(b"\0"):
+        # Blocks longer than 254 bytes are split with a 0xFF code that implies no zero
+        while len(block) >= 254:
+            out.append(0xFF)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Decode one COBS packet (delimiter already removed); raises ValueError if malformed."""
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        code = data[i]
+        if code == 0 or i + code > n:
+            raise ValueError("bad COBS code")
+        out += data[i + 1:i + code]
+        i += code
+        if code != 0xFF and i < n:
+            out.append(0)
+    return bytes(out)
+
+
+_crc_table = None
+
+
+def _decode_batch(wire):
+    """COBS-decode and CRC-check every packet in wire (zero-terminated packets)
+    at once; returns the good frames (record + CRC), joined, and the number of bad ones."""
+    import numpy as np
+    global _crc_table
+    if _crc_table is None:
+        _crc_table = np.array([crc_hqx(bytes((i,)), 0) for i in range(256)], np.int64)
+
+    data = np.frombuffer(wire, np.uint8)
+    ends = np.flatnonzero(data == 0)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    sized = lengths == PACKET_SIZE
+    bad = np.count_nonzero(lengths) - np.count_nonzero(sized)
+
+    # Every byte of a packet is non-zero: the first is a code, each code gives the
+    # distance to the next one, and code positions become the record's zero bytes
+    packets = data[starts[sized, None] + np.arange(PACKET_SIZE)]
+    raw = packets.copy()
+    rows = np.arange(len(packets))
+    code = packets[:, 0].astype(np.intp)
+    live = code < PACKET_SIZE
+    while live.any():
+        r, c = rows[live], code[live]
+        raw[r, c] = 0
+        code[live] = c + packets[r, c]
+        live = code < PACKET_SIZE
+    raw = raw[code == PACKET_SIZE, 1:]
+
+    # CRC-16/CCITT-FALSE one byte column at a time; record + CRC leaves a zero residue
+    crc = np.full(len(raw), 0xFFFF, np.int64)
+    for column in raw.T:
+        crc = ((crc << 8) & 0xFFFF) ^ _crc_table[(crc >> 8) ^ column]
+    good = raw[crc == 0]
+    return good.tobytes(), int(bad) + len(packets) - len(good)
+
+
+def _decode_packets(packets):
+    """_decode_batch() one packet at a time, for short reads; decodes the
+    (bytearray) packets in place."""
+    good = []
+    bad = 0
+    for raw in packets:
+        if len(raw) != PACKET_SIZE:
+            bad += len(raw) != 0
+            continue
+        # As in _decode_batch: the code positions are the record's zero bytes
+        i = raw[0]
+        while i < PACKET_SIZE:
+            code = raw[i]
+            raw[i] = 0
+            i += code
+        del raw[0]
+        # Running the CRC over record + big-endian CRC leaves a zero residue
+        if i != PACKET_SIZE or crc_hqx(raw, 0xFFFF):
+            bad += 1
+            continue
+        good.append(raw)
+    return b"".join(good), bad
+
+
+def encode_frame(seq, status, power, flow, red=0, green=0, blue=0):
+    """Build one wire frame, delimiter included (the firmware's sendBinaryFrame in Python)."""
+    record = RECORD.pack(seq & 0xFFFF, STATUS_CODES.get(status, 0), power & 0xFF,
+                         min(int(round(flow * FLOW_SCALE)), 0xFFFF), red, green, blue)
+    return cobs_encode(record + crc_hqx(record, 0xFFFF).to_bytes(2, "big")) + b"\0"
+
+
+class BinaryDecoder:
+    """Incremental decoder for a stream of binary frames.
+
+    feed() accepts whatever the port returned and yields every complete
+    frame in it; a read of many frames is decoded as one batch with NumPy.
+    Corrupt packets (bad COBS, length or CRC) and gaps in the sequence
+    numbers are counted rather than raised.
+    """
+
+    protocol = "BIN"
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.corrupt = 0
+        self.dropped = 0
+        self.out_of_order = 0
+        self.last_seq = None
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        end = buffer.rfind(b"\0")
+        if end < 0:
+            return []
+        if end >= BATCH_PACKETS * PACKET_SIZE:
+            records, bad = _decode_batch(bytes(buffer[:end + 1]))
+        else:
+            records, bad = _decode_packets(buffer[:end].split(b"\0"))
+        del buffer[:end + 1]
+        self.corrupt += bad
+        if not records:
+            return []
+
+        frames = []
+        last = self.last_seq
+        names = STATUS_NAMES
+        for seq, status, pwm, flow, red, green, blue in _FRAME.iter_unpack(records):
+            if last is not None:
+                gap = (seq - last - 1) & 0xFFFF
+                if gap >= 0x8000:
+                    self.out_of_order += 1
+                else:
+                    self.dropped += gap
+            last = seq
+            name = names[status] if status < len(names) else "UNKNOWN"
+            frames.append(BinaryStatusFrame(name, pwm, flow / FLOW_SCALE, seq, red, green, blue))
+        self.last_seq = last
+        self.frames += len(frames)
+        return frames
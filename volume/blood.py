@@ -0,0 +1,284 @@
+"""Blood leakage classification from the colour sensor's raw readings.
+
+The firmware's own rule (red is the largest mapped channel) decides on a
+single reading, so one bubble or a change in room lighting raises the
+alarm. Both protocols now carry the TCS3200's raw red, green and blue
+pulse widths, and the host decides instead:
+
+- ColorCalibration turns pulse widths into intensities relative to a
+  reference reading of clear fluid, taken on the device under its own
+  ambient light; an optional dark reading (ambient light only) is
+  subtracted first. Calibrated, every sensor reads clear fluid as (1, 1, 1).
+- BloodClassifier scores samples in windows with NumPy. The feature is the
+  log of red against the mean of green and blue, the window's median of it
+  goes through a logistic curve, and the result is a confidence in [0, 1].
+- BloodLeakDetector adds persistence: it declares a leak after `confirm`
+  consecutive windows with at least `on` confidence, and clears it after
+  `clear_confirm` windows at or below `off`.
+
+detect_blood() runs the same decisions over recorded arrays, and the
+command line fits calibrations and scans captures:
+
+    python -m volume.blood calibrate captures/clear.vcap --device /dev/ttyACM0
+    python -m volume.blood scan captures/20261016-101500-COM3.vcap
+
+NumPy is required by this module.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Clear fluid on the prototype under bench lighting (the simulator sends the same)
+DEFAULT_REFERENCE = (420.0, 230.0, 250.0)
+RECENT = 512   # raw readings kept for calibrating from the live stream
+
+
+def default_calibration_path():
+    return os.path.join(os.path.expanduser("~"), ".volume", "calibration.json")
+
+
+class ColorCalibration:
+    """Pulse widths (us) of clear fluid (reference) and of ambient light alone (dark, optional)."""
+
+    def __init__(self, reference=DEFAULT_REFERENCE, dark=None):
+        self.reference = tuple(float(value) for value in reference)
+        self.dark = tuple(float(value) for value in dark) if dark else None
+        offset = 1.0 / np.asarray(self.dark) if self.dark else np.zeros(3)
+        self._offset = offset
+        self._scale = 1.0 / np.maximum(1.0 / np.asarray(self.reference) - offset, 1e-9)
+
+    def intensities(self, red, green, blue):
+        """(n, 3) channel intensities relative to the reference; clear fluid is about 1."""
+        widths = np.column_stack((red, green, blue)).astype(np.float64)
+        # A short pulse is a strong component; zero means the reading timed out
+        raw = 1.0 / np.maximum(widths, 1.0)
+        return np.maximum(raw - self._offset, 0.0) * self._scale
+
+    @classmethod
+    def fit(cls, red, green, blue, dark=None):
+        """Calibration from readings of clear fluid (median per channel) and optional dark readings."""
+        reference = [float(np.median(np.asarray(channel, dtype=np.float64))) for channel in (red, green, blue)]
+        if dark is not None:
+            dark = [float(np.median(np.asarray(channel, dtype=np.float64))) for channel in dark]
+        return cls(reference, dark)
+
+    def as_dict(self):
+        return {"reference": list(self.reference), "dark": list(self.dark) if self.dark else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["reference"], data.get("dark"))
+
+
+class CalibrationCache:
+    """Colour calibrations per device (port name or pump id), kept in a small JSON file."""
+
+    def __init__(self, path=None):
+        self.path = path or default_calibration_path()
+
+    def _entries(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, device):
+        """The device's ColorCalibration, or None if it has none."""
+        entry = self._entries().get(str(device))
+        try:
+            return ColorCalibration.from_dict(entry) if entry else None
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def save(self, device, calibration):
+        entries = self._entries()
+        entries[str(device)] = dict(calibration.as_dict(), time=time.time())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=1)
+        except OSError:
+            pass  # the defaults still work; never fail monitoring over a calibration file
+
+
+class BloodClassifier:
+    """Blood confidence for windows of colour readings.
+
+    midpoint  red-against-green/blue log ratio scored 0.5 (about 2.2x the reference)
+    slope     steepness of the logistic curve around it
+    """
+
+    def __init__(self, calibration=None, midpoint=0.8, slope=6.0):
+        self.calibration = calibration or ColorCalibration()
+        self.midpoint = midpoint
+        self.slope = slope
+
+    def features(self, red, green, blue):
+        """Per-sample log ratio of red to the geometric mean of green and blue."""
+        logs = np.log(np.maximum(self.calibration.intensities(red, green, blue), 1e-3))
+        return logs[:, 0] - 0.5 * (logs[:, 1] + logs[:, 2])
+
+    def confidence(self, features, window):
+        """Confidence for every complete window of `window` consecutive features."""
+        count = len(features) // window
+        if not count:
+            return np.empty(0)
+        # The median ignores a bubble or a glitch shorter than half a window
+        median = np.median(np.reshape(features[:count * window], (count, window)), axis=1)
+        return 1.0 / (1.0 + np.exp(-self.slope * (median - self.midpoint)))
+
+    def score(self, red, green, blue, window=4):
+        return self.confidence(self.features(red, green, blue), window)
+
+
+class BloodLeakDetector:
+    """Streaming blood leakage decision with confirmation windows and hysteresis.
+
+    window         samples scored together
+    on, off        confidence needed to count towards declaring / clearing a leak
+    confirm        consecutive windows above `on` before a leak is declared
+    clear_confirm  consecutive windows at or below `off` before it clears
+    """
+
+    def __init__(self, classifier=None, window=4, on=0.8, off=0.3, confirm=2, clear_confirm=3):
+        if window < 1 or confirm < 1 or clear_confirm < 1:
+            raise ValueError("windows must be at least one sample")
+        if not 0 <= off < on <= 1:
+            raise ValueError("need 0 <= off < on <= 1")
+        self.classifier = classifier or BloodClassifier()
+        self.window = window
+        self.on = on
+        self.off = off
+        self.confirm = confirm
+        self.clear_confirm = clear_confirm
+        self.reset()
+
+    def reset(self):
+        self.detected = False
+        self.confidence = 0.0
+        self.streak = 0
+        self.windows = 0
+        self.transitions = 0
+        self.recent = np.empty((0, 3))
+        self._features = np.empty(0)
+
+    def update(self, red, green, blue):
+        """Feed a batch of readings; returns the state after each of them as a bool array."""
+        n = len(red)
+        states = np.empty(n, dtype=bool)
+        if not n:
+            return states
+        self.recent = np.concatenate((self.recent, np.column_stack((red, green, blue))))[-RECENT:]
+        buffered = len(self._features)
+        features = np.concatenate((self._features, self.classifier.features(red, green, blue)))
+        confidences = self.classifier.confidence(features, self.window)
+        used = len(confidences) * self.window
+        self._features = features[used:]
+
+        position = 0
+        for index, confidence in enumerate(confidences.tolist()):
+            last = (index + 1) * self.window - buffered - 1   # the window's last sample in this batch
+            states[position:last] = self.detected
+            self._step(confidence)
+            states[last] = self.detected
+            position = last + 1
+        states[position:] = self.detected
+        return states
+
+    def _step(self, confidence):
+        self.windows += 1
+        self.confidence = confidence
+        if not self.detected:
+            self.streak = self.streak + 1 if confidence >= self.on else 0
+            if self.streak >= self.confirm:
+                self.detected = True
+                self.streak = 0
+                self.transitions += 1
+        else:
+            self.streak = self.streak + 1 if confidence <= self.off else 0
+            if self.streak >= self.clear_confirm:
+                self.detected = False
+                self.streak = 0
+                self.transitions += 1
+
+    def calibrate(self, dark=None):
+        """Calibrate on the recent readings, taken while clear fluid was flowing; returns the calibration."""
+        if not len(self.recent):
+            raise ValueError("no colour readings to calibrate from")
+        calibration = ColorCalibration.fit(self.recent[:, 0], self.recent[:, 1], self.recent[:, 2], dark)
+        self.classifier.calibration = calibration
+        return calibration
+
+
+def detect_blood(red, green, blue, detector=None):
+    """Blood leakage state after every sample of recorded arrays, as a NumPy bool array.
+
+    Gives the same decisions as feeding the samples to a fresh detector
+    configured like `detector`; all windows are scored in one NumPy pass.
+    """
+    d = detector or BloodLeakDetector()
+    fresh = BloodLeakDetector(d.classifier, d.window, d.on, d.off, d.confirm, d.clear_confirm)
+    return fresh.update(np.asarray(red), np.asarray(green), np.asarray(blue))
+
+
+def capture_colors(path):
+    """(times, red, green, blue) arrays of every colour reading in a capture file."""
+    from .capture import read_capture
+    from .reader import StreamIngest
+
+    ingest = StreamIngest(lambda data: None)
+    rows = []
+    for timestamp, _, data in read_capture(path):
+        for frame in ingest.feed(data):
+            if frame.kind == "status" and hasattr(frame, "red"):
+                rows.append((timestamp, frame.red, frame.green, frame.blue))
+    if not rows:
+        return np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+    times, red, green, blue = (np.asarray(column, dtype=np.float64) for column in zip(*rows))
+    return times, red, green, blue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m volume.blood", description="Colour calibration and blood leak scans")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate = commands.add_parser("calibrate", help="fit a device's calibration from a capture of clear fluid")
+    calibrate.add_argument("capture")
+    calibrate.add_argument("--device", required=True, help="port name or pump id the calibration is for")
+    calibrate.add_argument("--dark", metavar="CAPTURE", help="capture taken with only ambient light on the sensor")
+    calibrate.add_argument("--file", help="calibration file (default: ~/.volume/calibration.json)")
+    scan = commands.add_parser("scan", help="list the blood leak episodes found in a capture")
+    scan.add_argument("capture")
+    scan.add_argument("--device", help="use this device's saved calibration")
+    scan.add_argument("--file", help="calibration file (default: ~/.volume/calibration.json)")
+    args = parser.parse_args(argv)
+    cache = CalibrationCache(args.file)
+
+    times, red, green, blue = capture_colors(args.capture)
+    if not len(red):
+        print(f"{args.capture}: no colour readings (firmware without raw RGB?)", file=sys.stderr)
+        return 1
+    if args.command == "calibrate":
+        dark = capture_colors(args.dark)[1:] if args.dark else None
+        calibration = ColorCalibration.fit(red, green, blue, dark)
+        cache.save(args.device, calibration)
+        print(f"{args.device}: {calibration.as_dict()} from {len(red)} readings")
+        return 0
+
+    calibration = cache.load(args.device) if args.device else None
+    state = detect_blood(red, green, blue, BloodLeakDetector(BloodClassifier(calibration)))
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], state, [False])).astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2]):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(times[start]))}  "
+              f"blood leakage for {times[end - 1] - times[start]:.1f} s ({end - start} readings)")
+    print(f"{len(red)} readings, {len(edges) // 2} episodes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Recording and replay of raw serial sessions.
+
+Capture files (.vcap) are append-only sequences of chunks:
+
+    file header   b"VOLCAP1\\n"
+    chunk header  <4sBIdII  magic b"CHNK", flags (1 = zlib), record count,
+                            base time (Unix seconds), payload size, stored size
+    payload       records <IIB (microseconds after base time, length,
+                  direction 0 = from pump / 1 = to pump) followed by the bytes
+    chunk footer  <I  CRC-32 of the stored payload
+
+Records are the raw bytes of each port read or write, so a replay goes back
+through exactly the same decoding path. The recorder only appends to a
+memory buffer on the ingest thread; a background thread compresses and
+writes whole chunks. A chunk cut short by a crash is skipped on reading.
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+
+FILE_MAGIC = b"VOLCAP1\n"
+CHUNK_HEADER = struct.Struct("<4sBIdII")
+CHUNK_FOOTER = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<IIB")
+CHUNK_MAGIC = b"CHNK"
+FLAG_ZLIB = 1
+
+RX = 0
+TX = 1
+
+
+class CaptureWriter:
+    """Append timestamped raw frames to a capture file from any thread."""
+
+    def __init__(self, path, chunk_bytes=65536, flush_interval=1.0, compress=True):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.records = 0
+        self.bytes_written = 0
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new_file:
+            self._file.write(FILE_MAGIC)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._buffer = bytearray()
+        self._count = 0
+        self._base = None
+        self._ready = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="CaptureWriter", daemon=True)
+        self._thread.start()
+
+    def record(self, data, direction=RX, timestamp=None):
+        """Queue one raw read (RX) or write (TX); cheap enough for the ingest path."""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            if self._closed:
+                return
+            if self._base is None:
+                self._base = timestamp
+            delta = int((timestamp - self._base) * 1e6)
+            if delta < 0 or delta > 0xFFFFFFFF:
+                self._seal()
+                self._base = timestamp
+                delta = 0
+            self._buffer += RECORD_HEADER.pack(delta, len(data), direction)
+            self._buffer += data
+            self._count += 1
+            self.records += 1
+            if len(self._buffer) >= self.chunk_bytes:
+                self._seal()
+                self._wake.notify()
+
+    def _seal(self):
+        # Called with the lock held: hand the current buffer to the writer thread
+        if self._count:
+            self._ready.append((self._base, self._count, bytes(self._buffer)))
+        self._buffer.clear()
+        self._count = 0
+        self._base = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._ready and not self._closed:
+                    self._wake.wait(self.flush_interval)
+                if not self._ready:
+                    self._seal()
+                ready, self._ready = self._ready, []
+                closed = self._closed
+            for base, count, payload in ready:
+                self._write_chunk(base, count, payload)
+            if ready:
+                self._file.flush()
+            if closed:
+                self._file.close()
+                return
+
+    def _write_chunk(self, base, count, payload):
+        flags = 0
+        stored = payload
+        if self.compress:
+            stored = zlib.compress(payload, 1)
+            flags |= FLAG_ZLIB
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, flags, count, base, len(payload), len(stored)))
+        self._file.write(stored)
+        self._file.write(CHUNK_FOOTER.pack(zlib.crc32(stored)))
+        self.bytes_written += CHUNK_HEADER.size + len(stored) + CHUNK_FOOTER.size
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._seal()
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+
+
+def read_capture(path, directions=(RX,)):
+    """Yield (timestamp, direction, data) for every record of a capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a VoluME capture")
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                return
+            magic, flags, count, base, size, stored_size = CHUNK_HEADER.unpack(header)
+            if magic != CHUNK_MAGIC:
+                return
+            stored = f.read(stored_size)
+            footer = f.read(CHUNK_FOOTER.size)
+            if len(stored) < stored_size or len(footer) < CHUNK_FOOTER.size:
+                return  # truncated by a crash
+            if CHUNK_FOOTER.unpack(footer)[0] != zlib.crc32(stored):
+                continue
+            payload = zlib.decompress(stored) if flags & FLAG_ZLIB else stored
+            offset = 0
+            for _ in range(count):
+                delta, length, direction = RECORD_HEADER.unpack_from(payload, offset)
+                offset += RECORD_HEADER.size
+                if direction in directions:
+                    yield base + delta / 1e6, direction, payload[offset:offset + length]
+                offset += length
+
+
+class ReplayPort:
+    """Serial-like object that plays back the pump's side of a capture.
+
+    speed is a multiplier of the recorded timing (1 = real time); None or 0
+    replays as fast as the consumer reads. Writes are accepted and dropped.
+    finished is set once every record has been read.
+    """
+
+    def __init__(self, path, speed=1.0, timeout=0.1):
+        self.port = path
+        self.speed = speed or None
+        self.timeout = timeout
+        self.is_open = True
+        self.finished = threading.Event()
+        self._records = read_capture(path)
+        self._pending = b""
+        self._due = None
+        self._first = None
+        self._start = None
+        self._advance()
+
+    def _advance(self):
+        record = next(self._records, None)
+        if record is None:
+            self._pending = b""
+            self._due = None
+            return
+        timestamp, _, data = record
+        if self._first is None:
+            self._first = timestamp
+            self._start = time.monotonic()
+        self._pending = data
+        self._due = self._start + (timestamp - self._first) / self.speed if self.speed else 0.0
+
+    @property
+    def in_waiting(self):
+        if self._due is not None and self._due <= time.monotonic():
+            return len(self._pending)
+        return 0
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise OSError("replay port is closed")
+        if self._due is None:
+            self.finished.set()
+            time.sleep(self.timeout)
+            return b""
+        wait = self._due - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, self.timeout))
+            if wait > self.timeout:
+                return b""
+        data = self._pending[:size]
+        self._pending = self._pending[size:]
+        if not self._pending:
+            self._advance()
+        return data
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+        self._records.close()
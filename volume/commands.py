@@ -0,0 +1,217 @@
+"""Paced, coalescing command pipeline to the pump.
+
+The firmware handles one command line per loop() (every 500 ms in text
+mode), so commands written faster than that queue up in the board's serial
+buffer and the pump lags behind the operator. CommandWriter instead keeps
+at most one command in flight: it writes the next one only when the
+previous one has been acknowledged or has timed out. Meanwhile setpoints
+are last-value-wins, so a slider drag becomes one or two writes, while
+mode commands such as AUTO are queued and never dropped.
+
+Acknowledgements are the firmware's "Manual Mode: ..." and "Switched to
+AUTO" lines. In binary mode, where the firmware prints no acks, the first
+status frame that shows the commanded state counts as the ack; for AUTO
+only once the pump has been seen in MANUAL after the command, since a
+status already in flight would otherwise look like one. (A pump that was
+already in AUTO then gives no ack, and the command times out.)
+"""
+import collections
+import threading
+import time
+
+ACK_TIMEOUT = 2.0  # a little over the firmware's slowest loop plus a status line
+
+
+class Command:
+    """One command line; power is set for setpoints and None for mode commands."""
+
+    __slots__ = ("text", "power", "submitted", "sent", "seen_manual")
+
+    def __init__(self, text, power=None):
+        self.text = text
+        self.power = power
+        self.submitted = time.monotonic()
+        self.sent = None
+        self.seen_manual = False
+
+    @property
+    def is_setpoint(self):
+        return self.power is not None
+
+    def acknowledged_by(self, frame):
+        """Whether frame acknowledges the command; frames must be passed in arrival order."""
+        if frame.kind == "mode":
+            if self.is_setpoint:
+                return frame.mode == "MANUAL" and frame.power in (None, self.power)
+            return frame.mode == self.text
+        if frame.kind == "status":
+            if self.is_setpoint:
+                return frame.status == "MANUAL" and frame.power == self.power
+            if self.text != "AUTO":
+                return False
+            if frame.status == "MANUAL":
+                self.seen_manual = True
+                return False
+            return self.seen_manual
+        return False
+
+
+class CommandStats:
+    """Counters and command-to-acknowledgement round-trip times (seconds)."""
+
+    __slots__ = ("submitted", "sent", "coalesced", "acked", "timeouts",
+                 "last_rtt", "max_rtt", "total_rtt")
+
+    def __init__(self):
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.last_rtt = None
+        self.max_rtt = 0.0
+        self.total_rtt = 0.0
+
+    @property
+    def mean_rtt(self):
+        return self.total_rtt / self.acked if self.acked else None
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["mean_rtt"] = self.mean_rtt
+        return data
+
+
+class CommandWriter:
+    """Writes queued commands on its own thread, one acknowledged command at a time.
+
+    write(bytes) sends a line and returns whether it went out.
+    on_ack(command, rtt) is called from the thread that delivered the
+    acknowledging frame; on_timeout(command) from the writer thread.
+    """
+
+    def __init__(self, write, on_ack=None, on_timeout=None, ack_timeout=ACK_TIMEOUT):
+        self.write = write
+        self.on_ack = on_ack
+        self.on_timeout = on_timeout
+        self.ack_timeout = ack_timeout
+        self.stats = CommandStats()
+        self._queue = collections.deque()
+        self._in_flight = None
+        self._wake = threading.Condition()
+        self._thread = None   # the writer thread runs for as long as it is this one
+
+    @property
+    def pending(self):
+        """Commands queued or awaiting acknowledgement."""
+        with self._wake:
+            return len(self._queue) + (self._in_flight is not None)
+
+    def set_power(self, power):
+        """Queue a setpoint, replacing one that has not been written yet."""
+        with self._wake:
+            self.stats.submitted += 1
+            if self._queue and self._queue[-1].is_setpoint:
+                self._queue[-1] = Command(f"{power}", power)
+                self.stats.coalesced += 1
+            else:
+                self._queue.append(Command(f"{power}", power))
+            self._start()
+
+    def send(self, text):
+        """Queue a mode command (e.g. "AUTO"); unsent setpoints before it are superseded."""
+        with self._wake:
+            self.stats.submitted += 1
+            dropped = sum(1 for command in self._queue if command.is_setpoint)
+            if dropped:
+                self._queue = collections.deque(c for c in self._queue if not c.is_setpoint)
+                self.stats.coalesced += dropped
+            self._queue.append(Command(text))
+            self._start()
+
+    def clear(self):
+        """Forget queued and in-flight commands, e.g. when the link drops."""
+        with self._wake:
+            self._queue.clear()
+            self._in_flight = None
+            self._wake.notify()
+
+    def acknowledge(self, frames):
+        """Match received frames against the command in flight."""
+        with self._wake:
+            command = self._in_flight
+            if command is None:
+                return
+            for frame in frames:
+                if command.acknowledged_by(frame):
+                    break
+            else:
+                return
+            # An ack that beats write() returning is timed as immediate
+            rtt = time.monotonic() - command.sent if command.sent is not None else 0.0
+            stats = self.stats
+            stats.acked += 1
+            stats.last_rtt = rtt
+            stats.max_rtt = max(stats.max_rtt, rtt)
+            stats.total_rtt += rtt
+            self._in_flight = None
+            self._wake.notify()
+        if self.on_ack:
+            self.on_ack(command, rtt)
+
+    def close(self):
+        """Drop every pending command and stop the writer thread; the next command starts a new one."""
+        with self._wake:
+            self._queue.clear()
+            self._in_flight = None
+            thread, self._thread = self._thread, None
+            self._wake.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _start(self):
+        # Called with the condition held; the thread exists only once commands do
+        self._wake.notify_all()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="CommandWriter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        me = threading.current_thread()
+        while True:
+            with self._wake:
+                while self._thread is me:
+                    command = self._in_flight
+                    if command is not None:
+                        remaining = command.sent + self.ack_timeout - time.monotonic()
+                        if remaining > 0:
+                            self._wake.wait(remaining)
+                            continue
+                        # No acknowledgement: give up on it and move on
+                        self._in_flight = None
+                        self.stats.timeouts += 1
+                        timed_out = command
+                        break
+                    if self._queue:
+                        command = self._queue.popleft()
+                        self._in_flight = command
+                        timed_out = None
+                        break
+                    self._wake.wait()
+                else:
+                    return
+            if timed_out is not None:
+                if self.on_timeout:
+                    self.on_timeout(timed_out)
+                continue
+            # Written outside the condition so acknowledgements are never held up by the port;
+            # the round trip and the timeout count from when the write returned
+            written = self.write(f"{command.text}\n".encode())
+            now = time.monotonic()
+            with self._wake:
+                if written:
+                    self.stats.sent += 1
+                    if command.sent is None:
+                        command.sent = now
+                elif self._in_flight is command:
+                    self._in_flight = None
@@ -0,0 +1,209 @@
+"""Streaming occlusion detection.
+
+A single low reading is not an occlusion: the YF-S401 is noisy at low flow
+and one bad sample used to raise the alarm, and one good sample cleared it.
+OcclusionDetector instead compares each reading with the flow the pump's
+power should produce (FlowModel) and accumulates the shortfall in a one-sided
+CUSUM. An occlusion is declared once the CUSUM stays above its threshold for
+`confirm` samples, and cleared only after the smoothed (EWMA) flow has been
+back above a higher level for `clear_confirm` samples. Each update is O(1)
+in time and memory.
+
+detect_occlusions() runs the same detector over whole recorded arrays with
+NumPy, so thresholds can be tuned offline on hours of data.
+"""
+import math
+
+# Below this power the pump is not expected to move fluid (as in the original check)
+MIN_POWER = 50
+# Readings at or below this (mL/min) always count as no flow
+FLOW_FLOOR = 1.0
+
+
+class FlowModel:
+    """Expected flow (mL/min) for a pump power: gain * power + offset.
+
+    The default gain is the nominal 20 mL/min at full power (255) that the
+    simulator also uses; fit() calibrates it from a recorded session.
+    """
+
+    def __init__(self, gain=20.0 / 255, offset=0.0, min_power=MIN_POWER):
+        self.gain = gain
+        self.offset = offset
+        self.min_power = min_power
+
+    def expected(self, power):
+        if power <= self.min_power:
+            return 0.0
+        return max(0.0, self.gain * power + self.offset)
+
+    def expected_array(self, power):
+        import numpy as np
+        power = np.asarray(power, dtype=np.float64)
+        return np.where(power > self.min_power, np.maximum(0.0, self.gain * power + self.offset), 0.0)
+
+    @classmethod
+    def fit(cls, power, flow, min_power=MIN_POWER, floor=FLOW_FLOOR):
+        """Least-squares model from recorded arrays, ignoring idle and no-flow samples."""
+        import numpy as np
+        power = np.asarray(power, dtype=np.float64)
+        flow = np.asarray(flow, dtype=np.float64)
+        used = (power > min_power) & (flow > floor)
+        if np.count_nonzero(used) < 2 or np.ptp(power[used]) == 0:
+            # A single power level: a line through the origin
+            gain = float(np.sum(flow[used]) / np.sum(power[used])) if used.any() else 20.0 / 255
+            return cls(gain, 0.0, min_power)
+        gain, offset = np.polyfit(power[used], flow[used], 1)
+        return cls(float(gain), float(offset), min_power)
+
+
+class OcclusionDetector:
+    """Per-sample occlusion decision with hysteresis and confirmation windows.
+
+    drift       shortfall (0 = expected flow, 1 = none) tolerated per sample
+    threshold   CUSUM level that makes a sample suspect
+    confirm     consecutive suspect samples before an occlusion is declared
+    alpha       EWMA weight of the newest flow reading
+    clear_ratio smoothed flow, as a fraction of expected, that counts as recovered
+    clear_confirm  consecutive recovered samples before the occlusion clears
+    """
+
+    def __init__(self, model=None, drift=0.5, threshold=0.4, confirm=2, alpha=0.3,
+                 clear_ratio=0.6, clear_confirm=3, floor=FLOW_FLOOR):
+        if confirm < 1 or clear_confirm < 1:
+            raise ValueError("confirmation windows must be at least one sample")
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.model = model or FlowModel()
+        self.drift = drift
+        self.threshold = threshold
+        self.confirm = confirm
+        self.alpha = alpha
+        self.clear_ratio = clear_ratio
+        self.clear_confirm = clear_confirm
+        self.floor = floor
+        self.reset()
+
+    def reset(self):
+        self.occluded = False
+        self.cusum = 0.0
+        self.ewma = None
+        self.streak = 0
+        self.samples = 0
+        self.transitions = 0
+
+    def update(self, power, flow):
+        """Feed one (power, flow) reading; returns whether the line is occluded."""
+        self.samples += 1
+        expected = self.model.expected(power)
+        if expected <= 0.0:
+            shortfall = 0.0  # idle pump: no evidence either way
+        elif flow <= self.floor:
+            shortfall = 1.0
+        else:
+            shortfall = min(1.0, max(-1.0, 1.0 - flow / expected))
+        self.cusum = max(0.0, self.cusum + shortfall - self.drift)
+        self.ewma = flow if self.ewma is None else self.ewma + self.alpha * (flow - self.ewma)
+
+        if not self.occluded:
+            self.streak = self.streak + 1 if self.cusum > self.threshold else 0
+            if self.streak >= self.confirm:
+                self.occluded = True
+                self.streak = 0
+                self.transitions += 1
+        else:
+            recovered = self.ewma > max(self.floor, self.clear_ratio * expected)
+            self.streak = self.streak + 1 if recovered else 0
+            if self.streak >= self.clear_confirm:
+                self.occluded = False
+                self.streak = 0
+                self.cusum = 0.0
+                self.transitions += 1
+        return self.occluded
+
+
+def _ewma(values, alpha):
+    """EWMA seeded with the first value, in blocks short enough to stay exact in float64."""
+    import numpy as np
+    decay = 1.0 - alpha
+    if decay == 0.0 or not len(values):
+        return values.copy()
+    out = np.empty_like(values)
+    # decay ** -block must stay well inside float64 precision
+    block = max(1, int(-18.0 / math.log(decay)))
+    powers = decay ** np.arange(block + 1)
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        n = len(chunk)
+        scaled = np.cumsum(chunk / powers[:n])
+        out[start:start + n] = powers[1:n + 1] * previous + alpha * powers[:n] * scaled
+        previous = out[start + n - 1]
+    return out
+
+
+def _first_run(mask, length, start=0):
+    """Index at which the first run of `length` True values starting at or after start ends."""
+    import numpy as np
+    if len(mask) - start < length:
+        return None
+    if length == 1:
+        hits = np.flatnonzero(mask[start:])
+        return start + int(hits[0]) if len(hits) else None
+    runs = np.convolve(mask[start:].astype(np.int32), np.ones(length, dtype=np.int32), "valid")
+    hits = np.flatnonzero(runs == length)
+    return start + int(hits[0]) + length - 1 if len(hits) else None
+
+
+def _windows(start, n, size=4096):
+    """Ends of growing search windows from start, so a search costs about the distance it covers."""
+    while True:
+        end = min(n, start + size)
+        yield end
+        if end == n:
+            return
+        size *= 4
+
+
+def detect_occlusions(power, flow, detector=None):
+    """Occlusion state after every sample of recorded arrays, as a NumPy bool array.
+
+    Gives the same decisions as feeding the samples one by one to a fresh
+    OcclusionDetector configured like `detector`, but the work is done in
+    NumPy passes over the stretch up to each state change, never per sample.
+    """
+    import numpy as np
+    d = detector or OcclusionDetector()
+    power = np.asarray(power, dtype=np.float64)
+    flow = np.asarray(flow, dtype=np.float64)
+    n = len(flow)
+    occluded = np.zeros(n, dtype=bool)
+
+    expected = d.model.expected_array(power)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shortfall = np.clip(1.0 - flow / expected, -1.0, 1.0)
+    shortfall = np.where(flow <= d.floor, 1.0, shortfall)
+    shortfall[expected <= 0.0] = 0.0
+    step = shortfall - d.drift
+    recovered = _ewma(flow, d.alpha) > np.maximum(d.floor, d.clear_ratio * expected)
+
+    i = 0
+    while i < n:
+        # Page's CUSUM restarted from zero at i: S = C - min(0, running min of C)
+        for end in _windows(i, n):
+            total = np.cumsum(step[i:end])
+            cusum = total - np.minimum(np.minimum.accumulate(total), 0.0)
+            onset = _first_run(cusum > d.threshold, d.confirm)
+            if onset is not None or end == n:
+                break
+        if onset is None:
+            break
+        onset += i
+        for end in _windows(onset + 1, n):
+            cleared = _first_run(recovered[:end], d.clear_confirm, onset + 1)
+            if cleared is not None or end == n:
+                break
+        end = n if cleared is None else cleared
+        occluded[onset:end] = True
+        i = end + 1
+    return occluded
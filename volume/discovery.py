@@ -0,0 +1,258 @@
+"""Finding the pump among this machine's serial devices.
+
+PortDiscovery enumerates serial devices (USB-serial chips used on Arduino
+boards first), opens them concurrently on worker threads and keeps the
+first one whose output identifies the pump: the sketch's banner, its
+protocol line or a status line. The port and baud rate that answered are
+remembered in a small JSON file; next time that port is probed with the
+others and wins if it answers, but a stale entry costs no more than
+CACHE_GRACE seconds.
+
+A probe leaves the winning port open and hands back what it read
+(ProbeResult.preamble), so the banner can still be fed to the decoder and
+nothing is lost to the probe.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from .protocol import parse_line
+
+BAUDRATES = (9600,)
+PROBE_TIMEOUT = 3.0  # the board resets when the port opens; its banner follows ~2 s later
+CACHE_GRACE = 0.5    # how long another port's answer waits for the cached port's
+DEFAULT_PORTS = ('COM3', 'COM4', 'COM5', 'COM6', '/dev/ttyUSB0', '/dev/ttyACM0')
+
+# USB vendor IDs of Arduino boards and the USB-serial chips on their clones
+ARDUINO_VIDS = {
+    0x2341,  # Arduino
+    0x2A03,  # Arduino.org
+    0x1A86,  # WCH CH340
+    0x0403,  # FTDI
+    0x10C4,  # Silicon Labs CP210x
+}
+
+
+class ReconnectPolicy:
+    """Exponential backoff between reconnect attempts."""
+
+    __slots__ = ("initial", "maximum", "factor")
+
+    def __init__(self, initial=1.0, maximum=30.0, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+
+    def delay(self, attempt):
+        return min(self.maximum, self.initial * self.factor ** attempt)
+
+
+def default_cache_path():
+    return os.path.join(os.path.expanduser("~"), ".volume", "last_port.json")
+
+
+class PortCache:
+    """The last port and baud rate that answered as a pump."""
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+
+    def load(self):
+        """(port, baudrate), or None if nothing usable is cached."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry["port"], int(entry["baudrate"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, port, baudrate):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"port": port, "baudrate": baudrate, "time": time.time()}, f)
+        except OSError:
+            pass  # the cache only saves time; never fail a connection over it
+
+
+def candidate_ports(extra=DEFAULT_PORTS):
+    """Serial device names on this machine, Arduino-like devices first.
+
+    Names in extra that were not enumerated are appended if they can exist
+    here (COM ports on Windows, device files that are present elsewhere).
+    """
+    names = []
+    try:
+        from serial.tools import list_ports
+        devices = sorted(list_ports.comports(), key=lambda d: (d.vid not in ARDUINO_VIDS, d.device))
+        names = [d.device for d in devices]
+    except ImportError:
+        pass
+    for name in extra:
+        if name in names:
+            continue
+        if name.upper().startswith("COM") if sys.platform == "win32" else os.path.exists(name):
+            names.append(name)
+    return names
+
+
+def identify(data):
+    """Whether bytes read from a port are the pump talking."""
+    for line in data.split(b"\n"):
+        line = line.strip()
+        if b"pump speed" in line.lower() or parse_line(line) is not None:
+            return True
+    return False
+
+
+def open_probe_port(name, baudrate):
+    import serial
+    return serial.Serial(name, baudrate, timeout=0.1)
+
+
+class ProbeResult:
+    """An open port that answered as a pump, with the bytes read while probing."""
+
+    __slots__ = ("port", "name", "baudrate", "preamble", "elapsed")
+
+    def __init__(self, port, name, baudrate, preamble, elapsed):
+        self.port = port
+        self.name = name
+        self.baudrate = baudrate
+        self.preamble = preamble
+        self.elapsed = elapsed
+
+
+def probe(name, baudrate, timeout=PROBE_TIMEOUT, open_port=open_probe_port, cancel=None):
+    """Open a port and wait for the pump to identify itself.
+
+    Returns a ProbeResult holding the still-open port, or None (with the
+    port closed) if it cannot be opened, stays silent or says something
+    else, or if cancel is set.
+    """
+    started = time.monotonic()
+    try:
+        port = open_port(name, baudrate)
+    except Exception:
+        return None
+    data = bytearray()
+    try:
+        while time.monotonic() - started < timeout and not (cancel and cancel.is_set()):
+            chunk = port.read(max(1, port.in_waiting))
+            if not chunk:
+                continue
+            data += chunk
+            # Only complete lines can be identified
+            if b"\n" in chunk and identify(data):
+                return ProbeResult(port, name, baudrate, bytes(data), time.monotonic() - started)
+    except Exception:
+        pass
+    try:
+        port.close()
+    except Exception:
+        pass
+    return None
+
+
+class PortDiscovery:
+    """Concurrent probing of serial ports for the pump, preferring the cached port.
+
+    ports is the list of names to probe; None enumerates the machine's
+    serial devices at every search.
+    """
+
+    def __init__(self, ports=None, baudrates=BAUDRATES, cache=None, timeout=PROBE_TIMEOUT,
+                 open_port=open_probe_port, max_workers=8, cache_grace=CACHE_GRACE):
+        self.ports = tuple(ports) if ports else None
+        self.baudrates = tuple(baudrates)
+        self.cache = cache
+        self.timeout = timeout
+        self.open_port = open_port
+        self.max_workers = max_workers
+        self.cache_grace = cache_grace
+        self.probes = 0
+
+    def candidates(self):
+        return list(self.ports) if self.ports is not None else candidate_ports()
+
+    def find(self, cancel=None):
+        """Return the first ProbeResult, or None if no port answered or cancel was set."""
+        names = self.candidates()
+        cached = self.cache.load() if self.cache else None
+        if cached and cached[0] not in names:
+            if self.ports is None:
+                names.insert(0, cached[0])   # e.g. a device the enumeration does not report
+            else:
+                cached = None
+        if not names or (cancel and cancel.is_set()):
+            return None
+
+        # One worker per port, the cached one among them; the baud rates of a port are
+        # tried in turn, starting with the cached one
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait  # off the start-up path
+        found = threading.Event()     # the search is decided: every probe stops
+        held = threading.Event()      # another port answered: only the cached one still runs
+        winner = fallback = None
+        waiting = cached[0] if cached else None   # the cached port, while its probe runs
+        deadline = None
+        with ThreadPoolExecutor(min(len(names), self.max_workers), thread_name_prefix="probe") as pool:
+            futures = {}
+            for name in names:
+                if name == waiting:
+                    baudrates = (cached[1],) + tuple(b for b in self.baudrates if b != cached[1])
+                    stop = _AnyEvent(found, cancel)
+                else:
+                    baudrates, stop = self.baudrates, _AnyEvent(found, held, cancel)
+                futures[pool.submit(self._probe, name, baudrates, stop)] = name
+            pending = set(futures)
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout, FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if futures[future] == waiting:
+                        waiting = None
+                    if result is None:
+                        continue
+                    if winner is None and futures[future] == (cached and cached[0]):
+                        winner = result
+                    elif winner is None and fallback is None:
+                        fallback = result
+                        deadline = time.monotonic() + self.cache_grace
+                    else:
+                        result.port.close()
+                if winner is None and fallback is not None and (waiting is None or time.monotonic() >= deadline):
+                    winner, fallback = fallback, None
+                if winner is not None:
+                    found.set()
+                elif fallback is not None:
+                    held.set()
+        if fallback is not None:
+            fallback.port.close()   # the cached port answered in time
+        if winner and self.cache:
+            self.cache.save(winner.name, winner.baudrate)
+        return winner
+
+    def _probe(self, name, baudrates, cancel):
+        for baudrate in baudrates:
+            if cancel and cancel.is_set():
+                return None
+            self.probes += 1
+            result = probe(name, baudrate, self.timeout, self.open_port, cancel)
+            if result:
+                return result
+        return None
+
+
+class _AnyEvent:
+    """is_set() of several events, for probes that stop on a winner or on cancel."""
+
+    __slots__ = ("events",)
+
+    def __init__(self, *events):
+        self.events = [event for event in events if event is not None]
+
+    def is_set(self):
+        return any(event.is_set() for event in self.events)
@@ -0,0 +1,369 @@
+"""Live telemetry fan-out to remote viewers over TCP.
+
+TelemetryHub publishes every pump's state to any number of subscribers
+(nurses' station screens, the central dashboard) from one serial
+connection. The protocol is newline-delimited JSON:
+
+    {"type": "snapshot", "seq": 41, "pumps": {"bed-3": {"flow": 12.4, "power": 180, ...}}}
+    {"type": "delta", "seq": 42, "pump": "bed-3", "time": 1792190000.12, "fields": {"flow": 12.6}}
+
+A subscriber first receives a snapshot, then deltas holding only the fields
+that changed. publish() encodes each delta once into a shared log of the
+last max_queue messages and returns; a single fan-out thread copies from
+the log to every socket without blocking. A subscriber that falls more than
+max_queue messages behind skips the intermediate samples and gets a fresh
+snapshot, so a slow viewer costs at most max_buffered bytes plus its socket
+buffers and never slows the ingest path.
+
+Watch a hub from the command line:
+
+    python -m volume.fanout localhost:8765
+"""
+import argparse
+import collections
+import json
+import selectors
+import socket
+import sys
+import threading
+import time
+
+DEFAULT_PORT = 8765
+MAX_QUEUE = 256         # messages a subscriber may fall behind before it is resynced
+MAX_BUFFERED = 65536    # bytes queued per subscriber beyond what its socket accepted
+SEND_BUFFER = 65536     # kernel send buffer per subscriber; autotuning could grow it to megabytes
+
+
+def monitor_fields(monitor):
+    """The pump state viewers show, as plain JSON values."""
+    return {
+        "connected": monitor.serial_port is not None,
+        "display_status": monitor.display_status,
+        "mode": monitor.mode,
+        "warning": monitor.warning,
+        "alarm": monitor.alarm_type if monitor.alarm_active else None,
+        "battery": monitor.battery_level,
+    }
+
+
+class HubStats:
+    """Fan-out counters, updated by the publisher and the fan-out thread."""
+
+    __slots__ = ("published", "unchanged", "clients", "accepted", "lagging", "resyncs", "skipped", "bytes_sent")
+
+    def __init__(self):
+        self.published = 0   # deltas put in the log
+        self.unchanged = 0   # publish() calls with nothing new
+        self.clients = 0
+        self.accepted = 0
+        self.lagging = 0     # subscribers out of the log, to be resynced once their socket drains
+        self.resyncs = 0     # snapshots sent to subscribers that fell behind
+        self.skipped = 0     # deltas those subscribers never received
+        self.bytes_sent = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Subscriber:
+    __slots__ = ("sock", "address", "cursor", "out")
+
+    def __init__(self, sock, address, cursor, snapshot):
+        self.sock = sock
+        self.address = address
+        self.cursor = cursor          # seq of the last message copied to out
+        self.out = bytearray(snapshot)
+
+
+class TelemetryHub:
+    """Publish/subscribe server for live pump telemetry.
+
+    port=0 binds a free port (see .port). publish() may be called from any
+    thread; attach(monitor) publishes a PumpMonitor's frames and state.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, max_queue=MAX_QUEUE, max_buffered=MAX_BUFFERED,
+                 send_buffer=SEND_BUFFER):
+        self.max_queue = max_queue
+        self.max_buffered = max_buffered
+        self.send_buffer = send_buffer
+        self.stats = HubStats()
+        self._state = {}
+        self._log = collections.deque()   # (seq, encoded delta)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._woken = False
+        self._subscribers = {}
+        self._running = False
+        self._thread = None
+
+        self._listener = socket.create_server((host, port))
+        self._listener.setblocking(False)
+        self.host, self.port = self._listener.getsockname()[:2]
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+    # Publishing
+
+    def publish(self, pump_id, fields, timestamp=None):
+        """Queue the fields of pump_id that differ from what was last published.
+
+        Returns whether anything changed. Never blocks on subscribers.
+        """
+        with self._lock:
+            state = self._state.setdefault(pump_id, {})
+            changed = {key: value for key, value in fields.items() if key not in state or state[key] != value}
+            if not changed:
+                self.stats.unchanged += 1
+                return False
+            state.update(changed)
+            self._seq += 1
+            message = json.dumps({"type": "delta", "seq": self._seq, "pump": pump_id,
+                                  "time": timestamp or time.time(), "fields": changed},
+                                 separators=(",", ":")) + "\n"
+            self._log.append((self._seq, message.encode()))
+            if len(self._log) > self.max_queue:
+                self._log.popleft()
+            self.stats.published += 1
+            wake = not self._woken
+            self._woken = True
+        if wake:
+            try:
+                self._wake_w.send(b"\0")
+            except (BlockingIOError, OSError):
+                pass  # already awake, or closing
+        return True
+
+    def attach(self, monitor, pump_id=None):
+        """Publish every status frame and state change of a PumpMonitor; returns its callback."""
+        pump_id = pump_id or monitor.pump_id or "pump"
+
+        def forward(event, data):
+            now = time.time()
+            if event == "frames":
+                for frame in data:
+                    if frame.kind == "status":
+                        self.publish(pump_id, {"status": frame.status, "power": frame.power,
+                                               "flow": frame.flow}, now)
+            self.publish(pump_id, monitor_fields(monitor), now)
+
+        self.publish(pump_id, monitor_fields(monitor))
+        return monitor.subscribe(forward)
+
+    # Serving
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self.run, name="TelemetryHub", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._running = False
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
+        for subscriber in list(self._subscribers.values()):
+            self._drop(subscriber)
+        self._selector.close()
+        self._listener.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def run(self):
+        """Fan-out loop: accept subscribers and copy the log to their sockets."""
+        self._running = True
+        while self._running:
+            for key, mask in self._selector.select(1.0):
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wake":
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                elif mask & selectors.EVENT_READ:
+                    self._receive(key.data)
+                elif mask & selectors.EVENT_WRITE:
+                    self._send(key.data)
+            self._fill()
+
+    def _snapshot(self):
+        # Called with the lock held
+        return (json.dumps({"type": "snapshot", "seq": self._seq, "pumps": self._state},
+                           separators=(",", ":")) + "\n").encode()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._listener.accept()
+            except (BlockingIOError, OSError):
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.send_buffer:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+            with self._lock:
+                subscriber = _Subscriber(sock, address, self._seq, self._snapshot())
+            self._subscribers[sock.fileno()] = subscriber
+            self._selector.register(sock, selectors.EVENT_READ, subscriber)
+            self.stats.accepted += 1
+            self.stats.clients = len(self._subscribers)
+            self._send(subscriber)
+
+    def _receive(self, subscriber):
+        # Viewers send nothing; readable means closed (or noise to discard)
+        try:
+            if subscriber.sock.recv(4096):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self._drop(subscriber)
+
+    def _fill(self):
+        """Copy new log entries to every subscriber with room, resyncing those left behind."""
+        with self._lock:
+            self._woken = False
+            if not self._log:
+                return
+            oldest, seq = self._log[0][0], self._seq
+            snapshot = None
+            lagging = 0
+            for subscriber in list(self._subscribers.values()):
+                if subscriber.cursor >= seq:
+                    continue
+                behind = subscriber.cursor < oldest - 1
+                if len(subscriber.out) >= self.max_buffered:
+                    lagging += behind
+                    continue
+                if behind:
+                    # Fell out of the log: drop what it missed and send the current state
+                    if snapshot is None:
+                        snapshot = self._snapshot()
+                    self.stats.resyncs += 1
+                    self.stats.skipped += seq - subscriber.cursor
+                    subscriber.out += snapshot
+                else:
+                    for index in range(subscriber.cursor - oldest + 1, len(self._log)):
+                        subscriber.out += self._log[index][1]
+                subscriber.cursor = seq
+            self.stats.lagging = lagging
+        for subscriber in list(self._subscribers.values()):
+            if subscriber.out:
+                self._send(subscriber)
+
+    def _send(self, subscriber):
+        try:
+            sent = subscriber.sock.send(subscriber.out)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop(subscriber)
+            return
+        del subscriber.out[:sent]
+        self.stats.bytes_sent += sent
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if subscriber.out else 0)
+        try:
+            self._selector.modify(subscriber.sock, events, subscriber)
+        except (KeyError, ValueError):
+            pass
+
+    def _drop(self, subscriber):
+        if self._subscribers.pop(subscriber.sock.fileno(), None) is None:
+            return
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+        self.stats.clients = len(self._subscribers)
+
+
+class TelemetryViewer:
+    """Subscriber side: keeps the latest state of every pump from a hub.
+
+    pumps maps pump id to its fields; on_update(pump_id or None, message)
+    is called for every delta (None for snapshots).
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, on_update=None, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.on_update = on_update
+        self.pumps = {}
+        self.seq = 0
+        self.resyncs = 0
+        self._buffer = b""
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def feed(self, data):
+        """Apply received bytes; returns the number of messages they completed."""
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            message = json.loads(line)
+            self.seq = message["seq"]
+            if message["type"] == "snapshot":
+                self.pumps = message["pumps"]
+                self.resyncs += 1
+                pump_id = None
+            else:
+                pump_id = message["pump"]
+                self.pumps.setdefault(pump_id, {}).update(message["fields"])
+            if self.on_update:
+                self.on_update(pump_id, message)
+        return len(lines)
+
+    def poll(self, size=65536):
+        """Read once (blocking up to the socket timeout); False once the hub has gone."""
+        try:
+            data = self.sock.recv(size)
+        except socket.timeout:
+            return True
+        if not data:
+            return False
+        self.feed(data)
+        return True
+
+    def close(self):
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m volume.fanout", description="Watch a VoluME telemetry hub")
+    parser.add_argument("address", nargs="?", default=f"localhost:{DEFAULT_PORT}", help="HOST:PORT of the hub")
+    args = parser.parse_args(argv)
+    host, _, port = args.address.rpartition(":")
+
+    def show(pump_id, message):
+        if pump_id is None:
+            for pump, fields in message["pumps"].items():
+                print(f"{pump}: {fields}")
+        else:
+            print(f"{pump_id}: {message['fields']}")
+
+    viewer = TelemetryViewer(host or "localhost", int(port), show)
+    try:
+        while viewer.poll():
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        viewer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Fixed-size telemetry history for trend display.
+
+TelemetryHistory keeps the last `capacity` samples in preallocated NumPy
+columns (timestamp, flow, PWM, status code) used as a ring buffer, so a
+72-hour infusion costs the same memory as a 72-second one. Every BLOCK
+consecutive samples also get a min/max flow summary, which lets
+decimate() draw any time range with about two points per pixel column
+while reading at most O(pixels * BLOCK + samples / BLOCK) values.
+
+Lookups binary-search the time column, so it must never decrease. Stamps
+come from the wall clock (they label the chart), which an NTP step or a
+manual change can move backwards; extend() clamps each stamp to be no
+earlier than the one before it, so after a backward step the trend
+holds the last time until the clock catches up.
+
+NumPy is required by this module only.
+"""
+import threading
+
+import numpy as np
+
+from .binproto import STATUS_CODES, UNKNOWN_STATUS
+
+BLOCK = 256
+
+
+class TelemetryHistory:
+    """Column-oriented ring buffer of status samples, safe to fill and read from different threads."""
+
+    def __init__(self, capacity=1 << 20):
+        # Whole blocks only, so each summary covers one contiguous stretch of the ring
+        self.capacity = max(BLOCK, -(-capacity // BLOCK) * BLOCK)
+        self.time = np.zeros(self.capacity, dtype=np.float64)
+        self.flow = np.zeros(self.capacity, dtype=np.float32)
+        self.power = np.zeros(self.capacity, dtype=np.uint8)
+        self.status = np.zeros(self.capacity, dtype=np.uint8)
+
+        blocks = self.capacity // BLOCK
+        self.block_time = np.zeros(blocks, dtype=np.float64)
+        self.block_min = np.zeros(blocks, dtype=np.float32)
+        self.block_max = np.zeros(blocks, dtype=np.float32)
+
+        self.total = 0              # samples ever appended; the next goes to total % capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.time, self.flow, self.power, self.status,
+                                      self.block_time, self.block_min, self.block_max))
+
+    def append_frames(self, frames, timestamp):
+        """Add the status frames of one reader batch, all stamped with the batch time."""
+        flows = [frame.flow for frame in frames if frame.kind == "status"]
+        if not flows:
+            return
+        powers = [min(255, max(0, frame.power)) for frame in frames if frame.kind == "status"]
+        codes = [STATUS_CODES.get(frame.status, UNKNOWN_STATUS) for frame in frames if frame.kind == "status"]
+        self.extend([timestamp] * len(flows), flows, powers, codes)
+
+    def extend(self, times, flows, powers, codes):
+        """Append samples given as equal-length sequences, oldest first; times are clamped to never decrease."""
+        count = len(times)
+        if not count:
+            return
+        times = np.maximum.accumulate(np.asarray(times, dtype=np.float64))
+        with self._lock:
+            start = self.total
+            if start:
+                np.maximum(times, self.time[(start - 1) % self.capacity], out=times)
+            skip = max(0, count - self.capacity)   # only the newest `capacity` can be kept
+            position = (start + skip) % self.capacity
+            offset = skip
+            while offset < count:
+                n = min(count - offset, self.capacity - position)
+                self.time[position:position + n] = times[offset:offset + n]
+                self.flow[position:position + n] = flows[offset:offset + n]
+                self.power[position:position + n] = powers[offset:offset + n]
+                self.status[position:position + n] = codes[offset:offset + n]
+                offset += n
+                position = 0
+            self.total = start + count
+            self._summarize(start + skip, self.total)
+
+    def _summarize(self, first, end):
+        # Summaries for the blocks completed by samples [first, end)
+        first_block = first // BLOCK
+        if first % BLOCK and first_block * BLOCK < self.total - self.capacity:
+            first_block += 1  # its start was overwritten in the same batch
+        end_block = end // BLOCK
+        if end_block <= first_block:
+            return
+        blocks = self.capacity // BLOCK
+        rows = np.arange(first_block, end_block) % blocks
+        flow = self.flow.reshape(blocks, BLOCK)[rows]
+        self.block_min[rows] = flow.min(axis=1)
+        self.block_max[rows] = flow.max(axis=1)
+        self.block_time[rows] = self.time.reshape(blocks, BLOCK)[rows, 0]
+
+    def _range(self, first, end):
+        # Physical indices of logical samples [first, end)
+        return np.arange(first, end) % self.capacity
+
+    def span(self):
+        """(oldest, newest) timestamp, or None when empty."""
+        with self._lock:
+            if not self.total:
+                return None
+            first = max(0, self.total - self.capacity)
+            return float(self.time[first % self.capacity]), float(self.time[(self.total - 1) % self.capacity])
+
+    def latest(self, count):
+        """The newest samples as a dict of column copies, oldest first."""
+        with self._lock:
+            first = max(0, self.total - self.capacity, self.total - count)
+            rows = self._range(first, self.total)
+            return {"time": self.time[rows], "flow": self.flow[rows],
+                    "power": self.power[rows], "status": self.status[rows]}
+
+    def _find(self, timestamp, first, end):
+        # First logical index in [first, end) whose time is >= timestamp (extend() keeps times from decreasing)
+        low, high = first, end
+        while low < high:
+            middle = (low + high) // 2
+            if self.time[middle % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def decimate(self, start, end, buckets):
+        """Min/max flow envelope of [start, end] in `buckets` equal time slices.
+
+        Returns (times, low, high) arrays with one entry per non-empty
+        slice, the slice's start time and its minimum and maximum flow.
+        Windows with fewer samples than slices come back undecimated
+        (low == high).
+        """
+        with self._lock:
+            oldest = max(0, self.total - self.capacity)
+            first = self._find(start, oldest, self.total)
+            stop = self._find(np.nextafter(end, np.inf), first, self.total)
+            count = stop - first
+            if count < 2 * BLOCK * buckets:
+                # Few samples per slice: reading them raw costs at most 2 * BLOCK per slice
+                rows = self._range(first, stop)
+                flow = self.flow[rows]
+                times, low, high = self.time[rows], flow, flow
+            else:
+                # Whole blocks inside the window come from the summaries, the ragged ends raw
+                first_block = -(-first // BLOCK)
+                end_block = stop // BLOCK
+                head = self._range(first, first_block * BLOCK)
+                tail = self._range(end_block * BLOCK, stop)
+                rows = np.arange(first_block, end_block) % (self.capacity // BLOCK)
+                times = np.concatenate((self.time[head], self.block_time[rows], self.time[tail]))
+                low = np.concatenate((self.flow[head], self.block_min[rows], self.flow[tail]))
+                high = np.concatenate((self.flow[head], self.block_max[rows], self.flow[tail]))
+        if len(times) <= buckets:
+            return times, low, high
+        return envelope(times, low, high, start, end, buckets)
+
+
+def envelope(times, low, high, start, end, buckets):
+    """Reduce time-sorted (times, low, high) points to one min/max pair per time slice."""
+    width = (end - start) / buckets if end > start else 1.0
+    slot = np.minimum(((times - start) / width).astype(np.int64), buckets - 1)
+    # Index where each non-empty slice begins
+    edges = np.flatnonzero(np.diff(slot, prepend=-1))
+    return (start + slot[edges] * width,
+            np.minimum.reduceat(low, edges),
+            np.maximum.reduceat(high, edges))
@@ -0,0 +1,139 @@
+"""Per-stage latency histograms for the path from serial port to screen.
+
+Each stage of the telemetry path records how long it took into a
+LatencyHistogram: fixed log-spaced buckets (8 per octave, 1 us to ~30 s),
+so recording is a few arithmetic operations and memory never grows.
+Percentiles are accurate to about 9%.
+
+    read         port.read() of data already waiting in the driver
+    decode       text/binary decoding of one read
+    apply        PumpMonitor.process_frames: history, archive, detector, alarms
+    notify       delivering the batch's events to subscribers
+    dispatch     an event's wait in the GUI's queued signal
+    render       InfusionPumpGUI.render (label text and restyles)
+    paint        TrendChart.paintEvent
+    audio        handing an alarm to the audio engine on the GUI thread
+    end_to_end   bytes returned by read() to the render that shows them
+    stall        GUI event loop lateness, sampled by a timer
+
+Hooks check LatencyProbe.enabled before taking any timestamp, so a
+disabled probe costs one attribute lookup per hook. Every stage is recorded
+from a single thread, which keeps the histograms lock-free; only the
+arrival stamp handed from the reader thread to the GUI thread for the
+end-to-end time takes a lock.
+"""
+import json
+import math
+import threading
+import time
+
+STAGES = ("read", "decode", "apply", "notify", "dispatch", "render", "paint", "audio", "end_to_end", "stall")
+
+SUB_BUCKETS = 8   # buckets per doubling
+BUCKETS = SUB_BUCKETS * 25 + 1
+
+
+class LatencyHistogram:
+    """Log-bucketed distribution of durations in seconds."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        micros = seconds * 1e6
+        index = 0 if micros < 1.0 else min(BUCKETS - 1, int(math.log2(micros) * SUB_BUCKETS) + 1)
+        self.counts[index] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples, in seconds."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, 2 ** (index / SUB_BUCKETS) * 1e-6)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        def ms(value):
+            return None if value is None else round(value * 1000, 4)
+        return {"count": self.count, "mean_ms": ms(self.mean), "p50_ms": ms(self.percentile(0.5)),
+                "p99_ms": ms(self.percentile(0.99)), "max_ms": ms(self.max if self.count else None)}
+
+
+class LatencyProbe:
+    """The stage histograms of one monitor, and the switch that turns the hooks on."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.started = time.time()
+        self._arrived = None
+        self._arrival_lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def since(self, stage, started):
+        """Record the time from a perf_counter() reading until now."""
+        self.record(stage, time.perf_counter() - started)
+
+    def arrived(self, stamp):
+        """Note when a batch's bytes were read (perf_counter); the oldest unshown one is kept."""
+        with self._arrival_lock:
+            if self._arrived is None:
+                self._arrived = stamp
+
+    def take_arrival(self):
+        """The oldest arrival not yet shown, which the caller is about to show."""
+        with self._arrival_lock:
+            stamp, self._arrived = self._arrived, None
+        return stamp
+
+    def reset(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.started = time.time()
+        with self._arrival_lock:
+            self._arrived = None
+
+    def snapshot(self):
+        """{stage: {count, mean_ms, p50_ms, p99_ms, max_ms}} for stages that recorded anything."""
+        return {stage: histogram.as_dict() for stage, histogram in list(self.histograms.items())
+                if histogram.count}
+
+    def as_dict(self, counters=None):
+        return {"started": self.started, "time": time.time(), "stages": self.snapshot(),
+                "counters": counters or {}}
+
+    def dump(self, path, counters=None):
+        """Write the histograms summary (and any counters) as JSON, for benchmark runs."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(counters), f, indent=2)
+
+    def format(self, counters=None):
+        """Plain-text table of the stages, for an overlay or a terminal."""
+        lines = [f"{'stage':<11} {'n':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+        for stage, stats in self.snapshot().items():
+            lines.append(f"{stage:<11} {stats['count']:7d} {stats['p50_ms']:8.3f} "
+                         f"{stats['p99_ms']:8.3f} {stats['max_ms']:8.3f}")
+        for name, value in (counters or {}).items():
+            lines.append(f"{name:<28} {value}")
+        return "\n".join(lines)
@@ -0,0 +1,198 @@
+"""Prometheus metrics endpoint for pump telemetry and ingest health.
+
+MetricsServer serves GET /metrics on localhost in the Prometheus text
+format. A refresher thread renders every pump into one byte string each
+interval; scrapes only send the latest string, so they never take a monitor
+lock, never wait on the reader or the Qt thread, and cost the same however
+often they come and however many pumps there are.
+
+Pumps come from sources: callables returning (pump_id, PumpMonitor,
+ReaderStats or None, reconnects) tuples. monitor_source() and
+supervisor_source() cover the single monitor and the supervisor.
+
+    python -m volume --headless --metrics-port 9464
+    curl -s localhost:9464/metrics
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MODES = ("AUTO", "MANUAL")
+
+# name: (type, help)
+FAMILIES = {
+    "volume_up": ("gauge", "Whether the pump's serial link is open."),
+    "volume_flow_ml_per_minute": ("gauge", "Latest flow rate reported by the pump."),
+    "volume_pump_power_pwm": ("gauge", "Latest pump PWM value (0-255)."),
+    "volume_mode": ("gauge", "Control mode, 1 for the active one."),
+    "volume_battery_percent": ("gauge", "Simulated battery level."),
+    "volume_blood_detected": ("gauge", "Whether blood leakage is currently detected."),
+    "volume_occlusion_detected": ("gauge", "Whether an occlusion is currently detected."),
+    "volume_alarm_active": ("gauge", "Active alarm, 1 labelled with its type."),
+    "volume_reconnects_total": ("counter", "Serial links re-established after dropping."),
+    "volume_ingest_bytes_total": ("counter", "Bytes read from the serial link."),
+    "volume_ingest_lines_total": ("counter", "Text protocol lines decoded."),
+    "volume_ingest_frames_total": ("counter", "Frames delivered to the monitor."),
+    "volume_ingest_frames_per_second": ("gauge", "Frames delivered per second since the previous snapshot."),
+    "volume_ingest_parse_errors_total": ("counter", "Unparsable lines and corrupt binary frames."),
+    "volume_ingest_dropped_frames_total": ("counter", "Gaps in the binary protocol's sequence numbers."),
+    "volume_ingest_backlog_bytes": ("gauge", "Bytes left in the driver after the last read."),
+    "volume_ingest_read_lag_seconds": ("gauge", "Time from the last read to its frames being applied."),
+    "volume_ingest_read_lag_max_seconds": ("gauge", "Longest read-to-applied time on this link."),
+    "volume_commands_acked_total": ("counter", "Commands acknowledged by the pump."),
+    "volume_commands_timeouts_total": ("counter", "Commands that were never acknowledged."),
+    "volume_metrics_snapshot_seconds": ("gauge", "Time taken to render the previous snapshot."),
+    "volume_metrics_snapshot_timestamp_seconds": ("gauge", "When this snapshot was rendered."),
+}
+
+
+def monitor_source(monitor, pump_id=None):
+    """Source for one PumpMonitor with its own reader thread."""
+    def collect():
+        reader = monitor.reader
+        yield (pump_id or monitor.pump_id or "pump", monitor, reader.stats if reader else None,
+               monitor.reconnects)
+    return collect
+
+
+def supervisor_source(supervisor):
+    """Source for every pump of a PumpSupervisor."""
+    def collect():
+        for link in list(supervisor.links.values()):
+            yield link.pump_id, link.monitor, link.ingest.stats if link.ingest else None, link.reconnects
+    return collect
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsServer:
+    """Localhost HTTP server for /metrics, answering from a periodically rebuilt snapshot.
+
+    port=0 binds a free port (see .port). Monitor attributes are read
+    without their locks: each value is a single field written atomically,
+    and a snapshot a few microseconds stale is fine for a scrape.
+    """
+
+    def __init__(self, sources=(), host="127.0.0.1", port=9464, interval=1.0):
+        self.sources = list(sources)
+        self.interval = interval
+        self.scrapes = 0
+        self.build_time = 0.0
+        self.snapshot = b""
+        self._rates = {}
+        self._stop = threading.Event()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._threads = []
+
+    def add_source(self, source):
+        self.sources.append(source)
+        self.refresh()
+
+    def start(self):
+        self.refresh()
+        for target, name in ((self._server.serve_forever, "MetricsServer"), (self._refresh_loop, "MetricsSnapshot")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._threads:
+            self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                pass  # keep serving the last good snapshot
+
+    def refresh(self):
+        """Render every source into a new snapshot and swap it in."""
+        started = time.perf_counter()
+        now = time.monotonic()
+        samples = {name: [] for name in FAMILIES}
+        rates = {}
+        for source in list(self.sources):
+            for pump_id, monitor, stats, reconnects in source():
+                pump = f'pump="{label(pump_id)}"'
+                samples["volume_up"].append((pump, 1 if monitor.serial_port is not None else 0))
+                samples["volume_flow_ml_per_minute"].append((pump, monitor.flow))
+                samples["volume_pump_power_pwm"].append((pump, monitor.power))
+                for mode in MODES:
+                    samples["volume_mode"].append((f'{pump},mode="{mode}"', 1 if monitor.mode == mode else 0))
+                samples["volume_battery_percent"].append((pump, monitor.battery_level))
+                samples["volume_blood_detected"].append((pump, int(monitor.blood_detected)))
+                samples["volume_occlusion_detected"].append((pump, int(monitor.occlusion_detected)))
+                alarm = monitor.alarm_type
+                if monitor.alarm_active and alarm:
+                    samples["volume_alarm_active"].append((f'{pump},alarm="{label(alarm)}"', 1))
+                samples["volume_reconnects_total"].append((pump, reconnects))
+                commands = monitor.commands.stats
+                samples["volume_commands_acked_total"].append((pump, commands.acked))
+                samples["volume_commands_timeouts_total"].append((pump, commands.timeouts))
+                if stats is None:
+                    continue
+                samples["volume_ingest_bytes_total"].append((pump, stats.bytes_read))
+                samples["volume_ingest_lines_total"].append((pump, stats.lines))
+                samples["volume_ingest_frames_total"].append((pump, stats.frames))
+                samples["volume_ingest_parse_errors_total"].append((pump, stats.parse_misses + stats.corrupt_frames))
+                samples["volume_ingest_dropped_frames_total"].append((pump, stats.dropped_frames))
+                samples["volume_ingest_backlog_bytes"].append((pump, stats.backlog_bytes))
+                samples["volume_ingest_read_lag_seconds"].append((pump, stats.last_lag))
+                samples["volume_ingest_read_lag_max_seconds"].append((pump, stats.max_lag))
+                # Frames per second from the previous snapshot; a new link restarts the count
+                previous = self._rates.get(pump_id)
+                rate = 0.0
+                if previous and previous[0] is stats and now > previous[1]:
+                    rate = (stats.frames - previous[2]) / (now - previous[1])
+                rates[pump_id] = (stats, now, stats.frames)
+                samples["volume_ingest_frames_per_second"].append((pump, rate))
+        self._rates = rates
+        samples["volume_metrics_snapshot_seconds"].append(("", self.build_time))
+        samples["volume_metrics_snapshot_timestamp_seconds"].append(("", time.time()))
+
+        lines = []
+        for name, rows in samples.items():
+            if not rows:
+                continue
+            kind, text = FAMILIES[name]
+            lines.append(f"# HELP {name} {text}\n# TYPE {name} {kind}\n")
+            lines.extend(f"{name}{{{labels}}} {value}\n" if labels else f"{name} {value}\n"
+                         for labels, value in rows)
+        self.snapshot = "".join(lines).encode()
+        self.build_time = time.perf_counter() - started
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so frequent scrapers reuse their connection
+            disable_nagle_algorithm = True  # headers and body go out as two writes
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = server.snapshot
+                server.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes are not news
+
+        return Handler
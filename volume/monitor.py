@@ -0,0 +1,586 @@
+"""Headless pump monitoring engine.
+
+PumpMonitor owns the serial connection, the occlusion (see detector.py) and
+blood leakage (see blood.py) checks, the simulated battery and the alarm decisions. It has no Qt
+dependency: front ends (the PyQt window, the command line logger) subscribe
+to it and receive (event, data) callbacks, or iterate over events().
+
+Events:
+    "searching"      None (looking for the pump)
+    "connected"      port name
+    "reconnecting"   attempt number, after the link dropped
+    "disconnected"   None
+    "protocol"       active link protocol ("TEXT" or "BIN")
+    "frames"         list of frames from one reader batch
+    "mode"           "AUTO" or "MANUAL"
+    "warning"        warning text ("" when cleared)
+    "battery"        battery level (0-100)
+    "alarm"          the current alarm type ("blood_leakage", "occlusion", "low_battery", ...),
+                     whenever it changes to another alarm
+    "alarm_stopped"  None (no alarm left)
+    "ack"            {"command": text, "rtt_ms": command-to-acknowledgement time}
+    "error"          error message
+    "state"          state.PumpState, after the events of a batch that changed it
+
+Callbacks run on whichever thread caused the event (usually the reader
+thread), so front ends that own widgets must hand them over to their own
+thread. Telemetry, detection and alarm attributes are read-only views of
+the latest snapshot (monitor.state); read the snapshot itself to get
+several of them consistently.
+"""
+import os
+import queue
+import re
+import threading
+import time
+
+from .capture import TX, CaptureWriter
+from .commands import CommandWriter
+from .detector import OcclusionDetector
+from .discovery import PortCache, PortDiscovery, ReconnectPolicy
+from .latency import LatencyProbe
+from .protocol import ColorStatusFrame
+from .reader import SerialReader
+from .state import FIELDS, AlarmStateMachine, PumpState, StateDraft
+from .store import STORED_EVENTS
+
+
+def _state_field(name):
+    return property(lambda self: getattr(self.state, name), doc=f"{name} of the latest published state")
+
+
+class PumpMonitor:
+    """Monitoring state and logic for one infusion pump.
+
+    ports lists the port names start() may probe; None searches every serial
+    device on the machine. port_cache is the file remembering the last port
+    that answered (discovery.PortCache), preferred by the next search; None
+    keeps nothing. A link found by start() is re-established in the
+    background when it drops (reconnect=True); the communication alarm is
+    raised only if that takes longer than reconnect_grace seconds.
+    """
+
+    def __init__(self, ports=None, baudrate=9600, binary=True, capture_dir=None,
+                 detector=None, history=None, reconnect=True, reconnect_grace=5.0,
+                 store=None, pump_id=None, latency=None, blood_detector=None, calibrations=None,
+                 port_cache=None):
+        self.ports = tuple(ports) if ports else None
+        self.baudrate = baudrate
+        self.discovery = PortDiscovery(self.ports, (baudrate,), PortCache(port_cache) if port_cache else None)
+        self.reconnect = reconnect
+        self.reconnect_grace = reconnect_grace
+        self.policy = ReconnectPolicy()
+        self.binary = binary
+        self.capture_dir = capture_dir
+        self.serial_port = None
+        self.port_name = None
+        self.reader = None
+        self.recorder = None
+        self.monitoring = False
+        self.reconnects = 0         # links re-established after dropping
+
+        # Telemetry, detection and alarm state: changed in the draft under the lock,
+        # published as an immutable snapshot when the batch's events are delivered
+        self.state = PumpState()
+        self._draft = StateDraft(self.state)
+        self._alarms = AlarmStateMachine()
+
+        self.detector = detector or OcclusionDetector()
+        # Blood leakage from raw colour readings (blood.BloodLeakDetector, which needs NumPy),
+        # set up on a link's first reading with this device's calibration from calibrations
+        # (blood.CalibrationCache). Until the device is calibrated the firmware's own verdict
+        # still raises the alarm; the host can add to it but not overrule it
+        self.blood_detector = blood_detector
+        self.calibrations = calibrations
+        self.colors_calibrated = False
+        self._colors_device = None
+        # Optional telemetry ring buffer (history.TelemetryHistory) for trend display
+        self.history = history
+        # Optional archive (store.TelemetryStore); rows are tagged with pump_id or the port name
+        self.store = store
+        self.pump_id = pump_id
+        # Per-stage timings (latency.LatencyProbe); the hooks cost nothing until it is enabled
+        self.latency = latency or LatencyProbe()
+
+        self._subscribers = []
+        self._pending = []
+        self._lock = threading.Lock()
+        self._connector = None      # discovery / reconnect thread
+        self._cancel = threading.Event()
+        self._discovered = False    # whether the current link came from start()
+        # Power and mode commands are paced by their acknowledgements on a writer thread
+        self.commands = CommandWriter(self._send, self._command_acked, self._command_timed_out)
+
+    # Subscriptions
+
+    def subscribe(self, callback):
+        """Register callback(event, data); returns it so it can be unsubscribed later."""
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def events(self, timeout=None):
+        """Iterate over (event, data) pairs until the monitor stops or timeout expires."""
+        events = queue.Queue()
+        callback = self.subscribe(lambda event, data: events.put((event, data)))
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=timeout)
+                except queue.Empty:
+                    return
+                yield event, data
+                if event == "disconnected":
+                    return
+        finally:
+            self.unsubscribe(callback)
+
+    def _post(self, event, data=None):
+        # Called with the lock held; delivered by _flush once it is released
+        self._pending.append((event, data))
+        if self.store is not None and event in STORED_EVENTS:
+            self.store.add_event(self.pump_id or self.port_name, event, data)
+
+    def _flush(self):
+        with self._lock:
+            self._commit()
+            pending, self._pending = self._pending, []
+        for event, data in pending:
+            for callback in list(self._subscribers):
+                callback(event, data)
+
+    def _commit(self):
+        # Called with the lock held: publish the draft as the next version if anything changed
+        draft, state = self._draft, self.state
+        for name in FIELDS:
+            if getattr(draft, name) != getattr(state, name):
+                self.state = draft.snapshot(state.version + 1)
+                self._pending.append(("state", self.state))
+                return
+
+    # State
+
+    status = _state_field("status")
+    power = _state_field("power")
+    flow = _state_field("flow")
+    mode = _state_field("mode")
+    warning = _state_field("warning")
+    battery_level = _state_field("battery_level")
+    blood_detected = _state_field("blood_detected")
+    occlusion_detected = _state_field("occlusion_detected")
+    alarm_type = _state_field("alarm_type")
+    alarm_active = _state_field("alarm_active")
+    display_status = _state_field("display_status")
+
+    # Connection
+
+    def start(self, wait=True):
+        """Find the pump and start monitoring it.
+
+        Discovery runs on a background thread. With wait=True this returns
+        whether a pump was found; with wait=False it returns None at once and
+        the outcome arrives as "connected" or "disconnected" events.
+        """
+        with self._lock:
+            if self.serial_port is not None or self.connecting:
+                return self.serial_port is not None if wait else None
+            self._cancel = threading.Event()
+            self._connector = threading.Thread(target=self._connect, args=(False,),
+                                               name="PumpConnector", daemon=True)
+            self._connector.start()
+            connector = self._connector
+        if not wait:
+            return None
+        connector.join()
+        return self.serial_port is not None
+
+    @property
+    def connecting(self):
+        """True while the pump is being searched for or reconnected in the background."""
+        return self._connector is not None and self._connector.is_alive()
+
+    def _connect(self, reconnecting):
+        # Runs on the connector thread until a pump answers or the search is given up
+        cancel = self._cancel
+        lost_at = time.monotonic()
+        attempt = 0
+        while not cancel.is_set():
+            with self._lock:
+                self._post("reconnecting" if reconnecting else "searching", attempt + 1 if reconnecting else None)
+            self._flush()
+            result = self.discovery.find(cancel)
+            with self._lock:
+                if result and not cancel.is_set():
+                    self.serial_port = result.port
+                    self.port_name = result.name
+                    self.baudrate = result.baudrate
+                    self._discovered = True
+                    if reconnecting:
+                        self.reconnects += 1
+                    self._attach(preamble=result.preamble)
+                elif result:
+                    result.port.close()
+                elif not reconnecting:
+                    self._set_warning("Failed to connect to Arduino. Check connections.")
+                    self._trigger_alarm("connection_failure")
+                    self._post("disconnected")
+                elif time.monotonic() - lost_at >= self.reconnect_grace:
+                    self._trigger_alarm("communication_error")
+            self._flush()
+            if result or not reconnecting:
+                return
+            cancel.wait(self.policy.delay(attempt))
+            attempt += 1
+
+    def attach(self, port, name=None, start_reader=True, preamble=b""):
+        """Start monitoring an already open serial-like object.
+
+        With start_reader=False no reader thread is started and the caller
+        (e.g. PumpSupervisor) feeds process_frames() itself. preamble is data
+        already read from the port, decoded before anything new.
+        """
+        with self._lock:
+            self.serial_port = port
+            self.port_name = name or getattr(port, "port", None) or "device"
+            self._discovered = False
+            self._attach(start_reader, preamble)
+        self._flush()
+
+    def _attach(self, start_reader=True, preamble=b""):
+        self.monitoring = True
+        # A live port again, however it was found: the lost link's alarm and warning are over
+        self._clear_alarm("communication_error")
+        if self._draft.warning.startswith("Serial Error"):
+            self._set_warning("")
+        self.detector.reset()
+        self._colors_device = None
+        if self.capture_dir:
+            self.recorder = self._open_capture()
+        if start_reader:
+            self.reader = SerialReader(self.serial_port, self.process_frames, self.connection_lost,
+                                       binary=self.binary, recorder=self.recorder, preamble=preamble,
+                                       latency=self.latency)
+            self.reader.start()
+        self._post("connected", self.port_name)
+
+    def _open_capture(self):
+        """Start an always-on capture of this connection in capture_dir."""
+        try:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            name = re.sub(r"[^A-Za-z0-9]+", "_", str(self.port_name)).strip("_")
+            path = os.path.join(self.capture_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.vcap")
+            return CaptureWriter(path)
+        except OSError as e:
+            # Recording is a debugging aid; never let it stop monitoring
+            self._post("error", f"Capture disabled: {e}")
+            return None
+
+    def stop(self):
+        self._cancel.set()
+        connector = self._connector
+        if connector is not None and connector is not threading.current_thread():
+            connector.join()
+        # Outside the lock: the writer thread takes it to report a timeout
+        self.commands.close()
+        with self._lock:
+            self.monitoring = False
+            self._stop_alarm()
+            self._release_port()
+            self._draft.occlusion_detected = False  # Reset occlusion state
+            self._post("disconnected")
+        self._flush()
+
+    def connection_lost(self, error):
+        """The link failed: drop the port and look for the pump again in the background.
+
+        Links that were not found by start() (attached ports, replays) and
+        monitors created with reconnect=False raise the communication alarm
+        at once instead.
+        """
+        with self._lock:
+            self._post("error", str(error))
+            self._release_port()
+            if self.reconnect and self._discovered and self.monitoring and not self._cancel.is_set():
+                self._set_warning(f"Serial Error: {error} - reconnecting")
+                self._connector = threading.Thread(target=self._connect, args=(True,),
+                                                   name="PumpConnector", daemon=True)
+                self._connector.start()
+            else:
+                self._set_warning(f"Serial Error: {error}")
+                self._trigger_alarm("communication_error")
+        self._flush()
+
+    def _release_port(self):
+        self.commands.clear()
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        if self.serial_port:
+            try:
+                self.serial_port.close()
+            except Exception:
+                pass
+            self.serial_port = None
+
+    # Telemetry
+
+    def process_frames(self, frames):
+        """Apply a batch of frames from the reader and notify subscribers."""
+        timed = self.latency.enabled
+        if timed:
+            started = time.perf_counter()
+        now = time.time()
+        if self.history is not None:
+            self.history.append_frames(frames, now)
+        if self.store is not None:
+            self.store.add_frames(self.pump_id or self.port_name, frames, now)
+        self.commands.acknowledge(frames)
+        with self._lock:
+            blood = self._classify_colors(frames)
+            for index, frame in enumerate(frames):
+                kind = frame.kind
+                if kind == "status":
+                    self._apply_status(frame.status, frame.power, frame.flow, blood[index] if blood else None)
+                elif kind == "blood_leakage":
+                    self._apply_status("BLOOD LEAKAGE", 0, 0.0)
+                elif kind == "mode":
+                    self._set_mode(frame.mode)
+                elif kind == "protocol" and frame.active:
+                    self._post("protocol", frame.active)
+            self._post("frames", frames)
+        if timed:
+            self.latency.since("apply", started)
+            started = time.perf_counter()
+        self._flush()
+        if timed:
+            self.latency.since("notify", started)
+
+    def _classify_colors(self, frames):
+        """Host blood verdict for each frame with raw colour readings (None for the others).
+
+        The whole batch is scored in one call; returns None if no frame has readings.
+        """
+        indexes = [i for i, frame in enumerate(frames) if isinstance(frame, ColorStatusFrame)]
+        if not indexes:
+            return None
+        device = self.pump_id or self.port_name
+        if self._colors_device != device:
+            # First readings on this link: this device's calibration, a fresh decision
+            self._colors_device = device
+            try:
+                from .blood import BloodLeakDetector, CalibrationCache
+            except ImportError:
+                self.blood_detector = None
+                return None
+            if self.blood_detector is None:
+                self.blood_detector = BloodLeakDetector()
+            if self.calibrations is None:
+                self.calibrations = CalibrationCache()
+            calibration = self.calibrations.load(device)
+            self.colors_calibrated = calibration is not None
+            if calibration is not None:
+                self.blood_detector.classifier.calibration = calibration
+            self.blood_detector.reset()
+        if self.blood_detector is None:
+            return None
+        colors = [frames[i] for i in indexes]
+        states = self.blood_detector.update([frame.red for frame in colors], [frame.green for frame in colors],
+                                            [frame.blue for frame in colors])
+        verdicts = [None] * len(frames)
+        for index, state in zip(indexes, states.tolist()):
+            verdicts[index] = state
+        return verdicts
+
+    def color_readings(self):
+        """Number of recent colour readings calibrate_colors() would use."""
+        with self._lock:
+            return 0 if self.blood_detector is None else len(self.blood_detector.recent)
+
+    def calibrate_colors(self):
+        """Take the recent colour readings as clear fluid for this device and remember the calibration."""
+        with self._lock:
+            if self.blood_detector is None or not len(self.blood_detector.recent):
+                raise ValueError("No colour readings received yet")
+            if self.calibrations is None:
+                from .blood import CalibrationCache
+                self.calibrations = CalibrationCache()
+            calibration = self.blood_detector.calibrate()
+            self.calibrations.save(self.pump_id or self.port_name, calibration)
+            self.colors_calibrated = True
+        return calibration
+
+    def _apply_status(self, status, power, flow, blood=None):
+        draft = self._draft
+        draft.status = status
+        draft.power = power
+        draft.flow = flow
+
+        # blood is the host's decision from the colour readings. It replaces the firmware's
+        # only on a calibrated device; otherwise either one raises the alarm, and it holds
+        # (as the firmware's always did) until the operator intervenes
+        host_decides = blood is not None and self.colors_calibrated
+        detected = blood if host_decides else bool(blood) or "BLOOD LEAKAGE" in status
+        if detected:
+            draft.blood_detected = True
+            self._set_warning("WARNING: Blood leakage detected!")
+            self._trigger_alarm("blood_leakage")
+        elif host_decides and draft.blood_detected:
+            # The readings have been clear for a while; a raised alarm stays until silenced
+            draft.blood_detected = False
+
+        # Low flow for the pump's power, confirmed over several samples and cleared
+        # only once flow has clearly recovered
+        draft.occlusion_detected = self.detector.update(power, flow)
+        if draft.occlusion_detected:
+            self._set_warning("WARNING: Occlusion detected!")
+            self._trigger_alarm("occlusion")
+
+        if not draft.blood_detected and not draft.occlusion_detected:
+            self._set_warning("")
+
+    def _set_mode(self, mode):
+        self._draft.mode = mode
+        self._post("mode", mode)
+
+    def _set_warning(self, text):
+        if text != self._draft.warning:
+            self._draft.warning = text
+            self._post("warning", text)
+
+    # Commands
+
+    def _connected(self):
+        return bool(self.serial_port and self.serial_port.is_open)
+
+    def _write(self, command):
+        if self._connected():
+            self.serial_port.write(command)
+            if self.recorder:
+                self.recorder.record(command, TX)
+            return True
+        return False
+
+    def _send(self, command):
+        # CommandWriter's write function, called on its thread
+        with self._lock:
+            return self._write(command)
+
+    def _command_acked(self, command, rtt):
+        with self._lock:
+            self._post("ack", {"command": command.text, "rtt_ms": round(rtt * 1000, 1)})
+        self._flush()
+
+    def _command_timed_out(self, command):
+        with self._lock:
+            self._post("error", f"No acknowledgement for command {command.text}")
+        self._flush()
+
+    def set_power(self, power):
+        """Switch the pump to manual mode at the given PWM value (0-255).
+
+        The command is queued, not written: returns whether a pump is
+        connected to send it to. A newer setpoint replaces an unsent one.
+        """
+        if not 0 <= power <= 255:
+            raise ValueError("Power must be between 0 and 255")
+        with self._lock:
+            sent = self._connected()
+            if sent:
+                self.commands.set_power(power)
+                self._draft.power = power
+                self._set_mode("MANUAL")
+                # Reset occlusion when power is manually set
+                self._draft.occlusion_detected = False
+        self._flush()
+        return sent
+
+    def set_auto(self):
+        """Hand pump control back to the firmware's colour-based logic."""
+        with self._lock:
+            sent = self._connected()
+            if sent:
+                self.commands.send("AUTO")
+                self._set_mode("AUTO")
+                self._set_warning("Switched to automatic mode")
+                # Reset blood detection and occlusion when switching to auto mode
+                self._draft.blood_detected = False
+                self._draft.occlusion_detected = False
+                self._draft.status = "NORMAL"
+                self._stop_alarm()
+        self._flush()
+        return sent
+
+    # Alarms
+
+    def trigger_alarm(self, alarm_type):
+        with self._lock:
+            self._trigger_alarm(alarm_type)
+        self._flush()
+
+    def _trigger_alarm(self, alarm_type):
+        # Raised alarms queue by priority: a more urgent one takes over, a less urgent one waits
+        if alarm_type not in self._alarms:
+            self._alarms_changed(self._alarms.raise_alarm(alarm_type))
+
+    def clear_alarm(self, alarm_type):
+        """Clear one raised alarm; the next most urgent one, if any, becomes current."""
+        with self._lock:
+            self._clear_alarm(alarm_type)
+        self._flush()
+
+    def _clear_alarm(self, alarm_type):
+        if alarm_type in self._alarms:
+            self._alarms_changed(self._alarms.clear(alarm_type))
+
+    def stop_alarm(self):
+        """Silence and clear every raised alarm."""
+        with self._lock:
+            self._stop_alarm()
+        self._flush()
+
+    def _stop_alarm(self):
+        if len(self._alarms):
+            self._alarms_changed(self._alarms.clear_all())
+
+    def _alarms_changed(self, current_changed):
+        self._draft.alarms = self._alarms.active
+        if current_changed:
+            current = self._draft.alarm_type = self._alarms.current
+            if current is None:
+                self._post("alarm_stopped")
+            else:
+                self._post("alarm", current)
+
+    # Battery simulation
+
+    def drain_battery(self):
+        """Advance the simulated battery by one 10-second step."""
+        with self._lock:
+            draft = self._draft
+            if self.monitoring:
+                # Simulate battery drain when monitoring
+                draft.battery_level = max(0, draft.battery_level - 1)
+            else:
+                # Simulate slow battery drain when idle
+                draft.battery_level = max(0, draft.battery_level - 0.2)
+            self._post("battery", draft.battery_level)
+            self._check_battery()
+        self._flush()
+
+    def check_battery(self):
+        """Raise the low battery alarm while monitoring on a critically low battery."""
+        with self._lock:
+            if self.monitoring:
+                self._check_battery()
+        self._flush()
+
+    def _check_battery(self):
+        if self._draft.battery_level < 10:
+            self._set_warning("WARNING: Battery critically low!")
+            self._trigger_alarm("low_battery")
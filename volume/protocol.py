@@ -0,0 +1,180 @@
+"""Parsing of the text lines printed by finalcode1.ino.
+
+Every line is decoded in a single pass by one precompiled pattern, straight
+from the raw bytes the reader hands over. Numeric fields are converted once
+here so the GUI never has to re-parse strings.
+"""
+import re
+
+
+class StatusFrame:
+    """Periodic status line: "Status: X | Pump Speed: N | Flow Rate: F mL/min"."""
+
+    __slots__ = ("status", "power", "flow")
+    kind = "status"
+
+    def __init__(self, status, power, flow):
+        self.status = status
+        self.power = power
+        self.flow = flow
+
+    def __repr__(self):
+        return f"StatusFrame({self.status!r}, {self.power}, {self.flow})"
+
+
+class ColorStatusFrame(StatusFrame):
+    """Status line that also carries the colour sensor's raw readings:
+    "... | Flow Rate: F mL/min | RGB: r g b" (TCS3200 pulse widths, us)."""
+
+    __slots__ = ("red", "green", "blue")
+
+    def __init__(self, status, power, flow, red, green, blue):
+        StatusFrame.__init__(self, status, power, flow)
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    def __repr__(self):
+        return f"ColorStatusFrame({self.status!r}, {self.power}, {self.flow}, rgb=({self.red}, {self.green}, {self.blue}))"
+
+
+class BloodLeakFrame:
+    """Explicit blood leakage alert line."""
+
+    __slots__ = ()
+    kind = "blood_leakage"
+
+    def __repr__(self):
+        return "BloodLeakFrame()"
+
+
+class ProtocolFrame:
+    """Link protocol announcement: offered lists what the firmware supports,
+    active is set when it confirms a switch."""
+
+    __slots__ = ("offered", "active")
+    kind = "protocol"
+
+    def __init__(self, offered=(), active=None):
+        self.offered = offered
+        self.active = active
+
+    def __repr__(self):
+        return f"ProtocolFrame(offered={self.offered!r}, active={self.active!r})"
+
+
+class ModeFrame:
+    """Mode change acknowledgement; power is set for manual mode only."""
+
+    __slots__ = ("mode", "power")
+    kind = "mode"
+
+    def __init__(self, mode, power=None):
+        self.mode = mode
+        self.power = power
+
+    def __repr__(self):
+        return f"ModeFrame({self.mode!r}, {self.power})"
+
+
+# Status lines are almost all of the traffic, so they get a dedicated anchored
+# pattern; the rare acknowledgement and alert lines fall through to cheaper checks.
+_STATUS_RE = re.compile(rb"Status: ([^|]*) \| Pump Speed: (-?\d+) \| Flow Rate: (-?\d+(?:\.\d*)?)"
+                        rb"(?: mL/min \| RGB: (\d+) (\d+) (\d+))?")
+_match_status = _STATUS_RE.match
+
+# Status strings repeat on every line, so decode each distinct one only once;
+# the PWM value has a few hundred spellings and int() costs four dict lookups
+_status_names = {}
+_powers = {}
+
+_BLOOD_LEAK = BloodLeakFrame()
+_AUTO_MODE = ModeFrame("AUTO")
+
+
+def parse_line(line):
+    """Turn one raw serial line (bytes) into a frame, or None if it is not recognised."""
+    m = _match_status(line)
+    if m is not None:
+        # One match and one groups() call; float() and int() take the bytes as they are
+        status, power, flow, red, green, blue = m.groups()
+        name = _status_names.get(status)
+        if name is None:
+            name = status.strip().decode("ascii", "replace")
+            if len(_status_names) < 64:
+                _status_names[status] = name
+        speed = _powers.get(power)
+        if speed is None:
+            speed = int(power)
+            if len(_powers) < 1024:
+                _powers[power] = speed
+        if red is None:
+            return StatusFrame(name, speed, float(flow))
+        return ColorStatusFrame(name, speed, float(flow), int(red), int(green), int(blue))
+    if b"BLOOD LEAKAGE DETECTED" in line:
+        return _BLOOD_LEAK
+    if b"Switched to AUTO" in line:
+        return _AUTO_MODE
+    if line.startswith(b"Protocols:"):
+        # "Protocols: TEXT BIN" banner, printed once at start-up
+        return ProtocolFrame(tuple(line[10:].decode("ascii", "replace").split()))
+    if line.startswith(b"Protocol active:"):
+        return ProtocolFrame(active=line[16:].strip().decode("ascii", "replace"))
+    if line.startswith(b"Manual Mode:"):
+        # "Manual Mode: Pump Speed Set To N"
+        speed = line.rsplit(b" ", 1)[-1]
+        return ModeFrame("MANUAL", int(speed) if speed.strip().isdigit() else None)
+    return None
+
+
+class LineDecoder:
+    """Incremental decoder for the newline-terminated text protocol.
+
+    feed() stops at a "Protocol active:" acknowledgement and leaves the bytes
+    after it in the buffer, so the caller can hand them to another decoder.
+    """
+
+    protocol = "TEXT"
+
+    def __init__(self, parse=parse_line):
+        self.parse = parse
+        self.buffer = bytearray()
+        self.lines = 0
+        self.misses = 0
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = buffer[:end].split(b"\n")
+        del buffer[:end + 1]
+
+        frames = []
+        parse = self.parse
+        for i, line in enumerate(lines):
+            frame = parse(line)
+            if frame is None:
+                continue
+            frames.append(frame)
+            if frame.kind == "protocol" and frame.active:
+                # Everything after the switch belongs to the new protocol
+                rest = lines[i + 1:]
+                if rest:
+                    buffer[:0] = b"\n".join(rest) + b"\n"
+                lines = lines[:i + 1]
+                break
+
+        self.lines += len(lines)
+        self.misses += len(lines) - len(frames)
+        return frames
+
+
+def frame_to_dict(frame):
+    """Plain dict view of a frame (kind plus every slot), for logging and export."""
+    fields = {"kind": frame.kind}
+    for cls in type(frame).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            fields[name] = getattr(frame, name)
+    return fields
@@ -0,0 +1,217 @@
+"""Background serial reader that ingests the pump's telemetry in bulk.
+
+The reader blocks on the port instead of polling it, drains everything the
+driver has buffered in a single read() and hands it to a stream decoder
+(text lines or binary frames). Parsed frames are handed to the consumer in
+batches, so a burst of queued samples costs one callback rather than one
+per sample.
+
+On ports that can cancel a read (pyserial's), a silent link blocks in
+read() for idle_timeout seconds at a time instead of the 0.1 s the port
+was opened with, and stop() cuts the wait short; empty_reads counts the
+reads that returned nothing, i.e. the reader's idle wakeups.
+
+If the firmware announces the binary protocol ("Protocols: ... BIN") and
+binary is enabled, the reader requests it and switches decoders when the
+firmware confirms; otherwise it stays on the text protocol.
+"""
+import threading
+import time
+
+from .binproto import BinaryDecoder
+from .capture import TX
+from .latency import LatencyProbe
+from .protocol import LineDecoder
+
+IDLE_READ_TIMEOUT = 1.0  # seconds a read may wait for the first byte of a silent link
+
+
+class ReaderStats:
+    """Ingest counters, updated by the reader thread and read by anyone."""
+
+    __slots__ = ("protocol", "bytes_read", "lines", "frames", "batches", "parse_misses",
+                 "corrupt_frames", "dropped_frames", "backlog_bytes", "max_backlog_bytes",
+                 "max_batch", "last_lag", "max_lag", "last_batch_time", "empty_reads")
+
+    def __init__(self):
+        self.protocol = "TEXT"
+        self.bytes_read = 0
+        self.lines = 0
+        self.frames = 0
+        self.batches = 0
+        self.parse_misses = 0
+        self.corrupt_frames = 0      # binary packets rejected by COBS/length/CRC checks
+        self.dropped_frames = 0      # gaps in the binary sequence numbers
+        self.backlog_bytes = 0       # bytes still queued in the driver after the last read
+        self.max_backlog_bytes = 0
+        self.max_batch = 0           # most frames delivered in a single batch
+        self.last_lag = 0.0          # seconds from read() returning to the batch being delivered
+        self.max_lag = 0.0
+        self.last_batch_time = 0.0
+        self.empty_reads = 0         # reads that timed out with nothing received
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class StreamIngest:
+    """Decoding state for one serial link, independent of who reads the port.
+
+    feed() takes raw bytes and returns the frames they complete, handling the
+    text/binary negotiation and keeping the counters in stats up to date.
+    write(bytes) is used to send the protocol request to the device. If a
+    recorder (volume.capture.CaptureWriter) is given, every raw read and the
+    protocol request are recorded.
+    """
+
+    def __init__(self, write, binary=True, recorder=None):
+        self.write = write
+        self.binary = binary
+        self.recorder = recorder
+        self.stats = ReaderStats()
+        self.decoder = LineDecoder()
+        self._binary_requested = False
+
+    def feed(self, data, backlog=0):
+        if self.recorder is not None:
+            self.recorder.record(data)
+        stats = self.stats
+        stats.bytes_read += len(data)
+        stats.backlog_bytes = backlog
+        if backlog > stats.max_backlog_bytes:
+            stats.max_backlog_bytes = backlog
+
+        frames = self.decoder.feed(data)
+        if self.decoder.protocol == "TEXT":
+            frames = self._negotiate(frames)
+        self._update_decoder_stats()
+        return frames
+
+    def delivered(self, frames, read_time):
+        """Record a batch handed to the consumer; read_time is when its bytes arrived."""
+        stats = self.stats
+        if len(frames) > stats.max_batch:
+            stats.max_batch = len(frames)
+        stats.frames += len(frames)
+        stats.batches += 1
+        now = time.monotonic()
+        stats.last_batch_time = now
+        stats.last_lag = now - read_time
+        if stats.last_lag > stats.max_lag:
+            stats.max_lag = stats.last_lag
+
+    def _negotiate(self, frames):
+        """Request the binary protocol when offered and switch once it is confirmed."""
+        for frame in frames:
+            if frame.kind != "protocol":
+                continue
+            if self.binary and "BIN" in frame.offered and not self._binary_requested:
+                self._binary_requested = True
+                self.write(b"BIN\n")
+                if self.recorder is not None:
+                    self.recorder.record(b"BIN\n", TX)
+            elif frame.active == "BIN":
+                self._update_decoder_stats()
+                text = self.decoder
+                self.decoder = BinaryDecoder()
+                self.stats.protocol = self.decoder.protocol
+                leftover = bytes(text.buffer)
+                text.buffer.clear()
+                frames = frames + self.decoder.feed(leftover)
+                break
+        return frames
+
+    def _update_decoder_stats(self):
+        stats = self.stats
+        decoder = self.decoder
+        if decoder.protocol == "TEXT":
+            stats.lines = decoder.lines
+            stats.parse_misses = decoder.misses
+        else:
+            stats.corrupt_frames = decoder.corrupt
+            stats.dropped_frames = decoder.dropped
+
+
+class SerialReader(threading.Thread):
+    """Read telemetry from an open serial port and deliver parsed frames in batches.
+
+    on_batch(frames) is called from the reader thread with a non-empty list of
+    frames. on_error(exc) is called once if the port fails, after which the
+    thread exits.
+    """
+
+    def __init__(self, port, on_batch, on_error=None, binary=True, recorder=None, max_read=65536,
+                 preamble=b"", latency=None, idle_timeout=IDLE_READ_TIMEOUT):
+        super().__init__(name="SerialReader", daemon=True)
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.preamble = preamble  # bytes read before the reader started, e.g. by port discovery
+        self.latency = latency or LatencyProbe()  # stage timings (latency.py), off unless enabled
+        self.on_batch = on_batch
+        self.on_error = on_error
+        self.max_read = max_read
+        self.ingest = StreamIngest(port.write, binary, recorder)
+        self.stats = self.ingest.stats
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        cancel_read = getattr(self.port, "cancel_read", None)
+        if cancel_read is not None and self.idle_timeout:
+            try:
+                cancel_read()
+            except Exception:
+                pass  # already closed; the read has returned
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self):
+        port = self.port
+        ingest = self.ingest
+        latency = self.latency
+        data, backlog = self.preamble, 0
+        if self.idle_timeout and hasattr(port, "cancel_read"):
+            try:
+                port.timeout = self.idle_timeout
+            except Exception:
+                pass  # keep the port's own timeout
+        while not self._stop_event.is_set():
+            timed = latency.enabled
+            if not data:
+                try:
+                    # Ask for everything that is already queued; with nothing queued this
+                    # blocks for the first byte (up to the port timeout) instead of sleeping.
+                    waiting = port.in_waiting
+                    started = time.perf_counter()
+                    data = port.read(min(max(1, waiting), self.max_read))
+                    backlog = port.in_waiting
+                except Exception as e:
+                    if not self._stop_event.is_set() and self.on_error:
+                        self.on_error(e)
+                    break
+                if not data:
+                    ingest.stats.empty_reads += 1
+                    continue
+                if timed and waiting:
+                    # Only reads of data already queued; waiting for the pump is not latency
+                    latency.since("read", started)
+
+            read_time = time.monotonic()
+            if timed:
+                started = time.perf_counter()
+            try:
+                frames = ingest.feed(data, backlog)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+                break
+            if timed:
+                latency.since("decode", started)
+            if frames:
+                if timed:
+                    latency.arrived(started)
+                self.on_batch(frames)
+                ingest.delivered(frames, read_time)
+            data = b""
@@ -0,0 +1,75 @@
+"""Toolkit-neutral helpers for cheap GUI rendering.
+
+WidgetUpdater only touches a widget when the text or style it is asked to
+show differs from what it already shows, and switches styles through a
+"state" property rather than new stylesheet strings. FramePacer decides
+when a burst of telemetry may be rendered, so at most one render happens
+per display frame.
+"""
+import time
+
+
+class WidgetUpdater:
+    """Diffing setter for widget text and style state.
+
+    restyle(widget) is called after the "state" property changes so the
+    toolkit re-applies the matching style rule (for Qt: unpolish/polish).
+    """
+
+    def __init__(self, restyle):
+        self.restyle = restyle
+        self.applied = 0
+        self.skipped = 0
+        self._texts = {}
+        self._states = {}
+
+    def text(self, widget, text):
+        key = id(widget)
+        if self._texts.get(key) == text:
+            self.skipped += 1
+            return False
+        self._texts[key] = text
+        widget.setText(text)
+        self.applied += 1
+        return True
+
+    def style(self, widget, state):
+        key = id(widget)
+        if self._states.get(key) == state:
+            self.skipped += 1
+            return False
+        self._states[key] = state
+        widget.setProperty("state", state)
+        self.restyle(widget)
+        self.applied += 1
+        return True
+
+    def forget(self, widget):
+        """Drop the cached text for a widget that was changed behind our back."""
+        self._texts.pop(id(widget), None)
+
+
+class FramePacer:
+    """Coalesce render requests to at most one per frame interval."""
+
+    def __init__(self, fps=30, clock=time.monotonic):
+        self.interval = 1.0 / fps
+        self.clock = clock
+        self.pending = False
+        self.last_render = float("-inf")
+        self.requests = 0
+        self.renders = 0
+        self.coalesced = 0   # requests folded into a render that was already pending
+
+    def request(self):
+        """Note new data; returns seconds to wait before rendering (0 = render now)."""
+        self.requests += 1
+        if self.pending:
+            self.coalesced += 1
+        self.pending = True
+        return max(0.0, self.last_render + self.interval - self.clock())
+
+    def rendered(self):
+        self.pending = False
+        self.renders += 1
+        self.last_render = self.clock()
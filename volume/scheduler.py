@@ -0,0 +1,267 @@
+"""One deadline-ordered scheduler for the periodic and delayed work of a front end.
+
+Instead of a timer per job (battery simulation, watchdogs, render pacing,
+stall sampling), every job is a Task in a Scheduler, and only the earliest
+one needs a wakeup. Each task has a slack: it never runs before its
+deadline, and may run up to `slack` seconds after it. The scheduler wakes
+at the earliest latest-acceptable time and runs every task that is due by
+then, so jobs with nearby deadlines share one wakeup.
+
+While the scheduler is idle (say the window is minimized), tasks that are
+not marked when_idle are parked instead of run; they run once on resuming
+if they came due meanwhile, and periodic ones then carry on from there.
+
+The scheduler has no thread of its own unless start() (or run()) is used.
+Front ends with an event loop give it on_rearm(wake_at) instead and call
+run_due() when that time comes; the GUI drives it with a single QTimer.
+wakeups, idle_wakeups and runs count what it did, to check that an idle
+process really sleeps.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class Task:
+    """A scheduled call; interval is None for one-shot tasks."""
+
+    __slots__ = ("name", "callback", "interval", "slack", "when_idle", "deadline", "runs", "late",
+                 "max_late", "skipped", "state", "_generation")
+
+    def __init__(self, name, callback, interval, slack, when_idle):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.slack = slack
+        self.when_idle = when_idle
+        self.deadline = None
+        self.runs = 0
+        self.late = 0.0        # seconds after its deadline the last run started
+        self.max_late = 0.0
+        self.skipped = 0       # periods missed because a run came too late
+        self.state = "new"     # "scheduled", "parked", "done" or "cancelled"
+        self._generation = 0   # heap entries of older generations are stale
+
+    @property
+    def pending(self):
+        """True while the task will still run (scheduled, or parked until the scheduler resumes)."""
+        return self.state in ("scheduled", "parked")
+
+    def as_dict(self):
+        return {"runs": self.runs, "late_ms": round(self.late * 1000, 2),
+                "max_late_ms": round(self.max_late * 1000, 2), "skipped": self.skipped}
+
+
+class Scheduler:
+    """Deadline heap of Tasks with coalesced wakeups and idle suspension.
+
+    on_rearm(wake_at) is called with the next wakeup time (clock() units,
+    None when nothing is scheduled) whenever it changes; without it, run()
+    or start() wait for deadlines on a thread.
+    """
+
+    def __init__(self, on_rearm=None, clock=time.monotonic):
+        self.on_rearm = on_rearm
+        self.clock = clock
+        self.idle = False
+        self.wakeups = 0          # times run_due() found work
+        self.idle_wakeups = 0     # of which while idle
+        self.empty_wakeups = 0    # times run_due() was called with nothing due
+        self.runs = 0
+        self.coalesced = 0        # runs that shared a wakeup with an earlier task
+        self._deadlines = []      # (deadline, seq, generation, task)
+        self._latest = []         # (deadline + slack, seq, generation, task)
+        self._parked = []
+        self._tasks = []
+        self._seq = itertools.count()
+        self._armed = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._thread = None
+
+    # Tasks
+
+    def every(self, interval, callback, name=None, slack=None, when_idle=False, first=None):
+        """Call callback() every interval seconds, first after `first` (default: one interval).
+
+        slack defaults to a tenth of the interval; when_idle tasks keep running while idle.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        task = Task(name or getattr(callback, "__name__", "task"), callback, interval,
+                    interval / 10 if slack is None else slack, when_idle)
+        self._add(task, interval if first is None else first)
+        return task
+
+    def call_later(self, delay, callback, name=None, slack=0.0, when_idle=False):
+        """Call callback() once, delay seconds from now."""
+        task = Task(name or getattr(callback, "__name__", "task"), callback, None, slack, when_idle)
+        self._add(task, max(0.0, delay))
+        return task
+
+    def cancel(self, task):
+        if task is None:
+            return
+        with self._lock:
+            if task.state == "parked":
+                self._parked.remove(task)
+            if task.pending:
+                task.state = "cancelled"
+                task._generation += 1
+                if task.interval is not None:
+                    self._tasks.remove(task)
+        self._rearm()
+
+    def _add(self, task, delay):
+        with self._lock:
+            if self._closed:
+                task.state = "cancelled"   # e.g. a render requested while the window closes
+                return
+            task.deadline = self.clock() + delay
+            if task.interval is not None:
+                self._tasks.append(task)
+            self._schedule(task)
+        self._rearm()
+
+    def _schedule(self, task):
+        # Called with the lock held
+        if self.idle and not task.when_idle:
+            task.state = "parked"
+            self._parked.append(task)
+            return
+        task.state = "scheduled"
+        task._generation += 1
+        seq = next(self._seq)
+        heapq.heappush(self._deadlines, (task.deadline, seq, task._generation, task))
+        heapq.heappush(self._latest, (task.deadline + task.slack, seq, task._generation, task))
+
+    # Idle suspension
+
+    def set_idle(self, idle):
+        """Park (idle=True) or resume the tasks that are not marked when_idle."""
+        with self._lock:
+            if idle == self.idle:
+                return
+            self.idle = idle
+            if idle:
+                for _, _, generation, task in self._deadlines:
+                    if generation == task._generation and not task.when_idle:
+                        task._generation += 1
+                        task.state = "parked"
+                        self._parked.append(task)
+            else:
+                now = self.clock()
+                parked, self._parked = self._parked, []
+                for task in parked:
+                    # Came due while parked: run once now, not once per missed period
+                    task.deadline = max(task.deadline, now)
+                    self._schedule(task)
+        self._rearm()
+
+    # Running
+
+    def next_wake(self):
+        """When the next task must run (clock() units), or None."""
+        with self._lock:
+            return self._next_wake()
+
+    def _next_wake(self):
+        latest = self._latest
+        while latest and latest[0][2] != latest[0][3]._generation:
+            heapq.heappop(latest)
+        return latest[0][0] if latest else None
+
+    def run_due(self):
+        """Run every task whose deadline has passed; returns how many ran."""
+        with self._lock:
+            now = self.clock()
+            due = []
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][0] <= now:
+                _, _, generation, task = heapq.heappop(deadlines)
+                if generation != task._generation:
+                    continue
+                task._generation += 1   # its entry in _latest is now stale too
+                task.late = now - task.deadline
+                task.max_late = max(task.max_late, task.late)
+                task.runs += 1
+                if task.interval is None:
+                    task.state = "done"
+                else:
+                    task.deadline += task.interval
+                    if task.deadline <= now:
+                        # The loop fell behind: skip the missed periods instead of bursting
+                        missed = int((now - task.deadline) // task.interval) + 1
+                        task.skipped += missed
+                        task.deadline += missed * task.interval
+                    self._schedule(task)
+                due.append(task)
+            if due:
+                self.wakeups += 1
+                self.idle_wakeups += self.idle
+                self.runs += len(due)
+                self.coalesced += len(due) - 1
+            else:
+                self.empty_wakeups += 1
+            self._armed = None   # the wakeup that called us is used up
+        try:
+            for task in due:
+                task.callback()
+        finally:
+            self._rearm()
+        return len(due)
+
+    def _rearm(self):
+        with self._lock:
+            wake_at = self._next_wake()
+            if wake_at == self._armed:
+                return
+            self._armed = wake_at
+            self._wake.notify()
+        if self.on_rearm is not None:
+            self.on_rearm(wake_at)
+
+    def run(self):
+        """Run tasks on the calling thread until close()."""
+        while True:
+            with self._lock:
+                while not self._closed:
+                    wake_at = self._next_wake()
+                    timeout = None if wake_at is None else wake_at - self.clock()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._wake.wait(timeout)
+                else:
+                    return
+            self.run_due()
+
+    def start(self, name="Scheduler"):
+        self._thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop run() and drop every task; tasks added afterwards never run."""
+        with self._lock:
+            self._closed = True
+            for task in [entry[3] for entry in self._deadlines] + self._parked:
+                if task.pending:
+                    task.state = "cancelled"
+                    task._generation += 1
+            self._deadlines.clear()
+            self._latest.clear()
+            self._parked.clear()
+            self._tasks.clear()
+            self._wake.notify()
+        self._rearm()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def as_dict(self):
+        with self._lock:
+            tasks = {task.name: task.as_dict() for task in self._tasks}
+        return {"idle": self.idle, "wakeups": self.wakeups, "idle_wakeups": self.idle_wakeups,
+                "empty_wakeups": self.empty_wakeups, "runs": self.runs, "coalesced": self.coalesced,
+                "tasks": tasks}
@@ -0,0 +1,337 @@
+"""Virtual Arduino running finalcode1.ino's serial protocol on a pseudo-terminal.
+
+The simulator opens a pty, prints the firmware's banner and status lines on
+it and answers the same commands (AUTO, 0-255, BIN, TEXT), so the GUI, the
+headless monitor or a benchmark can connect to its port name exactly as to
+a real board. Like the board, which resets when its port is opened, it
+starts over with the banner each time a client opens the port (pyserial
+flushes whatever was sent before). Sample rate, jitter, burst backlogs, corrupt lines and
+scripted blood leakage / occlusion episodes are configurable. Linux/macOS
+only.
+
+    python -m volume.simulator --rate 100 --episode occlusion:10:5
+    python -m volume --port /dev/pts/N          # in another terminal
+"""
+import argparse
+import errno
+import os
+import random
+import re
+import select
+import sys
+import threading
+import time
+import tty
+
+from .binproto import encode_frame
+
+BANNER = b"Enter a pump speed (0-255) or type 'auto' for color-based control.\r\n"
+
+# TCS3200 pulse widths (us): a short pulse means a strong colour component
+NORMAL_RGB = (420, 230, 250)
+BLOOD_RGB = (90, 520, 480)
+ATTACH_POLL = 0.02  # seconds between checks for a client while the port is closed
+
+
+class Episode:
+    """A scripted fault: kind is "blood_leak" or "occlusion", times in seconds from start."""
+
+    __slots__ = ("kind", "start", "duration")
+
+    def __init__(self, kind, start, duration):
+        if kind not in ("blood_leak", "occlusion"):
+            raise ValueError(f"Unknown episode kind: {kind}")
+        self.kind = kind
+        self.start = start
+        self.duration = duration
+
+    @classmethod
+    def parse(cls, text):
+        """Parse "kind:start:duration", e.g. "occlusion:10:5"."""
+        kind, start, duration = text.split(":")
+        return cls(kind, float(start), float(duration))
+
+    def active(self, elapsed):
+        return self.start <= elapsed < self.start + self.duration
+
+
+def arduino_to_int(text):
+    """String.toInt(): the leading integer, or 0 if there is none."""
+    m = re.match(r"\s*([-+]?\d+)", text)
+    return int(m.group(1)) if m else 0
+
+
+class VirtualPump(threading.Thread):
+    """Simulated pump firmware on the master side of a pty; connect to port_name.
+
+    A close is noticed at the next sample or command read, so a port closed
+    and reopened within that time does not reset the firmware.
+    """
+
+    def __init__(self, rate=2.0, jitter=0.0, burst_every=0.0, burst_size=0, corrupt=0.0,
+                 episodes=(), binary_capable=True, seed=None, reset_delay=0.05):
+        super().__init__(name="VirtualPump", daemon=True)
+        self.rate = rate
+        self.jitter = jitter
+        self.burst_every = burst_every
+        self.burst_size = burst_size
+        self.corrupt = corrupt
+        self.episodes = list(episodes)
+        self.binary_capable = binary_capable
+        self.random = random.Random(seed)
+        self.reset_delay = reset_delay  # port opened to banner (~2 s on a real board's bootloader)
+
+        self.master_fd, slave_fd = os.openpty()
+        # No echo or newline translation, like the board's USB serial
+        tty.setraw(slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port_name = os.ttyname(slave_fd)
+        # Only clients hold the slave side open, so the master can tell when one opens the port
+        os.close(slave_fd)
+        self.attached = False
+
+        # Firmware state
+        self.auto_mode = True
+        self.binary_mode = False
+        self.pump_speed = 0
+        self.seq = 0
+
+        # Counters
+        self.samples_sent = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        self.corrupted = 0
+        self.resets = 0        # times a client opened the port
+        self.commands = []
+        self.episode_log = []  # (kind, monotonic start time) as episodes begin
+
+        self._command_buffer = bytearray()
+        self._stop_event = threading.Event()
+        self._started_at = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def close(self):
+        self.stop()
+        if self.is_alive():
+            self.join()
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+
+    # Output
+
+    def _write(self, data):
+        try:
+            written = os.write(self.master_fd, data)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            return
+        self.bytes_sent += written
+        self.bytes_dropped += len(data) - written
+
+    def _println(self, text):
+        if not self.binary_mode:
+            self._write(text.encode() + b"\r\n")
+
+    def _sample(self, elapsed):
+        """One loop() iteration's telemetry, as bytes."""
+        blood = occlusion = False
+        for episode in self.episodes:
+            if episode.active(elapsed):
+                blood |= episode.kind == "blood_leak"
+                occlusion |= episode.kind == "occlusion"
+
+        # The colour sensor is read in every mode
+        rgb = BLOOD_RGB if blood else NORMAL_RGB
+        if self.auto_mode:
+            self.pump_speed = 240 if blood else 180
+            status = "BLOOD LEAKAGE" if blood else "NORMAL"
+        else:
+            status = "MANUAL"
+
+        if occlusion:
+            flow = self.random.uniform(0.0, 0.4)
+        else:
+            flow = max(0.0, self.pump_speed / 255 * 20 + self.random.gauss(0, 0.5))
+
+        red, green, blue = (max(0, int(c + self.random.gauss(0, 10))) for c in rgb)
+        if self.binary_mode:
+            data = encode_frame(self.seq, status, self.pump_speed, flow, red, green, blue)
+            self.seq = (self.seq + 1) & 0xFFFF
+        else:
+            data = (f"Status: {status} | Pump Speed: {self.pump_speed} | "
+                    f"Flow Rate: {flow:.2f} mL/min | RGB: {red} {green} {blue}\r\n").encode()
+
+        if self.corrupt and self.random.random() < self.corrupt:
+            data = self._mangle(data)
+        return data
+
+    def _mangle(self, data):
+        self.corrupted += 1
+        data = bytearray(data)
+        if self.random.random() < 0.5:
+            # Flip a byte, keeping the terminator so the damage stays in one sample
+            i = self.random.randrange(len(data) - 1)
+            data[i] ^= 1 << self.random.randrange(8)
+            if not self.binary_mode and data[i] == 0x0A:
+                data[i] = 0x3F
+        else:
+            # Truncate, as if bytes were lost on the wire
+            data = data[:self.random.randrange(1, len(data))] + data[-1:]
+        return bytes(data)
+
+    # Input
+
+    def _handle_commands(self):
+        try:
+            data = os.read(self.master_fd, 1024)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno == errno.EIO:
+                self.attached = False  # the client closed the port
+            return
+        self._command_buffer += data
+        while b"\n" in self._command_buffer:
+            line, _, rest = bytes(self._command_buffer).partition(b"\n")
+            self._command_buffer[:] = rest
+            self._command(line.decode("ascii", "replace").strip())
+
+    def _command(self, text):
+        self.commands.append(text)
+        if text.lower() == "auto":
+            self.auto_mode = True
+            self._println("Switched to AUTO mode (color-based control).")
+        elif text.lower() == "bin" and self.binary_capable:
+            self._println("Protocol active: BIN")
+            self.binary_mode = True
+        elif text.lower() == "text" and self.binary_capable:
+            self.binary_mode = False
+            self._println("Protocol active: TEXT")
+        else:
+            speed = arduino_to_int(text)
+            if 0 <= speed <= 255:
+                self.pump_speed = speed
+                self.auto_mode = False
+                self._println(f"Manual Mode: Pump Speed Set To {speed}")
+            else:
+                self._println("Invalid input! Enter 0-255 or 'auto'.")
+
+    # Connection
+
+    def _client_opened(self):
+        """Whether a client holds the port open; reading the master fails with EIO until one does."""
+        readable, _, _ = select.select([self.master_fd], [], [], 0)
+        if not readable:
+            return True
+        try:
+            os.read(self.master_fd, 1024)   # anything sent before the reset is lost, as on the board
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        return True
+
+    def _reset(self):
+        """What the board does when its port is opened: reboot, then print the banner."""
+        self.resets += 1
+        self.auto_mode = True
+        self.binary_mode = False
+        self.pump_speed = 0
+        self.seq = 0
+        self._command_buffer.clear()
+        self._stop_event.wait(self.reset_delay)
+        self._write(BANNER)
+        if self.binary_capable:
+            self._write(b"Protocols: TEXT BIN\r\n")
+
+    # Main loop
+
+    def run(self):
+        self._started_at = start = time.monotonic()
+        interval = 1.0 / self.rate
+        next_sample = start
+        next_burst = start + self.burst_every if self.burst_every else None
+        started = set()
+
+        while not self._stop_event.is_set():
+            if not self.attached:
+                # Nothing is listening, as on a board nobody has opened: wait for a client
+                if not self._client_opened():
+                    self._stop_event.wait(ATTACH_POLL)
+                    continue
+                self.attached = True
+                self._reset()
+                next_sample = time.monotonic()
+                if next_burst is not None:
+                    next_burst = next_sample + self.burst_every
+
+            now = time.monotonic()
+            timeout = max(0.0, next_sample - now)
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                self._handle_commands()
+
+            now = time.monotonic()
+            elapsed = now - start
+            for index, episode in enumerate(self.episodes):
+                if index not in started and episode.active(elapsed):
+                    started.add(index)
+                    self.episode_log.append((episode.kind, now))
+
+            if next_burst is not None and now >= next_burst:
+                # A backlog arriving all at once, e.g. after a USB stall
+                self._write(b"".join(self._sample(elapsed) for _ in range(self.burst_size)))
+                self.samples_sent += self.burst_size
+                next_burst += self.burst_every
+
+            if now >= next_sample:
+                self._write(self._sample(elapsed))
+                self.samples_sent += 1
+                next_sample += interval
+                if self.jitter:
+                    next_sample += self.random.uniform(-self.jitter, self.jitter)
+                if next_sample < now - interval:
+                    next_sample = now  # fell behind; do not replay missed samples
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m volume.simulator",
+                                     description="Virtual VoluME pump on a pseudo-terminal")
+    parser.add_argument("--rate", type=float, default=2.0, help="samples per second (default: 2, like delay(500))")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max +/- seconds added to each interval")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="seconds between backlog bursts")
+    parser.add_argument("--burst-size", type=int, default=0, help="samples per backlog burst")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability that a sample is corrupted")
+    parser.add_argument("--episode", action="append", default=[], type=Episode.parse,
+                        help="scripted fault kind:start:duration, kind is blood_leak or occlusion")
+    parser.add_argument("--text-only", action="store_true", help="behave like firmware without the binary protocol")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pump = VirtualPump(rate=args.rate, jitter=args.jitter, burst_every=args.burst_every,
+                       burst_size=args.burst_size, corrupt=args.corrupt, episodes=args.episode,
+                       binary_capable=not args.text_only, seed=args.seed)
+    pump.start()
+    print(f"Virtual pump on {pump.port_name} (Ctrl+C to stop)", flush=True)
+    try:
+        while pump.is_alive():
+            pump.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pump.close()
+        print(f"Sent {pump.samples_sent} samples, {pump.bytes_sent} bytes "
+              f"({pump.bytes_dropped} dropped, {pump.corrupted} corrupted)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Pump state as immutable, versioned snapshots, and the alarm priority state machine.
+
+PumpMonitor changes a private draft under its lock and publishes one
+PumpState per batch of changes (the "state" event); readers on other
+threads only ever hold a snapshot, so they never see half an update (say,
+a status from one frame and the detection flags from the next).
+Renderers compare versions or use changed() to skip unchanged fields.
+
+AlarmStateMachine keeps every raised alarm, grouped by priority
+(audio.alarm_priority). The current alarm is the highest-priority one,
+first raised first, so a later but more urgent alarm takes over instead of
+being dropped, and clearing one alarm hands over to the next. There are a
+fixed number of priority levels, so raising, clearing and finding the
+current alarm are O(1).
+"""
+from .audio import GENERIC, alarm_priority
+
+# Fields of a snapshot besides version, with the values of a fresh monitor
+FIELDS = {
+    "status": "NORMAL",
+    "power": 0,
+    "flow": 0.0,
+    "mode": "AUTO",
+    "warning": "",
+    "battery_level": 100,
+    "blood_detected": False,
+    "occlusion_detected": False,
+    "alarm_type": None,       # the current (highest-priority) alarm
+    "alarms": (),             # every raised alarm, current first
+}
+
+
+class PumpState:
+    """One immutable version of a pump's telemetry, detection and alarm state."""
+
+    __slots__ = ("version",) + tuple(FIELDS)
+
+    def __init__(self, version=0, **fields):
+        set_field = object.__setattr__
+        set_field(self, "version", version)
+        for name, default in FIELDS.items():
+            set_field(self, name, fields.pop(name, default))
+        if fields:
+            raise TypeError(f"Unknown state fields: {', '.join(fields)}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PumpState is immutable; use replace()")
+
+    def __reduce__(self):
+        # Slots plus a blocked __setattr__ need an explicit recipe, e.g. to cross processes
+        return _restore, (self.version, tuple(getattr(self, name) for name in FIELDS))
+
+    def __repr__(self):
+        return f"PumpState(v{self.version}, {self.display_status!r}, alarm={self.alarm_type!r})"
+
+    @property
+    def alarm_active(self):
+        return self.alarm_type is not None
+
+    @property
+    def display_status(self):
+        """Status as the operator should see it, alarms taking precedence.
+
+        It shows blood leakage exactly when blood_detected is set, so a firmware
+        verdict the calibrated host classifier overruled is not shown as one.
+        """
+        if self.blood_detected:
+            return "BLOOD LEAKAGE"
+        if self.occlusion_detected:
+            return "OCCLUSION"
+        if self.status == "BLOOD LEAKAGE":
+            return "NORMAL"
+        return self.status
+
+    def replace(self, **changes):
+        """The next version, with changes applied."""
+        fields = {name: getattr(self, name) for name in FIELDS}
+        fields.update(changes)
+        return PumpState(self.version + 1, **fields)
+
+    def changed(self, other):
+        """Names of the fields that differ from another snapshot (or all of them for None)."""
+        if other is None:
+            return tuple(FIELDS)
+        return tuple(name for name in FIELDS if getattr(self, name) != getattr(other, name))
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["alarms"] = list(self.alarms)
+        return data
+
+
+def _restore(version, values):
+    return PumpState(version, **dict(zip(FIELDS, values)))
+
+
+class StateDraft:
+    """Mutable working copy of a PumpState, for the one thread holding the owner's lock."""
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, state):
+        for name in FIELDS:
+            setattr(self, name, getattr(state, name))
+
+    def snapshot(self, version):
+        return PumpState(version, **{name: getattr(self, name) for name in FIELDS})
+
+
+class AlarmStateMachine:
+    """Raised alarms by priority; the current one is the most urgent, oldest first.
+
+    raise_alarm(), clear() and clear_all() return whether the current alarm
+    changed, which is when an owner announces it.
+    """
+
+    def __init__(self, priority=alarm_priority, levels=GENERIC + 1):
+        self.priority = priority
+        self._levels = [{} for _ in range(levels)]   # per priority: alarm type -> None, in raise order
+        self._raised = {}                            # alarm type -> level
+        self.current = None
+        self.transitions = 0
+
+    def __contains__(self, alarm_type):
+        return alarm_type in self._raised
+
+    def __len__(self):
+        return len(self._raised)
+
+    @property
+    def active(self):
+        """Every raised alarm, most urgent first."""
+        return tuple(alarm for level in self._levels for alarm in level)
+
+    def raise_alarm(self, alarm_type):
+        if alarm_type in self._raised:
+            return False
+        level = min(max(self.priority(alarm_type), 0), len(self._levels) - 1)
+        self._raised[alarm_type] = level
+        self._levels[level][alarm_type] = None
+        self.transitions += 1
+        return self._update()
+
+    def clear(self, alarm_type):
+        level = self._raised.pop(alarm_type, None)
+        if level is None:
+            return False
+        del self._levels[level][alarm_type]
+        self.transitions += 1
+        return self._update()
+
+    def clear_all(self):
+        if not self._raised:
+            return False
+        for level in self._levels:
+            level.clear()
+        self._raised.clear()
+        self.transitions += 1
+        return self._update()
+
+    def _update(self):
+        current = None
+        for level in self._levels:
+            if level:
+                current = next(iter(level))
+                break
+        if current == self.current:
+            return False
+        self.current = current
+        return True
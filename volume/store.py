@@ -0,0 +1,276 @@
+"""Persistent telemetry and alarm archive in SQLite.
+
+TelemetryStore appends samples and monitor events to a SQLite database in
+WAL mode, so readers (a handover report, an audit query) never block the
+writer. Callers only append to an in-memory batch; a background thread
+commits batches in single transactions. The ingest path never touches the
+disk and never waits for it.
+
+    samples(pump, time, status, power, flow)      status as binproto.STATUS_CODES
+    events(pump, time, kind, alarm, detail)       alarms, connections, errors
+
+Query the archive from the command line:
+
+    python -m volume.store telemetry.db --since 8 --bucket 60
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+from .binproto import STATUS_CODES, UNKNOWN_STATUS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    pump   TEXT NOT NULL,
+    time   REAL NOT NULL,
+    status INTEGER NOT NULL,
+    power  INTEGER NOT NULL,
+    flow   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_pump_time ON samples (pump, time);
+CREATE INDEX IF NOT EXISTS samples_time ON samples (time);
+CREATE TABLE IF NOT EXISTS events (
+    pump   TEXT NOT NULL,
+    time   REAL NOT NULL,
+    kind   TEXT NOT NULL,
+    alarm  TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_pump_time ON events (pump, time);
+CREATE INDEX IF NOT EXISTS events_alarm_time ON events (alarm, time);
+"""
+
+# Monitor events worth keeping; "frames" arrive through add_frames instead
+STORED_EVENTS = ("connected", "disconnected", "reconnecting", "alarm", "alarm_stopped", "warning", "error")
+
+
+class TelemetryStore:
+    """Batched, background-written SQLite archive of pump telemetry.
+
+    Rows are committed every batch_rows rows or flush_interval seconds,
+    whichever comes first. If the disk falls more than max_pending rows
+    behind, the oldest unwritten samples are dropped (and counted) rather
+    than stalling the caller.
+    """
+
+    def __init__(self, path, batch_rows=5000, flush_interval=0.5, max_pending=1000000):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rows_written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_commit_time = 0.0
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._samples = []
+        self._events = []
+        self._written = threading.Condition(self._lock)
+        self._submitted = 0
+        self._committed = 0
+        self._closed = False
+        self._local = threading.local()
+        self._readers = []   # every thread's read connection, so close() can close them all
+        self._thread = threading.Thread(target=self._run, name="TelemetryStore", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL with NORMAL sync is durable across application crashes, and commits skip an fsync
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # Writing
+
+    def add_frames(self, pump, frames, timestamp):
+        """Queue the status frames of one reader batch, all stamped with the batch time."""
+        rows = [(pump, timestamp, STATUS_CODES.get(frame.status, UNKNOWN_STATUS), frame.power, frame.flow)
+                for frame in frames if frame.kind == "status"]
+        if rows:
+            self.add_samples(rows)
+
+    def add_samples(self, rows):
+        """Queue (pump, time, status code, power, flow) rows."""
+        with self._lock:
+            if self._closed:
+                return
+            self._samples += rows
+            self._submitted += len(rows)
+            overflow = len(self._samples) - self.max_pending
+            if overflow > 0:
+                del self._samples[:overflow]
+                self.dropped += overflow
+                self._committed += overflow  # never coming; keep flush() from waiting on them
+            if len(self._samples) >= self.batch_rows:
+                self._wake.notify()
+
+    def add_event(self, pump, event, data, timestamp=None):
+        """Queue a monitor event; alarm types go to the indexed alarm column."""
+        if timestamp is None:
+            timestamp = time.time()
+        alarm = data if event == "alarm" else None
+        detail = None if data is None or event == "alarm" else (
+            data if isinstance(data, str) else json.dumps(data, default=str))
+        with self._lock:
+            if self._closed:
+                return
+            self._events.append((pump or "", timestamp, event, alarm, detail))
+            self._submitted += 1
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed; returns False on timeout."""
+        with self._lock:
+            target = self._submitted
+            self._wake.notify()
+            return self._written.wait_for(lambda: self._committed >= target or self._closed, timeout)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._samples) + len(self._events)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+        # Query threads (metrics, fan-out) may be gone or idle; their connections hold the WAL open
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for connection in readers:
+            connection.close()
+
+    def _run(self):
+        connection = self._connect()
+        try:
+            while True:
+                with self._lock:
+                    if not self._closed and len(self._samples) < self.batch_rows:
+                        self._wake.wait(self.flush_interval)
+                    samples, self._samples = self._samples, []
+                    events, self._events = self._events, []
+                    closed = self._closed
+                if samples or events:
+                    started = time.perf_counter()
+                    written = len(samples) + len(events)
+                    try:
+                        with connection:
+                            connection.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+                            connection.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+                    except sqlite3.Error as e:
+                        # The archive is a record, not the monitor: lose the batch, keep going
+                        self.errors += 1
+                        self.last_error = str(e)
+                        written = 0
+                    elapsed = time.perf_counter() - started
+                    with self._lock:
+                        self.rows_written += written
+                        self.batches += 1
+                        self.max_commit_time = max(self.max_commit_time, elapsed)
+                        self._committed += len(samples) + len(events)
+                        self._written.notify_all()
+                if closed:
+                    return
+        finally:
+            connection.close()
+            with self._lock:
+                self._written.notify_all()
+
+    # Queries (each thread gets its own read connection)
+
+    def _reader(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Cannot query a closed TelemetryStore")
+                connection = self._local.connection = self._connect()
+                self._readers.append(connection)
+        return connection
+
+    @staticmethod
+    def _where(start, end, pump):
+        clause, args = "time >= ? AND time < ?", [start, end]
+        if pump is not None:
+            clause, args = "pump = ? AND " + clause, [pump] + args
+        return clause, args
+
+    def samples(self, start, end, pump=None):
+        """(pump, time, status code, power, flow) rows in [start, end), oldest first."""
+        where, args = self._where(start, end, pump)
+        return self._reader().execute(
+            f"SELECT pump, time, status, power, flow FROM samples WHERE {where} ORDER BY time", args).fetchall()
+
+    def flow_summary(self, start, end, pump=None, bucket=60):
+        """Per-bucket (bucket start, samples, mean, min, max flow) over [start, end)."""
+        where, args = self._where(start, end, pump)
+        return self._reader().execute(
+            f"SELECT CAST(time / ? AS INTEGER) * ? AS slot, COUNT(*), AVG(flow), MIN(flow), MAX(flow) "
+            f"FROM samples WHERE {where} GROUP BY slot ORDER BY slot", [bucket, bucket] + args).fetchall()
+
+    def alarm_counts(self, start, end, pump=None, bucket=None):
+        """(bucket start or None, alarm type, count) rows for alarms raised in [start, end)."""
+        where, args = self._where(start, end, pump)
+        slot = "CAST(time / ? AS INTEGER) * ?" if bucket else "NULL"
+        slot_args = [bucket, bucket] if bucket else []
+        return self._reader().execute(
+            f"SELECT {slot} AS slot, alarm, COUNT(*) FROM events "
+            f"WHERE kind = 'alarm' AND {where} GROUP BY slot, alarm ORDER BY slot, alarm",
+            slot_args + args).fetchall()
+
+    def events(self, start, end, pump=None, kind=None):
+        """(pump, time, kind, alarm, detail) rows in [start, end), oldest first."""
+        where, args = self._where(start, end, pump)
+        if kind is not None:
+            where, args = where + " AND kind = ?", args + [kind]
+        return self._reader().execute(
+            f"SELECT pump, time, kind, alarm, detail FROM events WHERE {where} ORDER BY time", args).fetchall()
+
+    def pumps(self):
+        return [row[0] for row in self._reader().execute("SELECT DISTINCT pump FROM samples ORDER BY pump")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m volume.store",
+                                     description="Summarize a VoluME telemetry archive")
+    parser.add_argument("database", help="SQLite archive written by the monitor")
+    parser.add_argument("--pump", help="only this pump (default: all)")
+    parser.add_argument("--since", type=float, default=8.0, help="hours to look back (default: 8)")
+    parser.add_argument("--bucket", type=int, default=60, help="seconds per summary row (default: 60)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = TelemetryStore(args.database)
+    end = time.time()
+    start = end - args.since * 3600
+    try:
+        print(f"{'time':19}  {'samples':>7}  {'mean':>6}  {'min':>6}  {'max':>6}  mL/min")
+        for slot, count, mean, low, high in store.flow_summary(start, end, args.pump, args.bucket):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(slot))
+            print(f"{stamp}  {count:7d}  {mean:6.2f}  {low:6.2f}  {high:6.2f}")
+        print("alarms:")
+        for _, alarm, count in store.alarm_counts(start, end, args.pump):
+            print(f"  {alarm:<20} {count}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Supervise many pumps from one process and one thread.
+
+PumpSupervisor keeps a PumpMonitor per pump but no reader thread: a single
+selector loop waits on every open port, drains whatever is readable and
+feeds it through the pump's own StreamIngest. Ports that cannot be selected
+on (Windows serial handles) are polled on the same loop instead. Dropped
+links are reopened with a per-pump exponential backoff.
+"""
+import selectors
+import threading
+import time
+
+from .discovery import ReconnectPolicy
+from .monitor import PumpMonitor
+from .reader import StreamIngest
+
+
+def open_serial(port, baudrate):
+    """Default port factory: a non-blocking pyserial port."""
+    import serial
+    return serial.Serial(port, baudrate, timeout=0)
+
+
+class PumpLink:
+    """Per-pump connection state kept by the supervisor."""
+
+    __slots__ = ("pump_id", "port_name", "baudrate", "monitor", "port", "ingest",
+                 "policy", "attempts", "retry_at", "reconnects", "polled")
+
+    def __init__(self, pump_id, port_name, baudrate, monitor, policy):
+        self.pump_id = pump_id
+        self.port_name = port_name
+        self.baudrate = baudrate
+        self.monitor = monitor
+        self.policy = policy
+        self.port = None
+        self.ingest = None
+        self.attempts = 0
+        self.retry_at = 0.0
+        self.reconnects = 0
+        self.polled = False
+
+    @property
+    def connected(self):
+        return self.port is not None
+
+
+class PumpSupervisor:
+    """Monitor N serial pumps on one selector loop.
+
+    subscribe(callback) receives (pump_id, event, data) for every pump's
+    PumpMonitor events; active_alarms() is the consolidated alarm view.
+    """
+
+    def __init__(self, port_factory=open_serial, policy=None, poll_interval=0.05, max_read=65536):
+        self.port_factory = port_factory
+        self.policy = policy or ReconnectPolicy()
+        self.poll_interval = poll_interval
+        self.max_read = max_read
+        self.links = {}
+        self._subscribers = []
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    # Pumps
+
+    def add_pump(self, pump_id, port, baudrate=9600, binary=True, policy=None, capture_dir=None,
+                 detector=None, store=None):
+        """Register a pump; it is connected by the loop. Returns its PumpMonitor."""
+        monitor = PumpMonitor(ports=(port,), baudrate=baudrate, binary=binary, capture_dir=capture_dir,
+                              detector=detector, store=store, pump_id=pump_id)
+        monitor.subscribe(lambda event, data: self._publish(pump_id, event, data))
+        with self._lock:
+            if pump_id in self.links:
+                raise ValueError(f"Pump {pump_id!r} is already supervised")
+            self.links[pump_id] = PumpLink(pump_id, port, baudrate, monitor, policy or self.policy)
+        return monitor
+
+    def remove_pump(self, pump_id):
+        with self._lock:
+            link = self.links.pop(pump_id)
+        self._disconnect(link)
+        link.monitor.stop()
+
+    def monitor(self, pump_id):
+        return self.links[pump_id].monitor
+
+    # Subscriptions
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _publish(self, pump_id, event, data):
+        for callback in list(self._subscribers):
+            callback(pump_id, event, data)
+
+    def active_alarms(self):
+        """(pump_id, alarm_type, warning) for every pump with an active alarm."""
+        return [(link.pump_id, link.monitor.alarm_type, link.monitor.warning)
+                for link in list(self.links.values()) if link.monitor.alarm_active]
+
+    def status(self):
+        """Per-pump summary: connection, latest telemetry and ingest counters."""
+        summary = {}
+        for link in list(self.links.values()):
+            monitor = link.monitor
+            summary[link.pump_id] = {
+                "port": link.port_name,
+                "connected": link.connected,
+                "reconnects": link.reconnects,
+                "status": monitor.display_status,
+                "power": monitor.power,
+                "flow": monitor.flow,
+                "mode": monitor.mode,
+                "alarm": monitor.alarm_type,
+                "ingest": link.ingest.stats.as_dict() if link.ingest else None,
+            }
+        return summary
+
+    # Loop
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self.run, name="PumpSupervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for link in list(self.links.values()):
+            self._disconnect(link)
+            link.monitor.stop()
+
+    def run(self):
+        """Serve every pump until stop(); runs on the caller's thread."""
+        self._running = True
+        selector = self._selector
+        while self._running:
+            now = time.monotonic()
+            next_retry = self._reconnect_due(now)
+            timeout = max(0.0, min(next_retry - now, 1.0))
+            if any(link.polled for link in self.links.values()):
+                timeout = min(timeout, self.poll_interval)
+
+            if selector.get_map():
+                events = selector.select(timeout)
+            else:
+                time.sleep(timeout)
+                events = ()
+            for key, _ in events:
+                self._read(key.data)
+            for link in list(self.links.values()):
+                if link.polled and link.port is not None:
+                    self._read(link)
+
+    def _reconnect_due(self, now):
+        """Open links whose retry time has passed; returns the next retry time."""
+        next_retry = now + 1.0
+        for link in list(self.links.values()):
+            if link.port is not None:
+                continue
+            if link.retry_at <= now:
+                self._connect(link)
+            if link.port is None:
+                next_retry = min(next_retry, link.retry_at)
+        return next_retry
+
+    def _connect(self, link):
+        try:
+            port = self.port_factory(link.port_name, link.baudrate)
+        except Exception:
+            link.retry_at = time.monotonic() + link.policy.delay(link.attempts)
+            link.attempts += 1
+            return
+        if link.ingest is not None:
+            link.reconnects += 1
+        link.attempts = 0
+        link.port = port
+        try:
+            self._selector.register(port.fileno(), selectors.EVENT_READ, link)
+            link.polled = False
+        except (AttributeError, OSError, ValueError):
+            link.polled = True
+        link.monitor.attach(port, link.port_name, start_reader=False)
+        link.ingest = StreamIngest(port.write, link.monitor.binary, link.monitor.recorder)
+
+    def _disconnect(self, link):
+        port, link.port = link.port, None
+        if port is None:
+            return
+        if not link.polled:
+            try:
+                self._selector.unregister(port.fileno())
+            except (KeyError, OSError, ValueError):
+                pass
+        try:
+            port.close()
+        except Exception:
+            pass
+
+    def _read(self, link):
+        port = link.port
+        latency = link.monitor.latency
+        timed = latency.enabled
+        try:
+            waiting = port.in_waiting
+            data = port.read(min(max(1, waiting), self.max_read))
+            if not data:
+                if link.polled:
+                    return
+                # A readable port with nothing to read has hung up
+                raise OSError("device disconnected")
+            read_time = time.monotonic()
+            if timed:
+                started = time.perf_counter()
+            frames = link.ingest.feed(data, port.in_waiting)
+            if timed:
+                latency.since("decode", started)
+        except Exception as e:
+            self._disconnect(link)
+            link.retry_at = time.monotonic() + link.policy.delay(0)
+            link.attempts = 1
+            link.monitor.connection_lost(e)
+            return
+        if frames:
+            link.monitor.process_frames(frames)
+            link.ingest.delivered(frames, read_time)
@@ -0,0 +1,555 @@
+"""Ingest and analysis in a separate process, shared with the GUI through shared memory.
+
+The worker process owns the serial link, the PumpMonitor (decoding,
+detection, alarms), the archive and the alarm audio. It writes every
+decoded sample into a SampleRing, a multiprocessing.shared_memory ring
+buffer with a single writer: slots are filled first and the sequence
+counter is advanced afterwards, so readers need no lock. Events (alarms,
+mode, warnings, connection changes) travel over a multiprocessing queue;
+commands go back over another. State snapshots (state.PumpState) are
+forwarded only when something besides the ring's telemetry changed.
+
+In the GUI process RemoteMonitor offers PumpMonitor's interface, so the
+window works with either. Parsing and detection bursts then never hold
+the GUI's interpreter lock, and the GUI only copies new samples out of the
+ring a display frame at a time.
+
+Alarm signalling survives either process failing. The worker plays alarm
+tones itself, so they continue if the GUI dies, and it then raises
+"display_failure". If the worker dies or hangs, RemoteMonitor raises
+"ingest_failure" on its own audio engine and starts a new worker on the
+same ring.
+
+Needs NumPy.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .audio import alarm_priority
+from .binproto import STATUS_CODES, STATUS_NAMES, UNKNOWN_STATUS
+from .commands import CommandStats
+from .latency import LatencyProbe
+from .state import FIELDS, PumpState, StateDraft
+
+SAMPLE = np.dtype([("time", "<f8"), ("flow", "<f4"), ("power", "<i2"), ("status", "u1"), ("flags", "u1")])
+HEADER = np.dtype([("seq", "<u8"), ("capacity", "<u8"), ("heartbeat", "<f8"), ("received", "<u8"),
+                   ("pending", "<u4"), ("sent", "<u4"), ("coalesced", "<u4"), ("acked", "<u4"),
+                   ("timeouts", "<u4")])
+HEADER_BYTES = 128
+# Telemetry every ring sample carries; snapshots changing only these stay in the worker.
+# Detection and alarm changes are always forwarded at once, as some (a new setpoint
+# clearing an occlusion, say) come with no sample
+RING_FIELDS = ("status", "power", "flow")
+BLOOD, OCCLUSION = 1, 2   # sample flags: the monitor's detection state after the sample
+
+HEARTBEAT_INTERVAL = 0.25
+HEARTBEAT_TIMEOUT = 3.0   # a worker silent this long is treated as hung and replaced
+RESTART_DELAY = 1.0       # minimum time between worker starts, so a failing one cannot spin
+
+
+class SampleRing:
+    """Decoded samples in shared memory: one writer process, any number of readers.
+
+    Create it with a capacity in the owning process and attach to it by
+    name elsewhere. The writer publishes header["seq"] (samples ever written)
+    only after the slots are filled; a reader that is lapped during a copy
+    detects it from the counter and drops the overwritten part.
+    """
+
+    def __init__(self, capacity=1 << 16, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * SAMPLE.itemsize)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.header = np.ndarray((1,), HEADER, buffer=self.shm.buf)
+        if self.owner:
+            self.header[0] = 0
+            self.header["capacity"][0] = capacity
+        self.capacity = int(self.header["capacity"][0])
+        self.samples = np.ndarray((self.capacity,), SAMPLE, buffer=self.shm.buf, offset=HEADER_BYTES)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self):
+        return int(self.header["seq"][0])
+
+    def write(self, times, flows, powers, codes, flags):
+        """Append equal-length sequences of samples (writer process only)."""
+        count = len(times)
+        if not count:
+            return
+        seq = self.seq
+        skip = max(0, count - self.capacity)
+        position = (seq + skip) % self.capacity
+        offset = skip
+        samples = self.samples
+        while offset < count:
+            n = min(count - offset, self.capacity - position)
+            end = position + n
+            samples["time"][position:end] = times[offset:offset + n]
+            samples["flow"][position:end] = flows[offset:offset + n]
+            samples["power"][position:end] = powers[offset:offset + n]
+            samples["status"][position:end] = codes[offset:offset + n]
+            samples["flags"][position:end] = flags[offset:offset + n]
+            offset += n
+            position = 0
+        self.header["seq"][0] = seq + count   # publish only once the slots hold the samples
+
+    def read(self, cursor):
+        """(first seq, copy of the samples written since cursor); lapped samples are skipped."""
+        end = self.seq
+        start = max(cursor, end - self.capacity)
+        if start >= end:
+            return end, self.samples[:0].copy()
+        first, last = start % self.capacity, end % self.capacity
+        if first < last:
+            records = self.samples[first:last].copy()
+        else:
+            records = np.concatenate((self.samples[first:], self.samples[:last]))
+        # Slots the writer reached again while we copied hold newer samples: drop them
+        lapped = self.seq - self.capacity
+        if lapped > start:
+            records = records[lapped - start:]
+            start = lapped
+        return start, records
+
+    def close(self):
+        self.header = self.samples = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Worker process
+
+def run_worker(ring_name, options, events, commands):
+    """Entry point of the ingest process; runs until a "close" command."""
+    from .audio import AudioEngine
+    from .monitor import PumpMonitor
+
+    ring = SampleRing(name=ring_name)
+    header = ring.header
+    store = None
+    if options.get("store"):
+        from .store import TelemetryStore
+        store = TelemetryStore(options["store"])
+    monitor = PumpMonitor(ports=options.get("ports"), baudrate=options.get("baudrate", 9600),
+                          binary=options.get("binary", True), capture_dir=options.get("capture_dir"),
+                          store=store, port_cache=options.get("port_cache"))
+    audio = AudioEngine(asset_path=options.get("asset_path", "blood_leakage.mp3"))
+    parent = multiprocessing.parent_process()
+    orphaned = False
+    services = []
+    if options.get("metrics_port") is not None:
+        from .metrics import MetricsServer, monitor_source
+        services.append(MetricsServer([monitor_source(monitor)], port=options["metrics_port"]).start())
+    if options.get("fanout_port") is not None:
+        from .fanout import TelemetryHub
+        hub = TelemetryHub(port=options["fanout_port"]).start()
+        hub.attach(monitor)
+        services.append(hub)
+
+    def mirror_commands():
+        stats = monitor.commands.stats
+        header["pending"][0] = monitor.commands.pending
+        header["sent"][0] = stats.sent
+        header["coalesced"][0] = stats.coalesced
+        header["acked"][0] = stats.acked
+        header["timeouts"][0] = stats.timeouts
+
+    forwarded = [None]   # the last state snapshot sent to the GUI
+
+    def forward(event, data):
+        if event == "frames":
+            rows = [(frame.status, frame.power, frame.flow) if frame.kind == "status" else ("BLOOD LEAKAGE", 0, 0.0)
+                    for frame in data if frame.kind in ("status", "blood_leakage")]
+            if rows:
+                now = time.time()
+                flags = BLOOD * monitor.blood_detected | OCCLUSION * monitor.occlusion_detected
+                ring.write([now] * len(rows), [row[2] for row in rows],
+                           [row[1] for row in rows], [STATUS_CODES.get(row[0], UNKNOWN_STATUS) for row in rows],
+                           [flags] * len(rows))
+            if monitor.commands.stats.acked != header["acked"][0]:
+                mirror_commands()
+            return
+        if event == "state":
+            audio.set_alarms(data.alarms)
+            previous, forwarded[0] = forwarded[0], data
+            if previous is not None and all(name in RING_FIELDS for name in data.changed(previous)):
+                forwarded[0] = previous
+                return
+        elif event == "ack":
+            mirror_commands()
+        if not orphaned:
+            events.put((event, data))
+
+    monitor.subscribe(forward)
+    actions = {
+        "start": lambda: monitor.start(wait=False),
+        "stop": monitor.stop,
+        "set_power": monitor.set_power,
+        "set_auto": monitor.set_auto,
+        "stop_alarm": monitor.stop_alarm,
+        "trigger_alarm": monitor.trigger_alarm,
+        "drain_battery": monitor.drain_battery,
+        "check_battery": monitor.check_battery,
+    }
+    try:
+        while True:
+            header["heartbeat"][0] = time.monotonic()
+            try:
+                name, args = commands.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                name = None
+            if name == "close":
+                return
+            if name is not None:
+                header["received"][0] += 1
+                try:
+                    actions[name](*args)
+                except Exception as e:
+                    events.put(("error", f"{name}: {e}"))
+                mirror_commands()
+            if not orphaned and parent is not None and not parent.is_alive():
+                # The display is gone: keep monitoring and make the failure heard
+                orphaned = True
+                monitor.trigger_alarm("display_failure")
+    finally:
+        for service in services:
+            service.close()
+        monitor.stop()
+        audio.close()
+        if store is not None:
+            store.close()
+        ring.close()
+
+
+# GUI process side
+
+class RemoteCommands:
+    """monitor.commands for a RemoteMonitor: counters mirrored by the worker."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.submitted = 0   # commands put on the queue by this process
+
+    @property
+    def pending(self):
+        header = self.ring.header
+        in_transit = max(0, self.submitted - int(header["received"][0]))
+        return in_transit + int(header["pending"][0])
+
+    @property
+    def stats(self):
+        header = self.ring.header
+        stats = CommandStats()
+        for name in ("sent", "coalesced", "acked", "timeouts"):
+            setattr(stats, name, int(header[name][0]))
+        return stats
+
+
+class RemoteMonitor:
+    """PumpMonitor's interface, backed by a worker process.
+
+    Takes the options of run_worker (ports, baudrate, binary, capture_dir,
+    store, port_cache, metrics_port, fanout_port). Besides PumpMonitor's events,
+    subscribers receive ("samples", count) whenever new samples have been
+    copied out of the ring. audio plays the worker-failure alarm.
+
+    The published state merges the worker's snapshots, the latest ring
+    sample and the local "ingest_failure" alarm, and has its own versions.
+    """
+
+    def __init__(self, history=None, capacity=1 << 16, audio=None, poll_interval=1 / 60,
+                 idle_interval=HEARTBEAT_INTERVAL, heartbeat_timeout=HEARTBEAT_TIMEOUT, **options):
+        self.options = options
+        self.history = history
+        self.audio = audio
+        self.poll_interval = poll_interval
+        self.idle_interval = idle_interval
+        self.polls = 0          # ring polls, and how many of them found nothing new
+        self.idle_polls = 0
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ring = SampleRing(capacity)
+        self.commands = RemoteCommands(self.ring)
+        self.latency = LatencyProbe()
+        self.reader = None
+        self.store = None
+        self.restarts = 0
+        self.reconnects = 0
+        self.pump_id = None
+
+        # Mirrored connection state, updated from events
+        self.port_name = None
+        self.monitoring = False
+        self.connecting = False
+
+        # Published state: the worker's last snapshot, overlaid with ring samples and local alarms
+        self.state = PumpState()
+        self._draft = StateDraft(self.state)
+        self._worker_alarms = ()
+        self._ingest_failed = False
+        self._lock = threading.Lock()
+
+        self._subscribers = []
+        self._cursor = 0
+        self._wanted = False          # whether the pump should be monitored (for restarts)
+        self._reconnecting = False
+        self._settled = threading.Event()
+        self._context = multiprocessing.get_context("spawn")  # never fork a process running Qt
+        self._events = self._commands = self._process = None
+        self._spawned = 0.0
+        self._process = self._new_worker()
+        self._process.start()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="RemoteMonitor", daemon=True)
+        self._thread.start()
+
+    @property
+    def serial_port(self):
+        return self.port_name
+
+    status = property(lambda self: self.state.status)
+    power = property(lambda self: self.state.power)
+    flow = property(lambda self: self.state.flow)
+    mode = property(lambda self: self.state.mode)
+    warning = property(lambda self: self.state.warning)
+    battery_level = property(lambda self: self.state.battery_level)
+    blood_detected = property(lambda self: self.state.blood_detected)
+    occlusion_detected = property(lambda self: self.state.occlusion_detected)
+    alarm_type = property(lambda self: self.state.alarm_type)
+    alarm_active = property(lambda self: self.state.alarm_active)
+    display_status = property(lambda self: self.state.display_status)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    # Commands
+
+    def _send(self, name, *args):
+        self.commands.submitted += 1
+        self._commands.put((name, args))
+
+    def start(self, wait=True):
+        self._wanted = True
+        self._settled.clear()
+        self.connecting = True
+        self._send("start")
+        if not wait:
+            return None
+        self._settled.wait()
+        return self.port_name is not None
+
+    def stop(self):
+        self._wanted = False
+        self._send("stop")
+
+    def set_power(self, power):
+        if not 0 <= power <= 255:
+            raise ValueError("Power must be between 0 and 255")
+        if self.port_name is None:
+            return False
+        with self._lock:
+            # Shown at once; the worker's next snapshot confirms it
+            self._draft.power = power
+            self._draft.mode = "MANUAL"
+        self._send("set_power", power)
+        return True
+
+    def set_auto(self):
+        if self.port_name is None:
+            return False
+        self._send("set_auto")
+        return True
+
+    def stop_alarm(self):
+        if self._ingest_failed:
+            with self._lock:
+                self._set_ingest_failed(False)
+            for callback in list(self._subscribers):
+                callback("alarm_stopped", None)
+        self._send("stop_alarm")
+
+    def trigger_alarm(self, alarm_type):
+        self._send("trigger_alarm", alarm_type)
+
+    def drain_battery(self):
+        self._send("drain_battery")
+
+    def check_battery(self):
+        self._send("check_battery")
+
+    def close(self):
+        """Stop the worker process and release the ring."""
+        if self._closed:
+            return
+        self._closed = True
+        self._thread.join()
+        process = self._process
+        if process is not None:
+            self._commands.put(("close", ()))
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.ring.close()
+
+    # Worker supervision
+
+    def _new_worker(self):
+        """The next worker process, not yet started (which takes hundreds of ms).
+
+        Fresh queues: a killed worker may have died holding the old ones'
+        locks, and commands sent from now on wait in the new one.
+        """
+        self._events, self._commands = self._context.Queue(), self._context.Queue()
+        self.ring.header["received"][0] = 0
+        self.ring.header["heartbeat"][0] = time.monotonic()
+        self.commands.submitted = 0
+        self._spawned = time.monotonic()
+        return self._context.Process(target=run_worker, name="VoluME-ingest", daemon=True,
+                                     args=(self.ring.name, self.options, self._events, self._commands))
+
+    def _check_worker(self, pending):
+        """Called with the lock held; returns a replacement worker for the caller to start, or None."""
+        process = self._process
+        if process is not None:
+            stale = time.monotonic() - float(self.ring.header["heartbeat"][0]) > self.heartbeat_timeout
+            if process.is_alive() and not stale:
+                return None
+            if process.is_alive():
+                process.kill()
+                process.join()
+            reason = "not responding" if stale else f"exit code {process.exitcode}"
+            self._process = None
+            self.restarts += 1
+            self.port_name = None
+            self.monitoring = False
+            pending.append(("error", f"Ingest process failed ({reason}); restarting"))
+            pending.append(("disconnected", None))
+            self._worker_alarms = ()
+            if not self._ingest_failed:
+                # The worker's own alarm tones died with it; this one sounds from here
+                self._set_ingest_failed(True)
+                pending.append(("alarm", "ingest_failure"))
+        if time.monotonic() - self._spawned < RESTART_DELAY:
+            return None
+        process = self._new_worker()
+        if self._wanted:
+            self.connecting = True
+            self._send("start")
+        return process
+
+    def _set_ingest_failed(self, failed):
+        self._ingest_failed = failed
+        if self.audio is not None:
+            self.audio.set_alarms(("ingest_failure",) if failed else ())
+        self._merge_alarms()
+
+    def _merge_alarms(self):
+        alarms = self._worker_alarms
+        if self._ingest_failed:
+            # A stable sort keeps the worker's raise order within each priority
+            alarms = tuple(sorted(alarms + ("ingest_failure",), key=alarm_priority))
+        self._draft.alarms = alarms
+        self._draft.alarm_type = alarms[0] if alarms else None
+
+    def _commit(self, pending):
+        draft, state = self._draft, self.state
+        for name in FIELDS:
+            if getattr(draft, name) != getattr(state, name):
+                self.state = draft.snapshot(state.version + 1)
+                pending.append(("state", self.state))
+                return
+
+    def _apply(self, event, data, pending):
+        if event == "connected":
+            self.port_name, self.monitoring, self.connecting = data, True, False
+            if self._reconnecting:
+                self._reconnecting = False
+                self.reconnects += 1
+            if self._ingest_failed:
+                self._set_ingest_failed(False)
+                if not self._worker_alarms:
+                    pending.append(("alarm_stopped", None))
+            self._settled.set()
+        elif event == "disconnected":
+            self.port_name, self.monitoring, self.connecting = None, False, False
+            self._settled.set()
+        elif event in ("searching", "reconnecting"):
+            self.connecting = True
+            self._reconnecting = event == "reconnecting"
+        elif event == "state":
+            # Republished as this monitor's own state once merged
+            for name in FIELDS:
+                setattr(self._draft, name, getattr(data, name))
+            self._worker_alarms = data.alarms
+            self._merge_alarms()
+            return
+        pending.append((event, data))
+
+    def _run(self):
+        # Events wake this thread at once; ring samples are polled every display frame
+        # while they flow, backing off to idle_interval on a quiet link
+        interval = self.poll_interval
+        while not self._closed:
+            pending = []
+            events = self._events
+            received = []
+            try:
+                received.append(events.get(timeout=interval))
+                while True:
+                    received.append(events.get_nowait())
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                pass  # the queue broke with a dying worker; the check below replaces it
+
+            with self._lock:
+                for event, data in received:
+                    self._apply(event, data, pending)
+                start, records = self.ring.read(self._cursor)
+                if len(records):
+                    self._cursor = start + len(records)
+                    last = records[-1]
+                    code = int(last["status"])
+                    draft = self._draft
+                    draft.status = STATUS_NAMES[code] if code < len(STATUS_NAMES) else "UNKNOWN"
+                    draft.power = int(last["power"])
+                    draft.flow = float(last["flow"])
+                    if self.history is not None:
+                        self.history.extend(records["time"], records["flow"],
+                                            np.clip(records["power"], 0, 255), records["status"])
+                    pending.append(("samples", len(records)))
+
+                replacement = self._check_worker(pending)
+                self._commit(pending)
+            if replacement is not None:
+                # Started outside the lock, so the GUI thread's calls never wait for a spawn
+                replacement.start()
+                with self._lock:
+                    self._process = replacement
+            self.polls += 1
+            if received or len(records):
+                interval = self.poll_interval
+            else:
+                self.idle_polls += 1
+                interval = min(interval * 2, max(self.idle_interval, self.poll_interval))
+            for event, data in pending:
+                for callback in list(self._subscribers):
+                    callback(event, data)